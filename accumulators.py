@@ -0,0 +1,135 @@
+"""
+accumulators.py — strumieniowe akumulatory metryk o stałej pamięci.
+
+Interfejs:
+- klasa RunningStats: add(x), merge(other), copy(), count/mean/variance/std/min/max, ci_halfwidth(confidence)
+- klasa MetricsAccumulator: add_row(wyniki epizodu), merge(other), summary() -> {metryka: {...}}
+
+Uwagi:
+- Wariancja liczona algorytmem Welforda, łączenie akumulatorów (workery, epizody) wzorem Chana.
+- Średnia to total / count, czyli bit w bit to samo co sum(lista) / len(lista) przy tej samej
+  kolejności dodawania — metryki epizodu nie zmieniają się względem wersji na listach.
+- Wartości NaN (np. m3 bez żadnej latencji) nie wchodzą do statystyk; zliczamy je w n_nan.
+"""
+
+from __future__ import annotations
+
+import math
+from statistics import NormalDist
+from typing import Dict, Iterable, Mapping, Optional
+
+
+class RunningStats:
+    __slots__ = ('count', 'total', 'n_nan', '_mean', '_m2', 'min', 'max')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.n_nan = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: float) -> None:
+        """Dodaj jedną obserwację (NaN tylko zliczamy)."""
+        if x != x:
+            self.n_nan += 1
+            return
+        self.count += 1
+        self.total += x
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (x - self._mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def copy(self) -> 'RunningStats':
+        other = RunningStats.__new__(RunningStats)
+        for k in self.__slots__:
+            setattr(other, k, getattr(self, k))
+        return other
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Dołącz statystyki innego akumulatora (w miejscu); zwraca self."""
+        self.n_nan += other.n_nan
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.total = other.count, other.total
+            self._mean, self._m2 = other._mean, other._m2
+            self.min, self.max = other.min, other.max
+            return self
+        n = self.count + other.count
+        delta = other._mean - self._mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / n
+        self._mean += delta * other.count / n
+        self.count = n
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float('nan')
+
+    @property
+    def variance(self) -> float:
+        """Wariancja populacyjna (jak statistics.pvariance)."""
+        return self._m2 / self.count if self.count else float('nan')
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance) if self.count else float('nan')
+
+    @property
+    def sample_variance(self) -> float:
+        """Wariancja z próby (mianownik n - 1, jak statistics.variance)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    def ci_halfwidth(self, confidence: float = 0.95) -> float:
+        """Połowa szerokości przedziału ufności średniej (przybliżenie normalne); inf przy n < 2."""
+        if self.count < 2:
+            return math.inf
+        z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+        return z * math.sqrt(self.sample_variance / self.count)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'n': self.count,
+            'n_nan': self.n_nan,
+            'mean': self.mean,
+            'std': self.std,
+            'min': self.min if self.count else float('nan'),
+            'max': self.max if self.count else float('nan'),
+        }
+
+    def __repr__(self) -> str:
+        return f'RunningStats(n={self.count}, mean={self.mean:.6g}, std={self.std:.6g})'
+
+
+class MetricsAccumulator:
+    """Zbiór RunningStats per metryka — agregaty po epizodach bez trzymania wierszy."""
+
+    def __init__(self, metrics: Optional[Iterable[str]] = None) -> None:
+        self.stats: Dict[str, RunningStats] = {m: RunningStats() for m in (metrics or ())}
+
+    def add_row(self, row: Mapping[str, float]) -> None:
+        """Dodaj metryki jednego epizodu (kolumny nieliczbowe są pomijane)."""
+        for key, value in row.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                st = self.stats.get(key)
+                if st is None:
+                    st = self.stats[key] = RunningStats()
+                st.add(float(value))
+
+    def merge(self, other: 'MetricsAccumulator') -> 'MetricsAccumulator':
+        for key, st in other.stats.items():
+            self.stats.setdefault(key, RunningStats()).merge(st)
+        return self
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {key: st.to_dict() for key, st in self.stats.items()}
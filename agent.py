@@ -4,6 +4,7 @@ agent.py — prosty agent BT (Behavior Tree) z respektowaniem „gatingu” akcj
 Interfejs kompatybilny z experiment.py:
 - klasa BTGatedAgent(...)
 - metoda pick_action(env, allowed_actions) -> str | None
+- metoda pick_action_code(env, allowed_mask) -> int (kod Action lub NOOP; maska bitowa jak w env.py)
 
 Kolejność priorytetów (BT):
 1) Jeśli dystans == 1 i 'ATTACK' dozwolony -> ATTACK
@@ -16,11 +17,84 @@ Uwagi:
 - „allowed_actions” pochodzi z mechanizmu „gatingu” w fazie DARK – zwykle jest zbiorem
   akcji zaobserwowanych u gracza w poprzednim cyklu (albo pełnym ACTIONS w baseline).
 - Agent nie modyfikuje „allowed_actions”; jedynie je respektuje.
+- pick_action (nazwy/zbiory) to warstwa zgodności nad pick_action_code (kody/maski).
+
+Tryb skompilowany (compiled=True):
+  decyzja drzewa zależy tylko od (dist == 1, dist >= skill_min_distance, |dx| >= |dy|, dx > 0, dy > 0,
+  skill_cd_npc == 0, maska dozwolonych akcji). Przy konstrukcji stablicowujemy drzewo dla wszystkich
+  4096 kluczy (decision_key) do gęstej tablicy; pick_action_code to wtedy jedno wyszukanie,
+  a pick_actions_batch — jeden wektorowy gather dla BatchGridEnv.
 """
 
 from __future__ import annotations
 
-from typing import Iterable, Optional, Set
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from env import ACTIONS, ALL_MASK, Action, NOOP, mask_of
+
+_ATTACK = int(Action.ATTACK)
+_SKILL = int(Action.SKILL)
+_ATTACK_BIT = 1 << _ATTACK
+_SKILL_BIT = 1 << _SKILL
+_MOVE_UP = int(Action.MOVE_up)
+_MOVE_DOWN = int(Action.MOVE_down)
+_MOVE_RIGHT = int(Action.MOVE_right)
+_MOVE_LEFT = int(Action.MOVE_left)
+
+# Fallback: pierwsza dozwolona akcja w porządku sortowania nazw (jak sorted(allowed)), dla każdej maski
+_FALLBACK_ORDER = [ACTIONS.index(a) for a in sorted(ACTIONS)]
+_FALLBACK = [next((a for a in _FALLBACK_ORDER if m >> a & 1), NOOP) for m in range(ALL_MASK + 1)]
+
+# Klucz decyzji: 6 bitów cech geometrii/CD + maska dozwolonych akcji na bitach 6..11
+_KEY_ADJACENT = 1      # dist == 1
+_KEY_FAR = 2           # dist >= skill_min_distance
+_KEY_X_AXIS = 4        # |dx| >= |dy|
+_KEY_DX_POS = 8        # dx > 0
+_KEY_DY_POS = 16       # dy > 0
+_KEY_CD_READY = 32     # skill_cd_npc == 0
+_KEY_MASK_SHIFT = 6
+TABLE_SIZE = (ALL_MASK + 1) << _KEY_MASK_SHIFT
+
+# Tablice decyzji współdzielone między agentami o tych samych parametrach
+_TABLES: Dict[Tuple[int, bool], List[int]] = {}
+
+
+def decision_key(dx: int, dy: int, skill_cd_npc: int, allowed: int, skill_min_distance: int) -> int:
+    """Indeks w tablicy decyzji dla (dx, dy) = player - npc, CD NPC i maski dozwolonych akcji."""
+    d = abs(dx) + abs(dy)
+    return (
+        (allowed << _KEY_MASK_SHIFT)
+        | (d == 1)
+        | (d >= skill_min_distance) << 1
+        | (abs(dx) >= abs(dy)) << 2
+        | (dx > 0) << 3
+        | (dy > 0) << 4
+        | (skill_cd_npc == 0) << 5
+    )
+
+
+class _KeyEnv:
+    """Minimalne „środowisko” realizujące dany klucz decyzji (do budowy tablicy)."""
+
+    def __init__(self, key: int, skill_min_distance: int) -> None:
+        x_axis = bool(key & _KEY_X_AXIS)
+        sx = 1 if key & _KEY_DX_POS else -1
+        sy = 1 if key & _KEY_DY_POS else -1
+        dx, dy = (2 * sx, sy) if x_axis else (sx, 2 * sy)
+        self.npc = [10, 10]
+        self.player = [10 + dx, 10 + dy]
+        self.skill_cd_npc = 0 if key & _KEY_CD_READY else 1
+        # dystans zgodny z bitami klucza (kombinacje niemożliwe dla danego skill_min_distance
+        # nigdy nie są odpytywane, więc ich wartość w tablicy nie ma znaczenia)
+        if key & _KEY_ADJACENT:
+            self._dist = 1
+        elif key & _KEY_FAR:
+            self._dist = max(skill_min_distance, 2)
+        else:
+            self._dist = 0
+
+    def dist(self) -> int:
+        return self._dist
 
 
 class BTGatedAgent:
@@ -28,68 +102,147 @@ class BTGatedAgent:
         self,
         skill_min_distance: int = 3,
         prefer_axis_with_larger_gap: bool = True,
+        compiled: bool = False,
     ) -> None:
         """
         :param skill_min_distance: minimalny dystans manhattan, przy którym SKILL ma sens (agresywny leap)
         :param prefer_axis_with_larger_gap: gdy True, wybierz ruch najpierw po osi z większym |delta|
+        :param compiled: gdy True, decyzje pochodzą z prekompilowanej tablicy (identyczne z drzewem)
         """
         self.skill_min_distance = int(skill_min_distance)
         self.prefer_axis_with_larger_gap = bool(prefer_axis_with_larger_gap)
+        self.compiled = bool(compiled)
+        self.table: Optional[List[int]] = None
+        self._table_np = None
+        if self.compiled:
+            self.table = self.build_table()
+            self.pick_action_code = self._pick_action_code_table
 
     # ------------------------------
     # Główne API
     # ------------------------------
     def pick_action(self, env, allowed_actions: Iterable[str]) -> Optional[str]:
         """Zwróć wybraną akcję lub None, jeśli żadna nie jest dozwolona."""
-        allowed: Set[str] = set(allowed_actions)
+        action = self.pick_action_code(env, mask_of(allowed_actions))
+        return None if action == NOOP else ACTIONS[action]
 
+    def pick_action_code_tree(self, env, allowed: int) -> int:
+        """
+        Jak pick_action(), ale na masce bitowej dozwolonych akcji; zwraca kod Action lub NOOP.
+
+        Wersja drzewa BT (referencyjna; z niej budowana jest tablica decyzji).
+        """
         if not allowed:
-            return None
+            return NOOP
+
+        d = env.dist()
 
         # 1) ATTACK jeśli stoimy obok i jest dozwolony
-        if env.dist() == 1 and 'ATTACK' in allowed:
-            return 'ATTACK'
+        if d == 1 and allowed & _ATTACK_BIT:
+            return _ATTACK
 
         # 2) SKILL (agresywny leap) gdy jest sens strategiczny i CD==0
         if (
-            env.dist() >= self.skill_min_distance
-            and 'SKILL' in allowed
+            d >= self.skill_min_distance
+            and allowed & _SKILL_BIT
             and getattr(env, 'skill_cd_npc', 0) == 0
         ):
-            return 'SKILL'
+            return _SKILL
 
         # 3) Ruch w stronę gracza – wybór osi i kierunku
         move = self._move_towards_player(env, allowed)
-        if move is not None:
+        if move != NOOP:
             return move
 
-        # 4) Fallback: pierwsza z dozwolonych akcji (stabilny porządek po sortowaniu)
-        for a in sorted(allowed):
-            return a
+        # 4) Fallback: pierwsza z dozwolonych akcji (stabilny porządek po sortowaniu nazw)
+        # 5) Nic nie można wykonać → NOOP (nieosiągalne, bo allowed != 0)
+        return _FALLBACK[allowed]
 
-        # 5) Nic nie można wykonać
-        return None
+    # domyślnie drzewo; w trybie compiled nadpisywane w __init__ wersją tablicową
+    pick_action_code = pick_action_code_tree
+
+    # ------------------------------
+    # Tryb skompilowany
+    # ------------------------------
+    def build_table(self) -> List[int]:
+        """Stablicuj drzewo dla wszystkich kluczy decision_key (wynik cache'owany per parametry)."""
+        params = (self.skill_min_distance, self.prefer_axis_with_larger_gap)
+        table = _TABLES.get(params)
+        if table is None:
+            table = [NOOP] * TABLE_SIZE
+            geometry_keys = 1 << _KEY_MASK_SHIFT
+            for flags in range(geometry_keys):
+                env = _KeyEnv(flags, self.skill_min_distance)
+                for allowed in range(ALL_MASK + 1):
+                    table[(allowed << _KEY_MASK_SHIFT) | flags] = self.pick_action_code_tree(env, allowed)
+            _TABLES[params] = table
+        return table
+
+    def _pick_action_code_table(self, env, allowed: int) -> int:
+        """pick_action_code w trybie skompilowanym: jedno wyszukanie w tablicy."""
+        player, npc = env.player, env.npc
+        dx = player[0] - npc[0]
+        dy = player[1] - npc[1]
+        adx = dx if dx >= 0 else -dx
+        ady = dy if dy >= 0 else -dy
+        d = adx + ady
+        # to samo co decision_key(), rozpisane w miejscu (gorąca ścieżka)
+        return self.table[
+            (allowed << _KEY_MASK_SHIFT)
+            | (d == 1)
+            | (d >= self.skill_min_distance) << 1
+            | (adx >= ady) << 2
+            | (dx > 0) << 3
+            | (dy > 0) << 4
+            | (env.skill_cd_npc == 0) << 5
+        ]
+
+    def pick_actions_batch(self, env, allowed):
+        """
+        Decyzje dla wszystkich epizodów BatchGridEnv naraz (jeden gather z tablicy decyzji).
+
+        :param env: BatchGridEnv (pozycje (N, 2), skill_cd_npc (N,))
+        :param allowed: maska dozwolonych akcji — int albo tablica (N,)
+        :return: tablica kodów akcji (N,), NOOP gdy nic nie jest dozwolone
+        """
+        import numpy as np
+
+        if self._table_np is None:
+            self._table_np = np.asarray(self.table if self.table is not None else self.build_table(), dtype=np.int32)
+        dx = env.player[:, 0] - env.npc[:, 0]
+        dy = env.player[:, 1] - env.npc[:, 1]
+        adx, ady = np.abs(dx), np.abs(dy)
+        d = adx + ady
+        key = (
+            (np.asarray(allowed, dtype=np.int32) << _KEY_MASK_SHIFT)
+            | (d == 1)
+            | (d >= self.skill_min_distance) * _KEY_FAR
+            | (adx >= ady) * _KEY_X_AXIS
+            | (dx > 0) * _KEY_DX_POS
+            | (dy > 0) * _KEY_DY_POS
+            | (env.skill_cd_npc == 0) * _KEY_CD_READY
+        )
+        return self._table_np[key]
 
     # ------------------------------
     # Pomocnicze
     # ------------------------------
-    def _move_towards_player(self, env, allowed: Set[str]) -> Optional[str]:
+    def _move_towards_player(self, env, allowed: int) -> int:
         """Wybierz ruch zbliżający do gracza (spośród dozwolonych)."""
         dx = env.player[0] - env.npc[0]
         dy = env.player[1] - env.npc[1]
 
-        # zbuduj preferencje ruchów (kolejność kandydatów)
-        candidates = []
-        if self.prefer_axis_with_larger_gap:
-            if abs(dx) >= abs(dy):
-                candidates = [('MOVE_right' if dx > 0 else 'MOVE_left'), ('MOVE_down' if dy > 0 else 'MOVE_up')]
-            else:
-                candidates = [('MOVE_down' if dy > 0 else 'MOVE_up'), ('MOVE_right' if dx > 0 else 'MOVE_left')]
+        # preferencje ruchów (kolejność kandydatów)
+        horizontal = _MOVE_RIGHT if dx > 0 else _MOVE_LEFT
+        vertical = _MOVE_DOWN if dy > 0 else _MOVE_UP
+        if self.prefer_axis_with_larger_gap and abs(dx) < abs(dy):
+            first, second = vertical, horizontal
         else:
-            # prostsza logika: najpierw w poziomie, potem w pionie
-            candidates = [('MOVE_right' if dx > 0 else 'MOVE_left'), ('MOVE_down' if dy > 0 else 'MOVE_up')]
-
-        for a in candidates:
-            if a in allowed:
-                return a
-        return None
+            # oś o większym |delta| albo prostsza logika: najpierw w poziomie, potem w pionie
+            first, second = horizontal, vertical
+
+        if allowed >> first & 1:
+            return first
+        if allowed >> second & 1:
+            return second
+        return NOOP
@@ -3,22 +3,42 @@
 analysis_plot.py — analiza wyników i wykresy porównawcze warunków (bez seaborn, 1 wykres = 1 figura).
 
 Funkcje:
-- Odczytuje wszystkie pliki data/results_*.csv (np. memory, baseline, memory_k2 ...)
-- Generuje boxploty dla każdej metryki, porównując dostępne warunki
-- Zapisuje podsumowanie (średnia, odchylenie std, min, max) do data/summary_metrics.csv
+- Odczytuje wszystkie pliki data/results_*.csv lub kolumnowe data/results_*.npy (columnar.py, mapowane
+  z dysku bez parsowania; gdy są oba, wygrywa nowszy) — np. memory, baseline, memory_k2 ...
+- Generuje boxploty dla każdej metryki, porównując dostępne warunki — równolegle (pula procesów,
+  backend Agg, obiektowe API matplotlib), z pominięciem wykresów, których dane wejściowe się nie zmieniły
+  (hash zawartości kolumn w data/.plot_cache.json); matplotlib importowany dopiero przy rysowaniu
+- Zapisuje podsumowanie (średnia, odchylenie std, min, max, bootstrapowy CI średniej) do data/summary_metrics.csv
+- Porównuje warunki parami po tym samym seedzie (różnica średnich, CI, p-wartość testu permutacyjnego)
+  i zapisuje data/comparison_metrics.csv
+
+Bootstrap i test permutacyjny są wektorowe: zamiast losować indeksy wierszy (macierz resamples × n)
+losujemy liczności grup wartości — wielomianowo (bootstrap) albo dwumianowo (zmiana znaków
+różnic w teście permutacyjnym) — w jednej macierzy resamples × grupy. Dla metryk o co najwyżej
+`max_groups` różnych wartościach (difficulty, M1–M4) jest to dokładnie ten sam rozkład co
+resampling wierszy; przy większej liczbie wartości (M5) grupy to przedziały kwantylowe, a suma
+wewnątrz przedziału jest przybliżana rozkładem normalnym (przedziały są wąskie, błąd pomijalny).
 
 Użycie:
   python analysis_plot.py --outdir data --metrics m1_coverage,m2_latency_cycles,m3_missed_actions_rate,m4_cpu_ms_per_tick,difficulty_proxy
+  python analysis_plot.py --n_boot 20000 --ci_level 0.99
+  python analysis_plot.py --no_plots          # tylko summary/comparison (bez importu matplotlib)
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from statistics import mean, pstdev
+from itertools import combinations
+
+import numpy as np
 
-import matplotlib.pyplot as plt
+from columnar import ResultColumns, load_columns, read_csv_columns
 
 
 def parse_args():
@@ -30,51 +50,178 @@ def parse_args():
         default='m1_coverage,m2_unlearned_usage,m3_latency_cycles,m4_missed_actions_rate,m5_cpu_ms_per_tick,difficulty_proxy',
         help='Lista metryk rozdzielona przecinkami',
     )
+    ap.add_argument('--n_boot', type=int, default=10000, help='Liczba resampli bootstrapu / permutacji')
+    ap.add_argument('--ci_level', type=float, default=0.95, help='Poziom ufności przedziałów bootstrapowych')
+    ap.add_argument('--boot_seed', type=int, default=0, help='Ziarno losowania bootstrapu / permutacji')
+    ap.add_argument('--no_plots', action='store_true', help='Tylko podsumowania CSV, bez wykresów')
+    ap.add_argument('--plot_workers', type=int, default=0, help='Liczba procesów do rysowania (0 = liczba CPU)')
+    ap.add_argument('--force_plots', action='store_true', help='Rysuj wszystkie wykresy, nawet gdy dane się nie zmieniły')
     return ap.parse_args()
 
 
-def read_results(outdir: Path):
-    """Zwraca dict: {condition: [row_dict, ...]} dla wszystkich plików results_*.csv w katalogu."""
-    data = {}
-    for f in outdir.glob('results_*.csv'):
+def read_results(outdir: Path) -> dict[str, ResultColumns]:
+    """Zwraca dict: {condition: ResultColumns} dla plików results_*.npy / results_*.csv w katalogu."""
+    files = {}
+    for f in sorted(outdir.glob('results_*.csv')) + sorted(outdir.glob('results_*.npy')):
         condition = f.stem.replace('results_', '')
-        with f.open(newline='') as fh:
-            reader = csv.DictReader(fh)
-            rows = list(reader)
-        if rows:
-            data[condition] = rows
+        prev = files.get(condition)
+        if prev is None or f.stat().st_mtime >= prev.stat().st_mtime:
+            files[condition] = f
+    data = {}
+    for condition, f in files.items():
+        cols = load_columns(f) if f.suffix == '.npy' else read_csv_columns(f)
+        if len(cols):
+            data[condition] = cols
     return data
 
 
-def to_float_list(rows, key):
-    vals = []
-    for r in rows:
-        try:
-            vals.append(float(r[key]))
-        except (KeyError, ValueError):
-            pass
-    return vals
+def column(cols: ResultColumns, key: str) -> np.ndarray:
+    """Kolumna metryki jako tablica float64 (pusta, gdy metryki nie ma w wynikach)."""
+    return cols.column(key) if key in cols else np.empty(0)
+
+
+def to_array(cols: ResultColumns, key: str) -> np.ndarray:
+    """Kolumna metryki jako tablica float64 bez NaN (brakujące/nieliczbowe wartości pominięte)."""
+    vals = column(cols, key)
+    return vals[~np.isnan(vals)]
+
+
+# ---------------------------
+# Bootstrap / test permutacyjny
+# ---------------------------
+def _value_groups(x: np.ndarray, max_groups: int):
+    """
+    Grupy wartości x: (wartość/średnia grupy, liczność, wariancja wewnątrz grupy).
+
+    Dokładnie unikalne wartości, gdy jest ich najwyżej max_groups; inaczej przedziały kwantylowe.
+    """
+    values, counts = np.unique(x, return_counts=True)
+    if len(values) <= max_groups:
+        return values, counts, np.zeros(len(values))
+    xs = np.sort(x)
+    edges = np.linspace(0, len(xs), max_groups + 1).astype(np.int64)
+    counts = np.diff(edges)
+    sums = np.add.reduceat(xs, edges[:-1])
+    means = sums / counts
+    sq = np.add.reduceat((xs - np.repeat(means, counts)) ** 2, edges[:-1])
+    return means, counts, sq / counts
+
+
+def bootstrap_means(x: np.ndarray, n_boot: int, rng: np.random.Generator, max_groups: int = 256) -> np.ndarray:
+    """Rozkład bootstrapowy średniej x: n_boot średnich z resampli ze zwracaniem."""
+    n = len(x)
+    values, counts, var = _value_groups(x, max_groups)
+    draws = rng.multinomial(n, counts / n, size=n_boot)          # (n_boot, grupy)
+    sums = draws @ values
+    if var.any():
+        sums += (rng.standard_normal((n_boot, len(values))) * np.sqrt(draws * var)).sum(axis=1)
+    return sums / n
+
+
+def bootstrap_ci(x: np.ndarray, n_boot: int, level: float, rng: np.random.Generator) -> tuple[float, float]:
+    """Percentylowy przedział ufności średniej (nan, nan) dla pustej próby."""
+    if len(x) == 0:
+        return float('nan'), float('nan')
+    alpha = 1.0 - level
+    lo, hi = np.quantile(bootstrap_means(x, n_boot, rng), [alpha / 2, 1 - alpha / 2])
+    return float(lo), float(hi)
+
+
+def paired_permutation_p(d: np.ndarray, n_perm: int, rng: np.random.Generator, max_groups: int = 256) -> float:
+    """
+    Dwustronna p-wartość testu permutacyjnego dla par (losowa zamiana znaków różnic d).
+
+    Liczba dodatnich znaków w grupie równych |d| ma rozkład dwumianowy — losujemy ją zamiast znaków.
+    """
+    n = len(d)
+    if n == 0:
+        return float('nan')
+    observed = abs(d.sum())
+    values, counts, var = _value_groups(np.abs(d), max_groups)
+    pos = rng.binomial(counts, 0.5, size=(n_perm, len(values)))   # (n_perm, grupy)
+    sums = (2 * pos - counts) @ values
+    if var.any():
+        sums += (rng.standard_normal((n_perm, len(values))) * np.sqrt(counts * var)).sum(axis=1)
+    extreme = np.count_nonzero(np.abs(sums) >= observed * (1 - 1e-12))
+    return (1 + extreme) / (1 + n_perm)
+
+
+def _comparison_pairs(conditions: list[str]) -> list[tuple[str, str]]:
+    """Pary (warunek, odniesienie): każdy warunek vs baseline, a bez baseline — wszystkie pary."""
+    if 'baseline' in conditions:
+        return [(c, 'baseline') for c in conditions if c != 'baseline']
+    return list(combinations(conditions, 2))
+
+
+def compare_conditions(metrics: list[str], data_by_cond: dict[str, ResultColumns], n_boot: int = 10000,
+                       level: float = 0.95, seed: int = 0) -> list[dict]:
+    """
+    Różnice par warunków liczone na epizodach o tym samym seedzie (A - B).
+
+    :return: wiersze comparison_metrics.csv (n_pairs, średnia różnicy, CI bootstrapowy, p permutacyjne)
+    """
+    rng = np.random.default_rng(seed)
+    out = []
+    for a, b in _comparison_pairs(sorted(data_by_cond)):
+        _, ia, ib = np.intersect1d(column(data_by_cond[a], 'seed'), column(data_by_cond[b], 'seed'),
+                                   return_indices=True)
+        for m in metrics:
+            if m not in data_by_cond[a] or m not in data_by_cond[b]:
+                continue  # brak kolumny metryki
+            va = data_by_cond[a].column(m)
+            vb = data_by_cond[b].column(m)
+            d = va[ia] - vb[ib]
+            d = d[~np.isnan(d)]
+            lo, hi = bootstrap_ci(d, n_boot, level, rng)
+            out.append({
+                'condition_a': a,
+                'condition_b': b,
+                'metric': m,
+                'n_pairs': len(d),
+                'mean_diff': f'{d.mean():.6f}' if len(d) else '',
+                'ci_low': f'{lo:.6f}' if len(d) else '',
+                'ci_high': f'{hi:.6f}' if len(d) else '',
+                'p_value': f'{paired_permutation_p(d, n_boot, rng):.6f}' if len(d) else '',
+            })
+    return out
+
+
+def write_comparison(outdir: Path, rows: list[dict]):
+    """Zapisz comparison_metrics.csv (różnice par warunków po seedzie)."""
+    out = outdir / 'comparison_metrics.csv'
+    fields = ['condition_a', 'condition_b', 'metric', 'n_pairs', 'mean_diff', 'ci_low', 'ci_high', 'p_value']
+    with out.open('w', newline='') as fh:
+        w = csv.DictWriter(fh, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+    print('Saved', out)
 
 
-def write_summary(outdir: Path, metrics: list[str], data_by_cond: dict[str, list[dict]]):
-    """Zapisz summary_metrics.csv z prostymi statystykami."""
+def write_summary(outdir: Path, metrics: list[str], data_by_cond: dict[str, ResultColumns], n_boot: int = 10000,
+                  level: float = 0.95, seed: int = 0):
+    """Zapisz summary_metrics.csv z prostymi statystykami i bootstrapowym CI średniej (bez NaN)."""
     out = outdir / 'summary_metrics.csv'
+    rng = np.random.default_rng(seed)
     fields = ['condition', 'n']
     for m in metrics:
-        fields += [f'{m}_mean', f'{m}_std', f'{m}_min', f'{m}_max']
+        fields += [f'{m}_mean', f'{m}_std', f'{m}_min', f'{m}_max', f'{m}_ci_low', f'{m}_ci_high']
 
     rows = []
-    for cond, rows_raw in sorted(data_by_cond.items()):
-        row = {'condition': cond, 'n': len(rows_raw)}
+    for cond, cols in sorted(data_by_cond.items()):
+        row = {'condition': cond, 'n': len(cols)}
         for m in metrics:
-            vals = to_float_list(rows_raw, m)
-            if vals:
-                row[f'{m}_mean'] = f'{mean(vals):.6f}'
-                row[f'{m}_std']  = f'{pstdev(vals):.6f}'
-                row[f'{m}_min']  = f'{min(vals):.6f}'
-                row[f'{m}_max']  = f'{max(vals):.6f}'
+            vals = column(cols, m)
+            if len(vals):
+                row[f'{m}_mean'] = f'{vals.mean():.6f}'
+                row[f'{m}_std']  = f'{vals.std():.6f}'
+                row[f'{m}_min']  = f'{vals.min():.6f}'
+                row[f'{m}_max']  = f'{vals.max():.6f}'
+                lo, hi = bootstrap_ci(to_array(cols, m), n_boot, level, rng)
+                row[f'{m}_ci_low'] = f'{lo:.6f}'
+                row[f'{m}_ci_high'] = f'{hi:.6f}'
             else:
                 row[f'{m}_mean'] = row[f'{m}_std'] = row[f'{m}_min'] = row[f'{m}_max'] = ''
+                row[f'{m}_ci_low'] = row[f'{m}_ci_high'] = ''
         rows.append(row)
 
     with out.open('w', newline='') as fh:
@@ -85,24 +232,81 @@ def write_summary(outdir: Path, metrics: list[str], data_by_cond: dict[str, list
     print('Saved', out)
 
 
-def save_boxplots(outdir: Path, metrics: list[str], data_by_cond: dict[str, list[dict]]):
-    """Dla każdej metryki zapisz boxplot z porównaniem dostępnych warunków."""
+# Wersja wyglądu wykresów — część hasha; podbij przy zmianie sposobu rysowania
+_PLOT_VERSION = 1
+_PLOT_CACHE = '.plot_cache.json'
+
+
+def _boxplot_hash(metric: str, conditions: list[str], series: list[np.ndarray]) -> str:
+    """Hash zawartości danych wykresu (metryka, warunki, wartości)."""
+    h = hashlib.sha256(f'{_PLOT_VERSION}|{metric}|{"|".join(conditions)}'.encode())
+    for s in series:
+        h.update(len(s).to_bytes(8, 'little'))
+        h.update(np.ascontiguousarray(s, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def _render_boxplot(job) -> str:
+    """Zadanie workera: narysuj boxplot (Agg, obiektowe API) i zapisz PNG."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    metric, conditions, series, out = job
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_title(f'{metric}: comparison across conditions')
+    ax.boxplot(series)
+    ax.set_xticks(range(1, len(conditions) + 1))
+    ax.set_xticklabels(conditions)
+    ax.set_ylabel(metric)
+    fig.savefig(out, bbox_inches='tight')
+    return str(out)
+
+
+def save_boxplots(outdir: Path, metrics: list[str], data_by_cond: dict[str, ResultColumns], workers: int = 0,
+                  force: bool = False):
+    """
+    Dla każdej metryki zapisz boxplot z porównaniem dostępnych warunków.
+
+    :param workers: liczba procesów (0 = liczba CPU, 1 = w bieżącym procesie)
+    :param force: rysuj także wykresy, których dane się nie zmieniły
+    """
     conditions = sorted(data_by_cond.keys())
+    cache_file = outdir / _PLOT_CACHE
+    try:
+        cache = json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        cache = {}
+
+    jobs, hashes = [], {}
     for m in metrics:
-        series = [to_float_list(data_by_cond[c], m) for c in conditions]
+        series = [to_array(data_by_cond[c], m) for c in conditions]
         # Pomiń metryki bez danych
         if not any(len(s) for s in series):
             print(f'Skip {m} (no data)')
             continue
-        plt.figure()
-        plt.title(f'{m}: comparison across conditions')
-        plt.boxplot(series, labels=conditions)
-        plt.ylabel(m)
         out = outdir / f'{m}_boxplot.png'
-        plt.savefig(out, bbox_inches='tight')
-        plt.close()
+        digest = _boxplot_hash(m, conditions, series)
+        if not force and out.exists() and cache.get(out.name) == digest:
+            print('Unchanged', out)
+            continue
+        jobs.append((m, conditions, series, out))
+        hashes[out.name] = digest
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            saved = list(ex.map(_render_boxplot, jobs))
+    else:
+        saved = [_render_boxplot(job) for job in jobs]
+    for out in saved:
         print('Saved', out)
 
+    if jobs:
+        cache.update(hashes)
+        cache_file.write_text(json.dumps(cache, indent=1, sort_keys=True))
+
 
 def main():
     args = parse_args()
@@ -112,11 +316,13 @@ def main():
 
     data_by_cond = read_results(outdir)
     if not data_by_cond:
-        print(f'Brak plików results_*.csv w {outdir}')
+        print(f'Brak plików results_*.csv / results_*.npy w {outdir}')
         return
 
-    save_boxplots(outdir, metrics, data_by_cond)
-    write_summary(outdir, metrics, data_by_cond)
+    if not args.no_plots:
+        save_boxplots(outdir, metrics, data_by_cond, args.plot_workers, args.force_plots)
+    write_summary(outdir, metrics, data_by_cond, args.n_boot, args.ci_level, args.boot_seed)
+    write_comparison(outdir, compare_conditions(metrics, data_by_cond, args.n_boot, args.ci_level, args.boot_seed))
 
 
 if __name__ == '__main__':
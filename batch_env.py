@@ -0,0 +1,130 @@
+"""
+batch_env.py — wektorowa (NumPy) wersja GridEnv dla N epizodów krokowanych równolegle.
+
+Interfejs odpowiada GridEnv, ale każda metoda działa na wszystkich epizodach naraz:
+- klasa BatchGridEnv(seeds, width, height)
+- metody: reset_positions(), dist(), step_player(actions), step_npc(actions), tick_cooldowns()
+
+Różnice względem GridEnv:
+- pozycje to tablice (N, 2) [x, y], HP i cooldowny to tablice (N,)
+- akcje podajemy jako tablicę kodów całkowitych (indeks w ACTIONS, NOOP = -1 → brak akcji)
+
+Deterministyka: epizod i losuje pozycje startowe z własnego random.Random(seeds[i]),
+dokładnie tak jak GridEnv(seed=seeds[i]) — wyniki są identyczne dla tych samych seedów.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Optional
+import random
+
+import numpy as np
+
+from env import ACTION_INDEX, NOOP
+
+ATTACK = ACTION_INDEX['ATTACK']
+SKILL = ACTION_INDEX['SKILL']
+
+# Przesunięcia ruchów o 1 pole, indeksowane kodem akcji; ostatni element obsługuje NOOP (-1)
+_MOVE_DX = np.zeros(len(ACTION_INDEX) + 1, dtype=np.int32)
+_MOVE_DY = np.zeros(len(ACTION_INDEX) + 1, dtype=np.int32)
+_MOVE_DX[ACTION_INDEX['MOVE_left']] = -1
+_MOVE_DX[ACTION_INDEX['MOVE_right']] = 1
+_MOVE_DY[ACTION_INDEX['MOVE_up']] = -1
+_MOVE_DY[ACTION_INDEX['MOVE_down']] = 1
+
+
+def encode_actions(actions: Iterable[Optional[str]]) -> np.ndarray:
+    """Zamień listę nazw akcji (lub None) na tablicę kodów całkowitych."""
+    return np.array([NOOP if a is None else ACTION_INDEX.get(a, NOOP) for a in actions], dtype=np.int32)
+
+
+class BatchGridEnv:
+    def __init__(self, seeds: Iterable[int], width: int = 45, height: int = 15):
+        """N niezależnych plansz width×height; epizod i odpowiada GridEnv(seed=seeds[i])."""
+        self.w = int(width)
+        self.h = int(height)
+        self.seeds = [int(s) for s in seeds]
+        self.n = len(self.seeds)
+        self.rngs = [random.Random(s) for s in self.seeds]
+
+        # Parametry „gry” (jak w GridEnv)
+        self.max_hp_player = 10
+        self.max_hp_npc = 10
+        self.skill_cd_len_player = 5
+        self.skill_cd_len_npc = 5
+
+        # Stan bieżący (struktura tablic)
+        self.player = np.zeros((self.n, 2), dtype=np.int32)
+        self.npc = np.zeros((self.n, 2), dtype=np.int32)
+        self.player_hp = np.zeros(self.n, dtype=np.int32)
+        self.npc_hp = np.zeros(self.n, dtype=np.int32)
+        self.skill_cd_player = np.zeros(self.n, dtype=np.int32)
+        self.skill_cd_npc = np.zeros(self.n, dtype=np.int32)
+
+        self.reset_positions()
+
+    # ---------------------------
+    # API środowiska
+    # ---------------------------
+    def reset_positions(self) -> None:
+        """Wylosuj różne pola startowe (te same losowania co GridEnv) i zresetuj HP/CD."""
+        w, h = self.w, self.h
+        for i, rng in enumerate(self.rngs):
+            player = [rng.randrange(w), rng.randrange(h)]
+            npc = [rng.randrange(w), rng.randrange(h)]
+            while npc == player:
+                npc = [rng.randrange(w), rng.randrange(h)]
+            self.player[i] = player
+            self.npc[i] = npc
+
+        self.player_hp[:] = self.max_hp_player
+        self.npc_hp[:] = self.max_hp_npc
+        self.skill_cd_player[:] = 0
+        self.skill_cd_npc[:] = 0
+
+    def dist(self) -> np.ndarray:
+        """Odległość manhattan między graczem a NPC (tablica (N,))."""
+        return np.abs(self.player[:, 0] - self.npc[:, 0]) + np.abs(self.player[:, 1] - self.npc[:, 1])
+
+    # ---------------------------
+    # Ruchy gracza i NPC
+    # ---------------------------
+    def step_player(self, actions) -> None:
+        """Wykonaj akcje gracza (tablica kodów (N,)) we wszystkich epizodach."""
+        self._step(self.player, np.asarray(actions), self.skill_cd_player, self.skill_cd_len_player, self.npc_hp)
+
+    def step_npc(self, actions) -> None:
+        """Wykonaj akcje NPC (tablica kodów (N,); NOOP = brak akcji)."""
+        self._step(self.npc, np.asarray(actions), self.skill_cd_npc, self.skill_cd_len_npc, self.player_hp)
+
+    def tick_cooldowns(self) -> None:
+        """Zmniejsz cooldowny umiejętności (nie mniej niż 0)."""
+        self.skill_cd_player -= self.skill_cd_player > 0
+        self.skill_cd_npc -= self.skill_cd_npc > 0
+
+    # ---------------------------
+    # Narzędzia pomocnicze
+    # ---------------------------
+    def _step(self, actor: np.ndarray, actions: np.ndarray, cd: np.ndarray, cd_len: int,
+              victim_hp: np.ndarray) -> None:
+        """Wspólna logika kroku: ATTACK obok przeciwnika, SKILL (dash/leap o 2 pola), ruch o 1 pole."""
+        # ATTACK: jeśli dystans manhattan = 1, zadaj 1 pkt obrażeń przeciwnikowi
+        victim_hp -= (actions == ATTACK) & (self.dist() == 1)
+
+        dx_move = _MOVE_DX[actions]
+        dy_move = _MOVE_DY[actions]
+
+        # SKILL: tylko przy CD == 0; zarówno dash gracza („od” NPC), jak i leap NPC („do” gracza)
+        # to krok ±2 wzdłuż osi o większym |delta| ze znakiem (player - npc)
+        skill = (actions == SKILL) & (cd == 0)
+        if skill.any():
+            cd[skill] = cd_len
+            dx = self.player[:, 0] - self.npc[:, 0]
+            dy = self.player[:, 1] - self.npc[:, 1]
+            horizontal = np.abs(dx) >= np.abs(dy)
+            dx_move = dx_move + np.where(skill & horizontal, np.where(dx > 0, 2, -2), 0)
+            dy_move = dy_move + np.where(skill & ~horizontal, np.where(dy > 0, 2, -2), 0)
+
+        np.clip(actor[:, 0] + dx_move, 0, self.w - 1, out=actor[:, 0])
+        np.clip(actor[:, 1] + dy_move, 0, self.h - 1, out=actor[:, 1])
@@ -0,0 +1,176 @@
+"""
+batch_player.py — wektorowa (NumPy) wersja ScriptedPlayer dla N epizodów BatchGridEnv naraz.
+
+Interfejs:
+- klasa BatchScriptedPlayer(episodes, rng_seed=0, p_attack_adjacent=..., ..., move_policy='away')
+- konstruktor BatchScriptedPlayer.from_kwargs(episodes, player_kwargs) — parametry per epizod ze słowników
+- metoda act_codes(env, light) -> tablica kodów akcji (N,)
+- metody snapshot() / restore(snap) — stan strumieni losowych
+
+Parametry gracza mogą być skalarami albo tablicami (N,) — jeden batch może więc pokryć cały
+sweep parametrów (epizod i ma własne p_attack_adjacent[i], move_policy[i], ...).
+
+Reguły decyzji są te same co w ScriptedPlayer (atak obok NPC, SKILL zależny od fazy przy CD == 0,
+krok losowy z prawd. jitter_move_prob albo polityka 'away' / 'towards' / 'random'), ale wyliczane
+maskami dla wszystkich epizodów naraz. Losowość to strumienie rng_streams kluczowane
+(rng_seed, episodes[i], STREAM_PLAYER) z dokładnie 4 liczbami na tick — epizod i daje te same
+akcje co ScriptedPlayer(rng_seed, rng_mode='philox', rng_episode=episodes[i]).
+"""
+
+from __future__ import annotations
+
+import inspect
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+
+from env import Action
+from player import _MOVE_CODES
+from rng_streams import DRAWS_PER_TICK, STREAM_PLAYER, philox_generator
+
+ATTACK = int(Action.ATTACK)
+SKILL = int(Action.SKILL)
+
+MOVE_POLICIES = ('away', 'towards', 'random')
+_AWAY, _TOWARDS, _RANDOM = range(len(MOVE_POLICIES))
+
+# Ruch polityki: [towards, oś pozioma (|dx| >= |dy|), delta na tej osi > 0] -> kod akcji
+_POLICY_MOVE = np.zeros((2, 2, 2), dtype=np.int32)
+_POLICY_MOVE[0, 1] = [Action.MOVE_left, Action.MOVE_right]
+_POLICY_MOVE[0, 0] = [Action.MOVE_up, Action.MOVE_down]
+_POLICY_MOVE[1, 1] = [Action.MOVE_right, Action.MOVE_left]
+_POLICY_MOVE[1, 0] = [Action.MOVE_down, Action.MOVE_up]
+
+_RANDOM_MOVES = np.array(_MOVE_CODES, dtype=np.int32)
+
+_TRANSPOSE_CHUNK = 64
+
+_PLAYER_PARAMS = ('p_attack_adjacent', 'p_skill_light', 'p_skill_dark', 'move_policy', 'jitter_move_prob')
+
+Param = Union[float, Sequence[float], np.ndarray]
+
+
+class BatchScriptedPlayer:
+    def __init__(
+        self,
+        episodes: Iterable[int],
+        rng_seed: int = 0,
+        p_attack_adjacent: Param = 0.6,
+        p_skill_light: Param = 0.12,
+        p_skill_dark: Param = 0.04,
+        move_policy: Union[str, Sequence[str]] = 'away',
+        jitter_move_prob: Param = 0.15,
+        block_ticks: int = 128,
+    ) -> None:
+        """
+        :param episodes: numery epizodów w kluczu strumieni (jak rng_episode ScriptedPlayer; zwykle seedy)
+        :param rng_seed: ziarno strumieni (wspólne dla batcha)
+        :param p_attack_adjacent: prawd. ATTACK gdy dystans==1 (skalar lub tablica (N,))
+        :param p_skill_light: prawd. użycia SKILL w fazie LIGHT (skalar lub tablica (N,))
+        :param p_skill_dark: prawd. użycia SKILL w fazie DARK (skalar lub tablica (N,))
+        :param move_policy: 'away' / 'towards' / 'random' albo lista takich nazw (N,)
+        :param jitter_move_prob: prawd. kroku losowego (skalar lub tablica (N,))
+        :param block_ticks: liczba ticków losowanych naraz (nie wpływa na wartości; bufor to 32 * block_ticks bajtów na epizod)
+        """
+        self.episodes = [int(e) for e in episodes]
+        self.n = len(self.episodes)
+        self.p_attack_adjacent = self._param(p_attack_adjacent)
+        self.p_skill_light = self._param(p_skill_light)
+        self.p_skill_dark = self._param(p_skill_dark)
+        self.jitter_move_prob = self._param(jitter_move_prob)
+
+        policies = [move_policy] * self.n if isinstance(move_policy, str) else list(move_policy)
+        if len(policies) != self.n:
+            raise ValueError(f'move_policy: oczekiwano {self.n} wartości (podano {len(policies)})')
+        unknown = set(policies) - set(MOVE_POLICIES)
+        if unknown:
+            raise ValueError(f'Nieznana polityka ruchu: {", ".join(sorted(unknown))}')
+        codes = np.array([MOVE_POLICIES.index(p) for p in policies], dtype=np.int32)
+        self.towards = codes == _TOWARDS
+        self.random_policy = codes == _RANDOM
+
+        self.gens = [philox_generator(rng_seed, e, STREAM_PLAYER) for e in self.episodes]
+        self.block_ticks = int(block_ticks)
+        self.buf = np.empty((0, DRAWS_PER_TICK, self.n))
+        self.i = 0
+
+    @classmethod
+    def from_kwargs(cls, episodes: Iterable[int], player_kwargs: Sequence[dict], rng_seed: int = 0,
+                    block_ticks: int = 128) -> 'BatchScriptedPlayer':
+        """
+        Batch z parametrów per epizod (np. punkty sweepu rozwinięte po seedach).
+
+        :param player_kwargs: słownik parametrów ScriptedPlayer dla każdego epizodu (brak klucza = domyślna)
+        """
+        episodes = list(episodes)
+        if len(player_kwargs) != len(episodes):
+            raise ValueError(f'player_kwargs: oczekiwano {len(episodes)} słowników (podano {len(player_kwargs)})')
+        defaults = {n: p.default for n, p in inspect.signature(cls.__init__).parameters.items()
+                    if n in _PLAYER_PARAMS}
+        unknown = {k for kw in player_kwargs for k in kw} - set(defaults)
+        if unknown:
+            raise ValueError(f'Nieznany parametr gracza: {", ".join(sorted(unknown))}')
+        params = {n: [kw.get(n, d) for kw in player_kwargs] for n, d in defaults.items()}
+        return cls(episodes, rng_seed, block_ticks=block_ticks, **params)
+
+    def _param(self, value: Param) -> np.ndarray:
+        arr = np.asarray(value, dtype=np.float64)
+        if arr.ndim and arr.shape != (self.n,):
+            raise ValueError(f'Parametr gracza: oczekiwano skalara lub tablicy ({self.n},), podano {arr.shape}')
+        return np.broadcast_to(arr, (self.n,))
+
+    # ---------------------------
+    # Losowość
+    # ---------------------------
+    def _refill(self) -> None:
+        """Wylosuj kolejne block_ticks ticków dla każdego epizodu.
+
+        Bufor ma układ (tick, liczba, epizod), więc liczby jednego ticka to ciągłe wiersze długości N.
+        """
+        size = self.block_ticks * DRAWS_PER_TICK
+        buf = np.empty((size, self.n))
+        # transpozycja paczkami epizodów — pełna (N × size) przechodzi przez pamięć wielokrotnie wolniej
+        for lo in range(0, self.n, _TRANSPOSE_CHUNK):
+            gens = self.gens[lo:lo + _TRANSPOSE_CHUNK]
+            buf[:, lo:lo + len(gens)] = np.stack([g.random(size) for g in gens]).T
+        self.buf = buf.reshape(self.block_ticks, DRAWS_PER_TICK, self.n)
+        self.i = 0
+
+    def snapshot(self):
+        """Zrzut stanu strumieni (stany generatorów, bieżący blok, pozycja w bloku)."""
+        return [g.bit_generator.state for g in self.gens], self.buf, self.i
+
+    def restore(self, snap) -> None:
+        states, self.buf, self.i = snap
+        for g, state in zip(self.gens, states):
+            g.bit_generator.state = state
+
+    # ---------------------------
+    # Decyzje
+    # ---------------------------
+    def act_codes(self, env, light) -> np.ndarray:
+        """
+        Akcje gracza dla wszystkich epizodów na bieżącym ticku.
+
+        :param env: BatchGridEnv (pozycje (N, 2), skill_cd_player (N,))
+        :param light: faza LIGHT — bool albo tablica (N,) (epizody mogą być w różnych fazach)
+        :return: tablica kodów akcji (N,)
+        """
+        if self.i >= len(self.buf):
+            self._refill()
+        u_attack, u_skill, u_jitter, u_move = self.buf[self.i]
+        self.i += 1
+
+        dx = env.player[:, 0] - env.npc[:, 0]
+        dy = env.player[:, 1] - env.npc[:, 1]
+        horizontal = np.abs(dx) >= np.abs(dy)
+        positive = np.where(horizontal, dx > 0, dy > 0)
+        codes = _POLICY_MOVE[self.towards.view(np.int8), horizontal.view(np.int8), positive.view(np.int8)]
+
+        jitter = (u_jitter < self.jitter_move_prob) | self.random_policy
+        codes = np.where(jitter, _RANDOM_MOVES[(u_move * len(_RANDOM_MOVES)).astype(np.int32)], codes)
+
+        p_skill = np.where(light, self.p_skill_light, self.p_skill_dark)
+        codes[(env.skill_cd_player == 0) & (u_skill < p_skill)] = SKILL
+        codes[(np.abs(dx) + np.abs(dy) == 1) & (u_attack < self.p_attack_adjacent)] = ATTACK
+        return codes
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+branching.py — kontrfaktyczne rozgałęzianie epizodów: wspólny prefiks liczony raz, wiele kontynuacji.
+
+Pytanie typu „co gdyby NPC miał pamięć od cyklu c” wymagało dotąd dwóch pełnych epizodów od ticka 0.
+Tutaj prefiks (cykle 1..fork_cycle) jest symulowany raz, stan pętli zapisywany przez
+experiment.Episode.snapshot(), a każda gałąź startuje z restore() tego zrzutu (stan środowiska
+i RNG gracza, pamięć LIGHT, akumulatory metryk).
+
+Interfejs:
+- funkcja run_branches(seed, fork_cycle, branches, prefix_condition='baseline', cycles=20, **episode_kwargs)
+    -> wiersze (seed, condition, metryki) — jeden na gałąź
+- funkcja run_branch_experiments(seeds, fork_cycle, branches, ..., workers=1) -> {etykieta: wiersze}
+
+Gałąź to słownik: condition (warunek od cyklu fork_cycle + 1), opcjonalnie agent_kwargs
+(nowy BTGatedAgent) i player_kwargs (zmiana parametrów ScriptedPlayer, bez zmiany stanu RNG),
+label (nazwa w wynikach). Gałąź bez zmian względem prefiksu daje wynik identyczny z
+run_single_experiment dla tego samego warunku.
+
+Użycie:
+  python branching.py --seeds 0-49 --fork_cycle 5 --prefix_condition baseline --branches memory,baseline
+      # -> data/results_fork5_memory.csv, data/results_fork5_baseline.csv (czytane przez analysis_plot.py)
+  python branching.py --fork_cycle 10 --branches memory --skill_min_distance 2,3,4
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from agent import BTGatedAgent
+from experiment import RESULT_FORMATS, Episode, write_results
+from run_experiment import to_seed_list
+
+
+def branch_label(branch: Dict[str, Any], fork_cycle: int) -> str:
+    """Etykieta gałęzi (nazwa pliku results_{etykieta}.csv)."""
+    if 'label' in branch:
+        return branch['label']
+    parts = [f'fork{fork_cycle}', branch['condition']]
+    for k, v in sorted({**branch.get('agent_kwargs', {}), **branch.get('player_kwargs', {})}.items()):
+        parts.append(f'{k}{v}')
+    return '_'.join(parts)
+
+
+def run_branches(seed: int, fork_cycle: int, branches: Sequence[Dict[str, Any]], prefix_condition: str = 'baseline',
+                 cycles: int = 20, **episode_kwargs) -> List[dict]:
+    """
+    Jeden prefiks (cykle 1..fork_cycle w warunku prefix_condition) i kontynuacje do `cycles` per gałąź.
+
+    :param branches: lista gałęzi {'condition', opcjonalnie 'agent_kwargs', 'player_kwargs', 'label'}
+    :param episode_kwargs: parametry experiment.Episode (light_ticks, memory_k, ...)
+    :return: wiersz (seed, condition=etykieta gałęzi, metryki) dla każdej gałęzi
+    """
+    if not 0 <= fork_cycle <= cycles:
+        raise ValueError(f'fork_cycle musi być w zakresie 0..{cycles} (podano {fork_cycle})')
+    episode = Episode(seed, condition=prefix_condition, **episode_kwargs)
+    episode.run(fork_cycle)
+    snap = episode.snapshot()
+
+    rows = []
+    for branch in branches:
+        episode.restore(snap)
+        episode.condition = branch['condition']
+        if 'agent_kwargs' in branch:
+            episode.agent = BTGatedAgent(**branch['agent_kwargs'])
+        player_kwargs = branch.get('player_kwargs', {})
+        saved = {}
+        for name, value in player_kwargs.items():
+            if not hasattr(episode.player, name) or name == 'rng':
+                raise ValueError(f'Nieznany parametr gracza: {name!r}')
+            saved[name] = getattr(episode.player, name)
+            setattr(episode.player, name, value)
+        episode.run(cycles - fork_cycle)
+        row = {'seed': seed, 'condition': branch_label(branch, fork_cycle)}
+        row.update(episode.metrics())
+        rows.append(row)
+        for name, value in saved.items():  # parametry gracza nie są częścią zrzutu
+            setattr(episode.player, name, value)
+    return rows
+
+
+def _run_seed(seed: int, fork_cycle: int, branches, prefix_condition: str, cycles: int, episode_kwargs) -> List[dict]:
+    return run_branches(seed, fork_cycle, branches, prefix_condition, cycles, **episode_kwargs)
+
+
+def run_branch_experiments(seeds: Sequence[int], fork_cycle: int, branches: Sequence[Dict[str, Any]],
+                           prefix_condition: str = 'baseline', cycles: int = 20, workers: int = 1,
+                           **episode_kwargs) -> Dict[str, List[dict]]:
+    """Rozgałęzienia dla wielu seedów (opcjonalnie w puli procesów); wiersze pogrupowane po etykiecie gałęzi."""
+    job = partial(_run_seed, fork_cycle=fork_cycle, branches=list(branches), prefix_condition=prefix_condition,
+                  cycles=cycles, episode_kwargs=episode_kwargs)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            per_seed = list(ex.map(job, seeds, chunksize=max(1, len(seeds) // (4 * workers))))
+    else:
+        per_seed = [job(s) for s in seeds]
+    out: Dict[str, List[dict]] = {branch_label(b, fork_cycle): [] for b in branches}
+    for rows in per_seed:
+        for row in rows:
+            out[row['condition']].append(row)
+    return out
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Kontrfaktyczne rozgałęzianie epizodów (wspólny prefiks)')
+    p.add_argument('--outdir', type=str, default='data', help='Katalog wyjściowy na CSV')
+    p.add_argument('--seeds', type=str, default='0-49', help='Lista seedów (np. 0-49 albo 0,1,5)')
+    p.add_argument('--cycles', type=int, default=20, help='Liczba cykli LIGHT/DARK w epizodzie')
+    p.add_argument('--light_ticks', type=int, default=10, help='Długość fazy LIGHT (ticki)')
+    p.add_argument('--dark_ticks', type=int, default=10, help='Długość fazy DARK (ticki)')
+    p.add_argument('--memory_k', type=int, default=1, help='Liczba pamiętanych faz LIGHT')
+    p.add_argument('--fork_cycle', type=int, required=True, help='Ostatni cykl wspólnego prefiksu')
+    p.add_argument('--prefix_condition', type=str, default='baseline', help='Warunek prefiksu')
+    p.add_argument('--branches', type=str, default='memory,baseline', help='Warunki gałęzi od cyklu fork_cycle + 1')
+    p.add_argument('--skill_min_distance', type=str, default='', help='Opcjonalna lista wartości dla gałęzi (np. 2,3,4)')
+    p.add_argument('--format', type=str, default='csv', choices=RESULT_FORMATS, help='Format wyników: csv, npy lub both')
+    p.add_argument('--workers', type=int, default=1, help='Liczba procesów (1 = szeregowo)')
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    seeds = to_seed_list(args.seeds)
+
+    branches = []
+    for cond in [c.strip() for c in args.branches.split(',') if c.strip()]:
+        if args.skill_min_distance:
+            for d in to_seed_list(args.skill_min_distance):
+                branches.append({'condition': cond, 'agent_kwargs': {'skill_min_distance': d}})
+        else:
+            branches.append({'condition': cond})
+
+    rows_by_label = run_branch_experiments(seeds, args.fork_cycle, branches, args.prefix_condition, args.cycles,
+                                           args.workers, light_ticks=args.light_ticks, dark_ticks=args.dark_ticks,
+                                           memory_k=args.memory_k)
+    for label, rows in rows_by_label.items():
+        for written in write_results(outdir / f'results_{label}.csv', rows, args.format):
+            print(f'Wrote {written} ({len(rows)} wierszy)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+columnar.py — kolumnowy, binarny format wyników epizodów (NumPy .npy + metadane .json).
+
+Interfejs:
+- klasa ResultColumns(names, data, condition, int_columns) — kolumny liczbowe jednej serii wyników
+    * column(name) -> np.ndarray (float64, widok bez kopiowania), len(), `name in cols`
+    * rows() -> wiersze jako słowniki (eksport CSV)
+- funkcja columns_from_rows(rows) -> ResultColumns
+- funkcja write_columns(path, cols)          — results_{etykieta}.npy + results_{etykieta}.json
+- funkcja load_columns(path) -> ResultColumns — memmapa tylko do odczytu (bez parsowania)
+- funkcja read_csv_columns(path) -> ResultColumns — results_*.csv wczytany raz do kolumn
+- funkcja export_csv(cols, path)             — CSV w układzie results_*.csv
+
+Dane to macierz float64 (kolumny, epizody): każda kolumna jest ciągła w pamięci, więc redukcje
+po jednej metryce czytają tylko jej bajty. Warunek (tekst) i kolejność kolumn CSV są w pliku .json;
+kolumny całkowite (seed) są eksportowane jako int. CSV pozostaje formatem eksportu.
+
+Użycie:
+  python run_experiment.py --format npy            # -> data/results_{etykieta}.npy (+ .json)
+  python columnar.py data/results_memory.npy --csv data/results_memory.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+class ResultColumns:
+    def __init__(self, names: Sequence[str], data: np.ndarray, condition: str = '',
+                 int_columns: Sequence[str] = (), order: Optional[Sequence[str]] = None) -> None:
+        """
+        :param names: nazwy kolumn liczbowych (wiersze macierzy data)
+        :param data: macierz float64 (len(names), liczba epizodów)
+        :param condition: warunek serii (kolumna tekstowa CSV)
+        :param int_columns: kolumny o wartościach całkowitych (np. seed)
+        :param order: kolejność kolumn w CSV (z 'condition'); domyślnie names
+        """
+        self.names = list(names)
+        self.data = data
+        self.condition = condition
+        self.int_columns = list(int_columns)
+        self.order = list(order) if order is not None else self.names
+        self._index = {n: i for i, n in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return self.data.shape[1]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def column(self, name: str) -> np.ndarray:
+        """Kolumna jako tablica float64 (widok; NaN = brak wartości)."""
+        return self.data[self._index[name]]
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Wiersze jako słowniki w kolejności kolumn CSV."""
+        cols = {n: (self.column(n).astype(np.int64) if n in self.int_columns else self.column(n)).tolist()
+                for n in self.names}
+        for i in range(len(self)):
+            yield {n: self.condition if n == 'condition' else cols[n][i] for n in self.order}
+
+
+def columns_from_rows(rows: List[Dict[str, Any]]) -> ResultColumns:
+    """Kolumny z wierszy run_experiments (seed, condition, metryki...)."""
+    order = list(rows[0].keys())
+    names = [n for n in order if n != 'condition']
+    data = np.array([[row[n] for row in rows] for n in names], dtype=np.float64).reshape(len(names), len(rows))
+    int_columns = [n for n in names if isinstance(rows[0][n], (int, np.integer)) and not isinstance(rows[0][n], bool)]
+    return ResultColumns(names, data, rows[0].get('condition', ''), int_columns, order)
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix('.json')
+
+
+def write_columns(path, cols: ResultColumns) -> None:
+    """Zapisz macierz kolumn (.npy) i metadane (.json obok)."""
+    path = Path(path)
+    np.save(path, np.ascontiguousarray(cols.data, dtype=np.float64))
+    meta = {'columns': cols.names, 'order': cols.order, 'condition': cols.condition, 'int_columns': cols.int_columns}
+    _meta_path(path).write_text(json.dumps(meta, indent=1))
+
+
+def load_columns(path) -> ResultColumns:
+    """Zmapuj plik kolumn z dysku (tylko do odczytu) — bez wczytywania i parsowania wartości."""
+    path = Path(path)
+    meta = json.loads(_meta_path(path).read_text())
+    data = np.load(path, mmap_mode='r')
+    return ResultColumns(meta['columns'], data, meta.get('condition', ''), meta.get('int_columns', ()),
+                         meta.get('order'))
+
+
+def read_csv_columns(path) -> ResultColumns:
+    """Wczytaj results_*.csv do kolumn (wartości nieliczbowe/puste -> NaN, 'condition' jako tekst)."""
+    with Path(path).open(newline='') as fh:
+        reader = csv.reader(fh)
+        header = next(reader, [])
+        raw = list(reader)
+    names = [n for n in header if n != 'condition']
+    idx = [header.index(n) for n in names]
+    data = np.full((len(names), len(raw)), np.nan)
+    for j, i in enumerate(idx):
+        col = [r[i] if i < len(r) else '' for r in raw]
+        try:
+            data[j] = np.array(col, dtype=np.float64)
+        except ValueError:
+            for k, v in enumerate(col):
+                try:
+                    data[j, k] = float(v)
+                except ValueError:
+                    pass
+    condition = raw[0][header.index('condition')] if raw and 'condition' in header else ''
+    int_columns = [n for n in ('seed',) if n in names]
+    return ResultColumns(names, data, condition, int_columns, header)
+
+
+def export_csv(cols: ResultColumns, path) -> None:
+    """Zapisz kolumny jako CSV w układzie results_*.csv."""
+    with Path(path).open('w', newline='') as fh:
+        w = csv.DictWriter(fh, fieldnames=cols.order)
+        w.writeheader()
+        w.writerows(cols.rows())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Eksport kolumnowych wyników (.npy) do CSV')
+    ap.add_argument('path', type=str, help='Plik results_*.npy')
+    ap.add_argument('--csv', type=str, required=True, help='Docelowy plik CSV')
+    args = ap.parse_args()
+    cols = load_columns(args.path)
+    export_csv(cols, args.csv)
+    print(f'Wrote {args.csv} ({len(cols)} wierszy)')
+
+
+if __name__ == '__main__':
+    main()
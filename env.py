@@ -2,8 +2,10 @@
 env.py — minimalne środowisko siatkowe dla eksperymentu ECHO-like.
 
 Interfejs jest kompatybilny z resztą projektu:
-- stała ACTIONS
+- stała ACTIONS (nazwy) oraz Action (IntEnum) i maski bitowe zbiorów akcji (ALL_MASK, LEARNABLE_MASK, MOVES_MASK)
 - klasa GridEnv(width, height, seed)
+- klasa CompactGridEnv(width, height, seed) — ten sam interfejs, pozycje jako indeksy pól (cell = y*w + x)
+  i pary pól, przejścia z prekomputowanych tablic CellTables (zrzut stanu jako GridState)
 - metody: reset_positions(), dist(), step_player(action), step_npc(action), tick_cooldowns()
 
 Semantyka akcji (manhattan grid):
@@ -14,18 +16,67 @@ Semantyka akcji (manhattan grid):
     * NPC: ofensywny leap o 2 pola „w stronę” gracza.
   Obie umiejętności mają niezależny cooldown (domyślnie 5 ticków).
 
+Akcje przekazujemy jako kody Action (int); nazwy (str) są nadal akceptowane dla zgodności.
+
 Uwaga na deterministykę: używamy własnego RNG (random.Random(seed)).
 """
 
 from __future__ import annotations
 
-from typing import List
+from enum import IntEnum
+from typing import Dict, Iterable, List, Tuple, Union
 import random
 
 LEARNABLE: set[str] = {'ATTACK', 'SKILL'}
 MOVES_ONLY: set[str] = {'MOVE_up', 'MOVE_down', 'MOVE_right', 'MOVE_left'}
 ACTIONS: List[str] = ['MOVE_up', 'MOVE_down', 'MOVE_right', 'MOVE_left', 'ATTACK', 'SKILL']
 
+
+class Action(IntEnum):
+    """Kody całkowite akcji (indeks w ACTIONS); bit akcji w masce to 1 << kod."""
+    MOVE_up = 0
+    MOVE_down = 1
+    MOVE_right = 2
+    MOVE_left = 3
+    ATTACK = 4
+    SKILL = 5
+
+
+# Kody całkowite akcji (indeks w ACTIONS) — używane przez wersje wektorowe (batch_env.py)
+ACTION_INDEX: Dict[str, int] = {a: i for i, a in enumerate(ACTIONS)}
+NOOP: int = -1  # „brak akcji” (np. agent zwrócił None)
+
+# Zbiory akcji jako maski bitowe: przynależność = AND, liczność = popcount
+ALL_MASK: int = (1 << len(ACTIONS)) - 1
+LEARNABLE_MASK: int = (1 << Action.ATTACK) | (1 << Action.SKILL)
+MOVES_MASK: int = ALL_MASK & ~LEARNABLE_MASK
+
+
+def mask_of(actions: Iterable[Union[str, int]]) -> int:
+    """Zamień zbiór akcji (nazwy lub kody) na maskę bitową."""
+    mask = 0
+    for a in actions:
+        mask |= 1 << (ACTION_INDEX[a] if isinstance(a, str) else int(a))
+    return mask
+
+
+def actions_of(mask: int) -> List[str]:
+    """Nazwy akcji z maski (w kolejności ACTIONS) — warstwa zgodności dla CSV/viewera."""
+    return [a for i, a in enumerate(ACTIONS) if mask >> i & 1]
+
+
+def popcount(mask: int) -> int:
+    """Liczba akcji w masce."""
+    return mask.bit_count()
+
+
+# Przesunięcia ruchów o 1 pole, indeksowane kodem akcji (ATTACK/SKILL → brak ruchu)
+_MOVE_DELTA = ((0, -1), (0, 1), (1, 0), (-1, 0), (0, 0), (0, 0))
+_ATTACK = int(Action.ATTACK)
+_SKILL = int(Action.SKILL)
+_N_ACTIONS = len(ACTIONS)
+
+
 class GridEnv:
     def __init__(self, width: int = 45, height: int = 15, seed: int = 0):
         """Prosta plansza width×height. Pozycje to [x, y] (listy, żeby zachować kompatybilność)."""
@@ -82,14 +133,19 @@ class GridEnv:
     # ---------------------------
     # Ruchy gracza i NPC
     # ---------------------------
-    def step_player(self, action: str) -> None:
-        """Wykonaj akcję gracza i zaktualizuj stan."""
-        if action == 'ATTACK':
+    def step_player(self, action: Union[int, str, None]) -> None:
+        """Wykonaj akcję gracza (kod Action lub nazwa) i zaktualizuj stan."""
+        if action is None:
+            return
+        if isinstance(action, str):
+            action = ACTION_INDEX.get(action, NOOP)
+
+        if action == _ATTACK:
             if self.dist() == 1:
                 self.npc_hp -= 1
             return
 
-        if action == 'SKILL':
+        if action == _SKILL:
             if self.skill_cd_player == 0:
                 self.skill_cd_player = self.skill_cd_len_player
                 # dash „od” NPC o 2 pola wzdłuż osi o większej wartości bezwzględnej
@@ -105,26 +161,24 @@ class GridEnv:
             return
 
         # Ruch o 1 pole
-        if action == 'MOVE_up':
-            nx, ny = self.player[0], self.player[1] - 1
-        elif action == 'MOVE_down':
-            nx, ny = self.player[0], self.player[1] + 1
-        elif action == 'MOVE_left':
-            nx, ny = self.player[0] - 1, self.player[1]
-        elif action == 'MOVE_right':
-            nx, ny = self.player[0] + 1, self.player[1]
-        else:
+        if not 0 <= action < _ATTACK:
             return  # nieznana akcja → ignorujemy
-        self.player[0], self.player[1] = self._clamp_xy(nx, ny)
+        mx, my = _MOVE_DELTA[action]
+        self.player[0], self.player[1] = self._clamp_xy(self.player[0] + mx, self.player[1] + my)
+
+    def step_npc(self, action: Union[int, str, None]) -> None:
+        """Wykonaj akcję NPC (kod Action lub nazwa; None/NOOP = brak akcji) i zaktualizuj stan."""
+        if action is None:
+            return
+        if isinstance(action, str):
+            action = ACTION_INDEX.get(action, NOOP)
 
-    def step_npc(self, action: str) -> None:
-        """Wykonaj akcję NPC i zaktualizuj stan."""
-        if action == 'ATTACK':
+        if action == _ATTACK:
             if self.dist() == 1:
                 self.player_hp -= 1
             return
 
-        if action == 'SKILL':
+        if action == _SKILL:
             if self.skill_cd_npc == 0:
                 self.skill_cd_npc = self.skill_cd_len_npc
                 # leap „do” gracza o 2 pola wzdłuż osi o większej wartości bezwzględnej
@@ -140,17 +194,10 @@ class GridEnv:
             return
 
         # Ruch o 1 pole
-        if action == 'MOVE_up':
-            nx, ny = self.npc[0], self.npc[1] - 1
-        elif action == 'MOVE_down':
-            nx, ny = self.npc[0], self.npc[1] + 1
-        elif action == 'MOVE_left':
-            nx, ny = self.npc[0] - 1, self.npc[1]
-        elif action == 'MOVE_right':
-            nx, ny = self.npc[0] + 1, self.npc[1]
-        else:
+        if not 0 <= action < _ATTACK:
             return
-        self.npc[0], self.npc[1] = self._clamp_xy(nx, ny)
+        mx, my = _MOVE_DELTA[action]
+        self.npc[0], self.npc[1] = self._clamp_xy(self.npc[0] + mx, self.npc[1] + my)
 
     def tick_cooldowns(self) -> None:
         """Zmniejsz cooldowny umiejętności (nie mniej niż 0)."""
@@ -158,3 +205,214 @@ class GridEnv:
             self.skill_cd_player -= 1
         if self.skill_cd_npc > 0:
             self.skill_cd_npc -= 1
+
+    # ---------------------------
+    # Snapshot / restore
+    # ---------------------------
+    def snapshot(self) -> tuple:
+        """Niezmienny zrzut stanu (pozycje, HP, cooldowny, stan RNG) do późniejszego restore()."""
+        return (tuple(self.player), tuple(self.npc), self.player_hp, self.npc_hp,
+                self.skill_cd_player, self.skill_cd_npc, self.rng.getstate())
+
+    def restore(self, snap: tuple) -> None:
+        """Przywróć stan z snapshot() (ten sam zrzut można przywracać wielokrotnie)."""
+        player, npc, self.player_hp, self.npc_hp, self.skill_cd_player, self.skill_cd_npc, rng_state = snap
+        self.player = list(player)
+        self.npc = list(npc)
+        self.rng.setstate(rng_state)
+
+
+# ---------------------------
+# Wariant kompaktowy: indeksy pól + tablice przejść
+# ---------------------------
+class GridState:
+    """Stan epizodu GridEnv w postaci kompaktowej (indeksy pól zamiast list [x, y])."""
+
+    __slots__ = ('player_cell', 'npc_cell', 'player_hp', 'npc_hp', 'skill_cd_player', 'skill_cd_npc')
+
+    def __init__(self, player_cell: int = 0, npc_cell: int = 0, player_hp: int = 0, npc_hp: int = 0,
+                 skill_cd_player: int = 0, skill_cd_npc: int = 0) -> None:
+        self.player_cell = player_cell
+        self.npc_cell = npc_cell
+        self.player_hp = player_hp
+        self.npc_hp = npc_hp
+        self.skill_cd_player = skill_cd_player
+        self.skill_cd_npc = skill_cd_npc
+
+    def copy(self) -> 'GridState':
+        return GridState(self.player_cell, self.npc_cell, self.player_hp, self.npc_hp,
+                         self.skill_cd_player, self.skill_cd_npc)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, GridState):
+            return NotImplemented
+        return all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __repr__(self) -> str:
+        return 'GridState(' + ', '.join(f'{k}={getattr(self, k)}' for k in self.__slots__) + ')'
+
+
+class CellTables:
+    """
+    Prekomputowane tablice przejść dla planszy width×height (n = w*h pól, para = p*n + q).
+
+    - xy[cell]                    -> (x, y)
+    - move[cell*len(ACTIONS)+a]   -> pole po ruchu o 1 (ATTACK/SKILL: bez zmiany)
+    - dist[p*n+q]                 -> dystans manhattan między polami p i q
+    - dash[p*n+q]                 -> pole gracza p po SKILL (dash „od” NPC na q)
+    - leap[p*n+q]                 -> pole NPC q po SKILL (leap „do” gracza na p)
+
+    Tablice par (n² pozycji) są liczone wektorowo (NumPy) i trzymane jako listy — odczyt w gorącej
+    pętli to zwykłe indeksowanie listy.
+    """
+
+    __slots__ = ('w', 'h', 'n', 'xy', 'move', 'dist', 'dash', 'leap')
+
+    def __init__(self, width: int, height: int) -> None:
+        import numpy as np
+
+        w, h = self.w, self.h = int(width), int(height)
+        n = self.n = w * h
+        xs, ys = np.arange(n) % w, np.arange(n) // w
+        self.xy: List[Tuple[int, int]] = list(zip(xs.tolist(), ys.tolist()))
+
+        def cell(x, y):
+            return np.clip(y, 0, h - 1) * w + np.clip(x, 0, w - 1)
+
+        delta = np.array(_MOVE_DELTA)
+        self.move: List[int] = cell(xs[:, None] + delta[:, 0], ys[:, None] + delta[:, 1]).ravel().tolist()
+
+        # pary (p = gracz, q = NPC); ten sam krok ±2 (znak player - npc) dla dasha gracza i leapa NPC
+        px, py = xs[:, None], ys[:, None]
+        qx, qy = xs[None, :], ys[None, :]
+        dx, dy = px - qx, py - qy
+        adx, ady = np.abs(dx), np.abs(dy)
+        self.dist: List[int] = (adx + ady).ravel().tolist()
+        horizontal = adx >= ady
+        step = np.where(horizontal, np.where(dx > 0, 2, -2), np.where(dy > 0, 2, -2))
+        sx, sy = np.where(horizontal, step, 0), np.where(horizontal, 0, step)
+        self.dash: List[int] = cell(px + sx, py + sy).ravel().tolist()
+        self.leap: List[int] = cell(qx + sx, qy + sy).ravel().tolist()
+
+
+_CELL_TABLES: Dict[Tuple[int, int], CellTables] = {}
+
+
+def cell_tables(width: int, height: int) -> CellTables:
+    """Tablice przejść dla danej planszy (budowane raz na proces)."""
+    key = (int(width), int(height))
+    tables = _CELL_TABLES.get(key)
+    if tables is None:
+        tables = _CELL_TABLES[key] = CellTables(*key)
+    return tables
+
+
+class CompactGridEnv(GridEnv):
+    """
+    GridEnv z pozycjami jako indeksami pól i przejściami z tablic (CellTables).
+
+    Losowanie pozycji startowych i semantyka akcji są identyczne jak w GridEnv.
+    Stan to zwykłe atrybuty (bez właściwości w gorącej pętli): player_cell, npc_cell, pair (indeks pary
+    player_cell * n + npc_cell do tablic dist/dash/leap), HP i cooldowny; player / npc to krotki (x, y)
+    z tablicy xy, podmieniane przy zmianie pola (odczyt dla agenta, gracza i viewera).
+    """
+
+    def __init__(self, width: int = 45, height: int = 15, seed: int = 0):
+        self.w = int(width)
+        self.h = int(height)
+        self.rng = random.Random(seed)
+        self.tables = tables = cell_tables(self.w, self.h)
+        # lokalne referencje tablic — gorąca ścieżka
+        self._n, self._xy, self._move = tables.n, tables.xy, tables.move
+        self._dist, self._dash, self._leap = tables.dist, tables.dash, tables.leap
+
+        # Parametry „gry”
+        self.max_hp_player = 10
+        self.max_hp_npc = 10
+        self.skill_cd_len_player = 5
+        self.skill_cd_len_npc = 5
+
+        self.reset_positions()
+
+    def _set_state(self, st: GridState) -> None:
+        self.player_cell, self.npc_cell = st.player_cell, st.npc_cell
+        self.pair = st.player_cell * self._n + st.npc_cell
+        self.player, self.npc = self._xy[st.player_cell], self._xy[st.npc_cell]
+        self.player_hp, self.npc_hp = st.player_hp, st.npc_hp
+        self.skill_cd_player, self.skill_cd_npc = st.skill_cd_player, st.skill_cd_npc
+
+    @property
+    def state(self) -> GridState:
+        """Kopia stanu jako GridState."""
+        return GridState(self.player_cell, self.npc_cell, self.player_hp, self.npc_hp,
+                         self.skill_cd_player, self.skill_cd_npc)
+
+    # ---------------------------
+    # API środowiska
+    # ---------------------------
+    def reset_positions(self) -> None:
+        """Wylosuj różne pola startowe (te same losowania co GridEnv) i zresetuj HP/CD."""
+        w, h, rng = self.w, self.h, self.rng
+        player = [rng.randrange(w), rng.randrange(h)]
+        npc = [rng.randrange(w), rng.randrange(h)]
+        while npc == player:
+            npc = [rng.randrange(w), rng.randrange(h)]
+        self._set_state(GridState(player[1] * w + player[0], npc[1] * w + npc[0],
+                                  self.max_hp_player, self.max_hp_npc, 0, 0))
+
+    def dist(self) -> int:
+        return self._dist[self.pair]
+
+    def step_player(self, action: Union[int, str, None]) -> None:
+        if action is None:
+            return
+        if isinstance(action, str):
+            action = ACTION_INDEX.get(action, NOOP)
+
+        if action == _ATTACK:
+            if self._dist[self.pair] == 1:
+                self.npc_hp -= 1
+            return
+        if action == _SKILL:
+            if self.skill_cd_player != 0:
+                return
+            self.skill_cd_player = self.skill_cd_len_player
+            cell = self._dash[self.pair]
+        elif 0 <= action < _ATTACK:
+            cell = self._move[self.player_cell * _N_ACTIONS + action]
+        else:
+            return
+        self.player_cell = cell
+        self.pair = cell * self._n + self.npc_cell
+        self.player = self._xy[cell]
+
+    def step_npc(self, action: Union[int, str, None]) -> None:
+        if action is None:
+            return
+        if isinstance(action, str):
+            action = ACTION_INDEX.get(action, NOOP)
+
+        if action == _ATTACK:
+            if self._dist[self.pair] == 1:
+                self.player_hp -= 1
+            return
+        if action == _SKILL:
+            if self.skill_cd_npc != 0:
+                return
+            self.skill_cd_npc = self.skill_cd_len_npc
+            cell = self._leap[self.pair]
+        elif 0 <= action < _ATTACK:
+            cell = self._move[self.npc_cell * _N_ACTIONS + action]
+        else:
+            return
+        self.npc_cell = cell
+        self.pair = self.player_cell * self._n + cell
+        self.npc = self._xy[cell]
+
+    def snapshot(self) -> tuple:
+        return self.state, self.rng.getstate()
+
+    def restore(self, snap: tuple) -> None:
+        state, rng_state = snap
+        self._set_state(state)
+        self.rng.setstate(rng_state)
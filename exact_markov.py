@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+exact_markov.py — dokładne wartości oczekiwane metryk przez propagację rozkładu stanów (łańcuch Markowa).
+
+Zamiast losować tysiące seedów propagujemy rozkład prawdopodobieństwa po stanach epizodu tick po ticku
+przez harmonogram LIGHT/DARK. Losowość ScriptedPlayer to kilka prób Bernoulliego (atak obok NPC,
+SKILL, krok losowy) i wybór jednego z 4 ruchów — rozpisujemy ją na rozkład akcji gracza; agent
+(BTGatedAgent) i środowisko są deterministyczne. Pozycje startowe: gracz jednostajnie na planszy,
+NPC jednostajnie na pozostałych polach (jak reset_positions).
+
+Stan (rzadko — tylko osiągalne stany z niezerowym prawdopodobieństwem):
+  pole gracza, pole NPC, cooldown SKILL gracza i NPC, oraz 3 maski akcji LEARNABLE (po 2 bity):
+  ref = LIGHT[c-1] (przy K=1 to także gating warunku memory), akcje zaobserwowane w bieżącym LIGHT,
+  akcje NPC użyte w bieżącym cyklu.
+HP nie wpływa na dynamikę, więc nie jest częścią stanu — obrażenia sumujemy jako wartość oczekiwaną.
+
+Wyniki:
+- difficulty_proxy — dokładnie E[difficulty_proxy] (średnia po seedach zbiega do tej wartości)
+- m1_coverage_cycle / m2_unlearned_usage_cycle — dokładne oczekiwane pokrycie (odsetek niewyuczonych)
+  na cykl, w którym metryka jest zdefiniowana: suma_c E[x_c; zdefiniowane] / suma_c P(zdefiniowane).
+  To nie jest E[m1] z run_single_experiment (średnia ilorazów po cyklach epizodu wymagałaby śledzenia
+  sum per epizod w stanie), ale jest z nim silnie skorelowane i porównywalne między warunkami.
+- per_cycle — te same wielkości osobno dla każdego cyklu
+M3/M4 (pierwsze cykle obserwacji/użycia) nie są liczone.
+
+Ograniczenia: memory_k=1 bez zanikania; koszt rośnie z (w*h)^2 — sensowne dla małych plansz
+(np. 7×5 … 11×7), nie dla domyślnej 45×15.
+
+Użycie:
+  python exact_markov.py --width 7 --height 5 --cycles 20 --conditions memory,baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from agent import BTGatedAgent
+from env import ALL_MASK, Action, MOVES_MASK, cell_tables
+from player import ScriptedPlayer
+
+_ATTACK = int(Action.ATTACK)
+_SKILL = int(Action.SKILL)
+_MOVE_UP = int(Action.MOVE_up)
+_MOVE_DOWN = int(Action.MOVE_down)
+_MOVE_RIGHT = int(Action.MOVE_right)
+_MOVE_LEFT = int(Action.MOVE_left)
+_N_ACTIONS = len(Action)
+_N_CD = 6  # cooldown 0..5
+
+# 2-bitowa maska LEARNABLE (bit 0 = ATTACK, bit 1 = SKILL) dla kodu akcji; ostatni element = NOOP (-1)
+_LEARN_BIT = np.zeros(_N_ACTIONS + 1, dtype=np.int64)
+_LEARN_BIT[_ATTACK] = 1
+_LEARN_BIT[_SKILL] = 2
+_POP2 = np.array([0, 1, 1, 2], dtype=np.float64)
+
+
+class _Layout:
+    """Kodowanie stanu w jednym int64: ((maski * n + gracz) * n + npc) * 36 + cd_gracza * 6 + cd_npc."""
+
+    def __init__(self, n_cells: int) -> None:
+        self.n = n_cells
+
+    def encode(self, masks, p, q, cdp, cdn):
+        return ((masks * self.n + p) * self.n + q) * (_N_CD * _N_CD) + cdp * _N_CD + cdn
+
+    def decode(self, idx):
+        rest, cd = np.divmod(idx, _N_CD * _N_CD)
+        cdp, cdn = np.divmod(cd, _N_CD)
+        rest, q = np.divmod(rest, self.n)
+        masks, p = np.divmod(rest, self.n)
+        return masks, p, q, cdp, cdn
+
+
+def _merge(idx: np.ndarray, prob: np.ndarray):
+    """Zsumuj prawdopodobieństwa równych stanów."""
+    uniq, inv = np.unique(idx, return_inverse=True)
+    return uniq, np.bincount(inv, weights=prob, minlength=len(uniq))
+
+
+def exact_metrics(condition: str = 'memory', light_ticks: int = 10, dark_ticks: int = 10, cycles: int = 20,
+                  width: int = 7, height: int = 5, player_kwargs: Optional[dict] = None,
+                  agent_kwargs: Optional[dict] = None, memory_k: int = 1, memory_decay=None,
+                  max_states: int = 5_000_000) -> Dict[str, Any]:
+    """
+    Dokładne wartości oczekiwane metryk dla warunku (baseline / memory z K=1).
+
+    :param max_states: limit liczby osiągalnych stanów (ochrona przed zbyt dużą planszą)
+    :return: {'difficulty_proxy', 'm1_coverage_cycle', 'm2_unlearned_usage_cycle', 'per_cycle': [...], 'max_states'}
+    """
+    if condition not in ('memory', 'baseline'):
+        raise ValueError(f'Nieznany warunek: {condition!r}')
+    if memory_k != 1 or memory_decay is not None:
+        raise ValueError('Silnik dokładny obsługuje tylko memory_k=1 bez zanikania')
+
+    tables = cell_tables(width, height)
+    n = tables.n
+    xy = np.array(tables.xy, dtype=np.int64).reshape(n, 2)
+    move = np.asarray(tables.move, dtype=np.int64).reshape(n, _N_ACTIONS)
+    dist = np.asarray(tables.dist, dtype=np.int64).reshape(n, n)
+    dash = np.asarray(tables.dash, dtype=np.int64).reshape(n, n)
+    leap = np.asarray(tables.leap, dtype=np.int64).reshape(n, n)
+    layout = _Layout(n)
+
+    player = ScriptedPlayer(**(player_kwargs or {}))
+    agent = BTGatedAgent(**(agent_kwargs or {}))
+    cd_len_player = cd_len_npc = 5
+
+    # Rozkład początkowy: gracz jednostajnie, NPC jednostajnie na innym polu
+    p0, q0 = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    keep = p0 != q0
+    idx = layout.encode(0, p0[keep], q0[keep], 0, 0).astype(np.int64)
+    prob = np.full(len(idx), 1.0 / len(idx))
+
+    damage = 0.0
+    per_cycle: List[Dict[str, float]] = []
+    peak = len(idx)
+
+    for c in range(1, cycles + 1):
+        for phase, n_ticks in (('LIGHT', light_ticks), ('DARK', dark_ticks)):
+            light = phase == 'LIGHT'
+            p_skill = player.p_skill_light if light else player.p_skill_dark
+            for _ in range(n_ticks):
+                masks, p, q, cdp, cdn = layout.decode(idx)
+                ref, obs, used = masks & 3, (masks >> 2) & 3, masks >> 4
+
+                # NPC decyduje na stanie sprzed ruchu gracza (jak w pętli epizodu)
+                allowed = MOVES_MASK | (ref << 4) if condition == 'memory' else np.full(len(idx), ALL_MASK)
+                view = SimpleNamespace(player=xy[p], npc=xy[q], skill_cd_npc=cdn)
+                action_n = agent.pick_actions_batch(view, allowed).astype(np.int64)
+
+                # Rozkład akcji gracza (ScriptedPlayer.act_code)
+                dx = xy[p, 0] - xy[q, 0]
+                dy = xy[p, 1] - xy[q, 1]
+                horizontal = np.abs(dx) >= np.abs(dy)
+                p_att = np.where(dist[p, q] == 1, player.p_attack_adjacent, 0.0)
+                rest = 1.0 - p_att
+                p_sk = rest * np.where(cdp == 0, p_skill, 0.0)
+                p_mv = rest - p_sk
+                if player.move_policy == 'random':
+                    jitter, policy_move = 1.0, None
+                else:
+                    jitter = player.jitter_move_prob
+                    if player.move_policy == 'towards':
+                        policy_move = np.where(horizontal, np.where(dx > 0, _MOVE_LEFT, _MOVE_RIGHT),
+                                               np.where(dy > 0, _MOVE_UP, _MOVE_DOWN))
+                    else:
+                        policy_move = np.where(horizontal, np.where(dx > 0, _MOVE_RIGHT, _MOVE_LEFT),
+                                               np.where(dy > 0, _MOVE_DOWN, _MOVE_UP))
+
+                new_idx, new_prob = [], []
+                for a in range(_N_ACTIONS):
+                    if a == _ATTACK:
+                        w = p_att
+                    elif a == _SKILL:
+                        w = p_sk
+                    else:
+                        w = p_mv * (jitter / 4.0)
+                        if policy_move is not None:
+                            w = w + p_mv * (1.0 - jitter) * (policy_move == a)
+                    sel = w > 0
+                    if not sel.any():
+                        continue
+                    w = w[sel] * prob[sel]
+                    ps, qs, cps, cns, an = p[sel], q[sel], cdp[sel], cdn[sel], action_n[sel]
+
+                    # krok gracza
+                    if a == _SKILL:
+                        ps2 = dash[ps, qs]
+                        cps2 = np.full(len(ps), cd_len_player)
+                    elif a == _ATTACK:
+                        ps2, cps2 = ps, cps
+                    else:
+                        ps2, cps2 = move[ps, a], cps
+
+                    # krok NPC (na stanie po ruchu gracza)
+                    hit = (an == _ATTACK) & (dist[ps2, qs] == 1)
+                    damage += float(w[hit].sum())
+                    leap_now = (an == _SKILL) & (cns == 0)
+                    stepping = (an >= 0) & (an < _ATTACK)
+                    qs2 = np.where(leap_now, leap[ps2, qs], np.where(stepping, move[qs, np.maximum(an, 0)], qs))
+                    cns2 = np.where(leap_now, cd_len_npc, cns)
+
+                    # cooldowny i maski
+                    cps2 = np.maximum(cps2 - 1, 0)
+                    cns2 = np.maximum(cns2 - 1, 0)
+                    obs2 = obs[sel] | (_LEARN_BIT[a] if light else 0)
+                    used2 = used[sel] | _LEARN_BIT[an]
+                    masks2 = ref[sel] | obs2 << 2 | used2 << 4
+                    new_idx.append(layout.encode(masks2, ps2, qs2, cps2, cns2))
+                    new_prob.append(w)
+
+                idx, prob = _merge(np.concatenate(new_idx), np.concatenate(new_prob))
+                peak = max(peak, len(idx))
+                if len(idx) > max_states:
+                    raise MemoryError(f'Za dużo stanów ({len(idx)} > {max_states}) — zmniejsz planszę')
+
+        # Koniec cyklu c: metryki cyklu i przejście ref <- LIGHT[c], obs = used = 0
+        masks, p, q, cdp, cdn = layout.decode(idx)
+        ref, obs, used = masks & 3, (masks >> 2) & 3, masks >> 4
+        has_ref = ref > 0
+        has_used = used > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(has_ref, _POP2[used & ref] / _POP2[ref], 0.0)
+            unl = np.where(has_used, _POP2[used & ~ref & 3] / _POP2[used], 0.0)
+        per_cycle.append({
+            'cycle': c,
+            'p_coverage_defined': float(prob[has_ref].sum()),
+            'coverage_sum': float((prob * cov).sum()),
+            'p_unlearned_defined': float(prob[has_used].sum()),
+            'unlearned_sum': float((prob * unl).sum()),
+            'difficulty_cum': damage,
+        })
+        idx, prob = _merge(layout.encode(obs, p, q, cdp, cdn), prob)
+
+    def ratio(num: str, den: str) -> float:
+        d = sum(r[den] for r in per_cycle)
+        return sum(r[num] for r in per_cycle) / d if d > 0 else float('nan')
+
+    for r in per_cycle:
+        r['coverage'] = r['coverage_sum'] / r['p_coverage_defined'] if r['p_coverage_defined'] > 0 else float('nan')
+        r['unlearned'] = r['unlearned_sum'] / r['p_unlearned_defined'] if r['p_unlearned_defined'] > 0 else float('nan')
+    return {
+        'difficulty_proxy': damage,
+        'm1_coverage_cycle': ratio('coverage_sum', 'p_coverage_defined'),
+        'm2_unlearned_usage_cycle': ratio('unlearned_sum', 'p_unlearned_defined'),
+        'per_cycle': per_cycle,
+        'max_states': peak,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Dokładne wartości oczekiwane metryk (łańcuch Markowa)')
+    p.add_argument('--outdir', type=str, default='data', help='Katalog wyjściowy')
+    p.add_argument('--width', type=int, default=7, help='Szerokość planszy')
+    p.add_argument('--height', type=int, default=5, help='Wysokość planszy')
+    p.add_argument('--cycles', type=int, default=20, help='Liczba cykli LIGHT/DARK w epizodzie')
+    p.add_argument('--light_ticks', type=int, default=10, help='Długość fazy LIGHT (ticki)')
+    p.add_argument('--dark_ticks', type=int, default=10, help='Długość fazy DARK (ticki)')
+    p.add_argument('--conditions', type=str, default='memory,baseline', help='Warunki: np. memory,baseline')
+    p.add_argument('--max_states', type=int, default=5_000_000, help='Limit liczby osiągalnych stanów')
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    out = outdir / 'exact_metrics.csv'
+    fields = ['condition', 'cycle', 'coverage', 'unlearned', 'p_coverage_defined', 'p_unlearned_defined',
+              'difficulty_cum']
+    with out.open('w', newline='') as fh:
+        w = csv.DictWriter(fh, fieldnames=fields, extrasaction='ignore')
+        w.writeheader()
+        for cond in [c.strip() for c in args.conditions.split(',') if c.strip()]:
+            res = exact_metrics(cond, args.light_ticks, args.dark_ticks, args.cycles, args.width, args.height,
+                                max_states=args.max_states)
+            print(f'[{cond}] difficulty_proxy={res["difficulty_proxy"]:.4f}, m1_coverage_cycle='
+                  f'{res["m1_coverage_cycle"]:.4f}, m2_unlearned_usage_cycle={res["m2_unlearned_usage_cycle"]:.4f}'
+                  f' (max {res["max_states"]} stanów)')
+            for row in res['per_cycle']:
+                w.writerow({'condition': cond, **row})
+    print('Saved', out)
+
+
+if __name__ == '__main__':
+    main()
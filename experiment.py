@@ -1,14 +1,15 @@
 """
 Warunki:
 - baseline: brak pamięci/gatingu (NPC ma pełne ACTIONS od początku)
-- memory:  gating wg akcji gracza z poprzedniego cyklu LIGHT (domyślnie K=1)
+- memory:  gating wg akcji gracza z K poprzednich cykli LIGHT (domyślnie K=1, memory.LightMemory)
 
 Metryki (per epizod):
 - m1_coverage:   średni odsetek akcji z LIGHT[c-1], których NPC użył w cyklu c
 - m2_unlearned_usage: średni odsetek użytych akcji w cyklu c, które NPC nie widział w LIGHT[c-1]
 - m3_latency_cycles: średnia liczba cykli od obserwacji do pierwszego użycia (tylko dla akcji, które zaszły)
 - m4_missed_actions_rate: odsetek akcji, które NPC zobaczył, ale nigdy ich nie użył
-- m5_cpu_ms_per_tick: średni koszt CPU (ms) na tick (pomiar perf_counter)
+- m5_cpu_ms_per_tick: średni koszt CPU (ms) na tick (perf_counter_ns, skorygowany o narzut zegara;
+                     instrumentation.TickProfiler); dodatkowo m5_{player,agent,env}_ms i m5_p{50,95,99}_ms
 - difficulty_proxy:  łączna utrata HP gracza (suma obrażeń zadanych przez NPC)
 
 Uwaga: interfejs pozostaje zgodny z analysis_plot.py oraz run_experiment.py.
@@ -16,237 +17,641 @@ Uwaga: interfejs pozostaje zgodny z analysis_plot.py oraz run_experiment.py.
 
 from __future__ import annotations
 
+import inspect
+import math
+import os
 import time
-from typing import Dict, List, Set, Iterable
-from collections import deque
-
-from env import GridEnv, ACTIONS, MOVES_ONLY, LEARNABLE
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Iterable, Tuple
+from env import CompactGridEnv, GridEnv, ACTIONS, ALL_MASK, LEARNABLE_MASK, MOVES_MASK, NOOP, popcount
+from accumulators import MetricsAccumulator, RunningStats
+from instrumentation import TickProfiler
+from memory import Decay, LightMemory
 from player import ScriptedPlayer
 from agent import BTGatedAgent
 
 
-def run_single_experiment(seed: int = 0, light_ticks: int = 10, dark_ticks: int = 10,
-cycles: int = 20, condition: str = 'memory') -> Dict[str, float]:
-    env = GridEnv(seed=seed)
-    player = ScriptedPlayer(rng_seed=seed + 13)
-    agent = BTGatedAgent()
-
-    # Akumulatory metryk
-    coverage_per_cycle: List[float] = []
-    cpu_times: List[float] = []
-    damage_to_player_total = 0
-
-    # Do liczenia latencji: kiedy akcję po raz pierwszy zobaczono i kiedy po raz pierwszy użył jej NPC
-    first_seen_cycle: Dict[str, int] = {}
-    first_used_cycle: Dict[str, int] = {}
-    
-    # Do liczenia użycia niewyuczonych podczas LIGHT[c] akcji w cyklu c+1
-    unlearned_rate_per_cycle: List[float] = []
-    
-    observed_light: Set[str] = set()
-    light_history: deque[set[str]] = deque(maxlen=1)
-    
-    if condition == 'memory':
-        for c in range(1, cycles + 1):
-            allowed = set(MOVES_ONLY)  # NPC zaczyna tylko z przemieszczaniem się
-            observed_prev = light_history[-1] if len(light_history) > 0 else set()
-            learned_prev = {a for a in observed_prev if a in LEARNABLE}
-            allowed = set(MOVES_ONLY) | learned_prev  # ew. dodanie ruchów dla NPC z LEARNABLE
-            observed_light: Set[str] = set()
-            
-            used_in_cycle: Set[str] = set()
-            
-            # LIGHT Phase
-            for t in range(light_ticks):
-                t0 = time.perf_counter()
-                # pick action:
-                action_p = player.act(env, t, 'LIGHT')
-                action_n = agent.pick_action(env, allowed)
-                # NPC observation:
-                env.step_player(action_p)
-                observed_light.add(action_p)
-                if action_p in LEARNABLE and action_p not in first_seen_cycle:
-                    first_seen_cycle[action_p] = c  # pierwszy raz „widziana” w tym cyklu
-                
-                if action_n:
-                    prev_player_hp = env.player_hp
-                    env.step_npc(action_n)
-                    used_in_cycle.add(action_n)
-
-                    if env.player_hp < prev_player_hp:
-                        damage_to_player_total += (prev_player_hp - env.player_hp)
-                
-                env.tick_cooldowns()
-                t1 = time.perf_counter()
-                cpu_times.append(t1 - t0)
-                
-                    # latencja: jeśli akcję już „widziano” i jeszcze nie zarejestrowano użycia → zapisz
-                if action_n in LEARNABLE:
-                    if action_n in first_seen_cycle and action_n not in first_used_cycle:
-                        first_used_cycle[action_n] = c  # pierwszy raz użyta w tym cyklu
-            
-            # DARK Phase
-            for t in range(dark_ticks):
-                t0 = time.perf_counter()
-                
-                action_p = player.act(env, t, 'DARK')
-                action_n = agent.pick_action(env, allowed)
-                
-                env.step_player(action_p)
-                if action_n:
-                    prev_player_hp = env.player_hp
-                    env.step_npc(action_n)
-                    used_in_cycle.add(action_n)
-                    
-                    if env.player_hp < prev_player_hp:
-                        damage_to_player_total += (prev_player_hp - env.player_hp)
-
-                    # latencja: jeśli akcję już „widziano” i jeszcze nie zarejestrowano użycia → zapisz
-                if action_n in LEARNABLE:
-                    if action_n in first_seen_cycle and action_n not in first_used_cycle:
-                        first_used_cycle[action_n] = c  # pierwszy raz użyta w tym cyklu
-
-                env.tick_cooldowns()
-                t1 = time.perf_counter()
-                cpu_times.append(t1 - t0)
-            
-            # Pokrycie dla cyklu c: ile z akcji z LIGHT[c-1] zostało użytych w cyklu c
-            ref = {a for a in observed_prev if a in LEARNABLE}
-            used = {a for a in used_in_cycle if a in LEARNABLE}
-            if ref:
-                coverage_per_cycle.append(len(used & ref) / len(ref))
-            if used:
-                unlearned_rate_c = len(used - ref) / len(used)
-                unlearned_rate_per_cycle.append(unlearned_rate_c)
-            
-            light_history.append(observed_light)  # dodanie observed_light z bieżącego LIGHT[c] do historii obserwacji
-    
-    # Wersja bez obserwowania akcji gracza:
-    if condition == 'baseline':
-        for c in range(1, cycles + 1):
-            allowed = set(ACTIONS)  # NPC działa ze wszystimi akcjami
-            observed_light: Set[str] = set()
-            observed_prev = light_history[-1] if len(light_history) > 0 else set()
-            
-            used_in_cycle: Set[str] = set()
-            
-            # LIGHT Phase
-            for t in range(light_ticks):
-                t0 = time.perf_counter()
-                # pick action:
-                action_p = player.act(env, t, 'LIGHT')
-                action_n = agent.pick_action(env, allowed)
-                # NPC observation:
-                env.step_player(action_p)
-                observed_light.add(action_p)
-                if action_p in LEARNABLE and action_p not in first_seen_cycle:
-                    first_seen_cycle[action_p] = c  # pierwszy raz „widziana” w tym cyklu
-                
-                if action_n:
-                    prev_player_hp = env.player_hp
-                    env.step_npc(action_n)
-                    used_in_cycle.add(action_n)
-
-                    if env.player_hp < prev_player_hp:
-                        damage_to_player_total += (prev_player_hp - env.player_hp)
-                
-                env.tick_cooldowns()
-                t1 = time.perf_counter()
-                cpu_times.append(t1 - t0)
-                
-                    # latencja: jeśli akcję już „widziano” i jeszcze nie zarejestrowano użycia → zapisz
-                if action_n in LEARNABLE:
-                    if action_n in first_seen_cycle and action_n not in first_used_cycle:
-                        first_used_cycle[action_n] = c
-            
-            # DARK Phase
-            for t in range(dark_ticks):
-                t0 = time.perf_counter()
-                
-                action_p = player.act(env, t, 'DARK')
-                action_n = agent.pick_action(env, allowed)
-                
-                env.step_player(action_p)
-                if action_n:
-                    prev_player_hp = env.player_hp
-                    env.step_npc(action_n)
-                    used_in_cycle.add(action_n)
-                    
-                    if env.player_hp < prev_player_hp:
-                        damage_to_player_total += (prev_player_hp - env.player_hp)
-
-                    # latencja: jeśli akcję już „widziano” i jeszcze nie zarejestrowano użycia → zapisz
-                if action_n in LEARNABLE:
-                    if action_n in first_seen_cycle and action_n not in first_used_cycle:
-                        first_used_cycle[action_n] = c  # pierwszy raz użyta w tym cyklu
-
-                env.tick_cooldowns()
-                t1 = time.perf_counter()
-                cpu_times.append(t1 - t0)
-            
+# Wersja semantyki symulacji i metryk — część klucza epizodu w results_store.
+# Podbij przy każdej zmianie, która zmienia wyniki dla tych samych parametrów.
+SIMULATION_VERSION = 1
+
+
+class Episode:
+    """
+    Stan pętli epizodu: środowisko, gracz, agent, pamięć LIGHT i akumulatory metryk.
+
+    run(n) symuluje kolejne n cykli; snapshot()/restore() pozwalają policzyć wspólny prefiks
+    raz i rozgałęzić kontynuacje (inny warunek, parametry agenta/gracza) — zob. branching.py.
+    Parametry jak w run_single_experiment; dodatkowo rozmiar planszy width × height.
+    """
+
+    def __init__(self, seed: int = 0, light_ticks: int = 10, dark_ticks: int = 10, condition: str = 'memory',
+                 memory_k: int = 1, memory_decay: Decay = None, memory_threshold: float = 0.5,
+                 compact_env: bool = False, timing_sample_every: int = 1, trajectory=None,
+                 player_kwargs: Optional[dict] = None, agent_kwargs: Optional[dict] = None,
+                 width: int = 45, height: int = 15) -> None:
+        self.light_ticks = light_ticks
+        self.dark_ticks = dark_ticks
+        self.condition = condition
+        env_cls = CompactGridEnv if compact_env else GridEnv
+        self.env = env_cls(width, height, seed=seed)
+        player_kwargs = dict(player_kwargs or {})
+        if player_kwargs.get('rng_mode', 'legacy') == 'legacy':
+            self.player = ScriptedPlayer(rng_seed=seed + 13, **player_kwargs)
+        else:
+            # strumień licznikowy: klucz (rng_seed z player_kwargs — domyślnie 0, epizod = seed)
+            player_kwargs.setdefault('rng_episode', seed)
+            self.player = ScriptedPlayer(**player_kwargs)
+        self.agent = BTGatedAgent(**(agent_kwargs or {}))
+        self.trajectory = trajectory
+
+        # Akumulatory metryk
+        # (strumieniowo, stała pamięć — accumulators.RunningStats)
+        self.coverage_per_cycle = RunningStats()
+        # Do liczenia użycia niewyuczonych podczas LIGHT[c] akcji w cyklu c+1
+        self.unlearned_rate_per_cycle = RunningStats()
+        self.profiler = TickProfiler(timing_sample_every)
+        self.damage_to_player_total = 0
+
+        # Do liczenia latencji: kiedy akcję po raz pierwszy zobaczono i kiedy po raz pierwszy użył jej NPC
+        # (indeks = kod akcji, 0 = jeszcze nie)
+        self.first_seen_cycle: List[int] = [0] * len(ACTIONS)
+        self.first_used_cycle: List[int] = [0] * len(ACTIONS)
+
+        # Zbiory akcji to maski bitowe (env.mask_of / env.actions_of); historia K faz LIGHT jako pierścień masek
+        self.light_history = LightMemory(memory_k, memory_decay, memory_threshold)
+
+        self.cycle = 0    # liczba zakończonych cykli
+        self.tick_no = 0
+
+    # ---------------------------
+    # Snapshot / restore
+    # ---------------------------
+    def snapshot(self) -> tuple:
+        """Zrzut stanu pętli (kopie — ten sam zrzut można przywracać wielokrotnie)."""
+        return (self.env.snapshot(), self.player.snapshot(), self.agent, self.condition,
+                self.light_history.copy(), self.coverage_per_cycle.copy(), self.unlearned_rate_per_cycle.copy(),
+                self.profiler.copy(), self.damage_to_player_total, list(self.first_seen_cycle),
+                list(self.first_used_cycle), self.cycle, self.tick_no,
+                self.trajectory.pos if self.trajectory is not None else 0)
+
+    def restore(self, snap: tuple) -> None:
+        (env_snap, player_snap, self.agent, self.condition, light_history, coverage, unlearned, profiler,
+         self.damage_to_player_total, first_seen, first_used, self.cycle, self.tick_no, traj_pos) = snap
+        self.env.restore(env_snap)
+        self.player.restore(player_snap)
+        self.light_history = light_history.copy()
+        self.coverage_per_cycle = coverage.copy()
+        self.unlearned_rate_per_cycle = unlearned.copy()
+        self.profiler = profiler.copy()
+        self.first_seen_cycle = list(first_seen)
+        self.first_used_cycle = list(first_used)
+        if self.trajectory is not None:
+            self.trajectory.pos = traj_pos
+
+    # ---------------------------
+    # Pętla
+    # ---------------------------
+    def run(self, n_cycles: int) -> None:
+        """Symuluj kolejne n_cycles cykli LIGHT/DARK (od cyklu self.cycle + 1)."""
+        env, light_history = self.env, self.light_history
+        first_seen_cycle, first_used_cycle = self.first_seen_cycle, self.first_used_cycle
+        coverage_per_cycle, unlearned_rate_per_cycle = self.coverage_per_cycle, self.unlearned_rate_per_cycle
+        damage_to_player_total = self.damage_to_player_total
+        condition = self.condition
+        phases = (('LIGHT', self.light_ticks), ('DARK', self.dark_ticks))
+
+        # lokalne referencje — gorąca pętla
+        ns = time.perf_counter_ns
+        record = self.profiler.record
+        sample_every = self.profiler.sample_every
+        tick_no = self.tick_no
+        # zapis trajektorii: pack_into bezpośrednio do bufora rekordera (bez wywołania metody na tick)
+        trajectory = self.trajectory
+        recording = trajectory is not None
+        if recording:
+            trajectory.check(self.cycle + n_cycles, env.w, env.h, max(self.light_ticks, self.dark_ticks))
+            pack_tick, traj_buf, traj_pos, traj_size = trajectory.pack_into, trajectory.buf, trajectory.pos, trajectory.size
+        player_act = self.player.act_code
+        pick_action = self.agent.pick_action_code
+        step_player = env.step_player
+        step_npc = env.step_npc
+        tick_cooldowns = env.tick_cooldowns
+
+        # baseline: brak obserwowania akcji gracza (NPC działa ze wszystkimi akcjami)
+        # memory:   NPC zaczyna tylko z przemieszczaniem się + LEARNABLE zaobserwowane w LIGHT[c-K..c-1]
+        for c in range(self.cycle + 1, self.cycle + n_cycles + 1):
+            observed_prev = light_history.last
+            if condition == 'memory':
+                allowed = MOVES_MASK | (light_history.mask & LEARNABLE_MASK)
+            else:
+                allowed = ALL_MASK
+            observed_light = 0
+            used_in_cycle = 0
+
+            for phase_code, (phase, n_ticks) in enumerate(phases):
+                light = phase == 'LIGHT'
+                for t in range(n_ticks):
+                    sampled = tick_no % sample_every == 0
+                    tick_no += 1
+                    if sampled:
+                        t0 = ns()
+                    # pick action:
+                    action_p = player_act(env, t, phase)
+                    if sampled:
+                        t1 = ns()
+                    action_n = pick_action(env, allowed)
+                    if sampled:
+                        t2 = ns()
+                    step_player(action_p)
+                    # NPC observation (tylko LIGHT):
+                    if light:
+                        observed_light |= 1 << action_p
+                        if LEARNABLE_MASK >> action_p & 1 and not first_seen_cycle[action_p]:
+                            first_seen_cycle[action_p] = c  # pierwszy raz „widziana” w tym cyklu
+
+                    if action_n != NOOP:
+                        prev_player_hp = env.player_hp
+                        step_npc(action_n)
+                        used_in_cycle |= 1 << action_n
+
+                        if env.player_hp < prev_player_hp:
+                            damage_to_player_total += (prev_player_hp - env.player_hp)
+
+                        # latencja: jeśli akcję już „widziano” i jeszcze nie zarejestrowano użycia → zapisz
+                        if first_seen_cycle[action_n] and not first_used_cycle[action_n] and LEARNABLE_MASK >> action_n & 1:
+                            first_used_cycle[action_n] = c  # pierwszy raz użyta w tym cyklu
+
+                    tick_cooldowns()
+                    if sampled:
+                        record(t0, t1, t2, ns())
+                    if recording:
+                        p, n = env.player, env.npc
+                        pack_tick(traj_buf, traj_pos, c, phase_code, t, p[0], p[1], n[0], n[1], env.player_hp,
+                                  env.npc_hp, env.skill_cd_player, env.skill_cd_npc, action_p, action_n, allowed)
+                        traj_pos += traj_size
+
             # Pokrycie dla cyklu c: ile z akcji z LIGHT[c-1] zostało użytych w cyklu c
-            ref = {a for a in observed_prev if a in LEARNABLE}
-            used = {a for a in used_in_cycle if a in LEARNABLE}
+            ref = observed_prev & LEARNABLE_MASK
+            used = used_in_cycle & LEARNABLE_MASK
             if ref:
-                coverage_per_cycle.append(len(used & ref) / len(ref))
+                coverage_per_cycle.add(popcount(used & ref) / popcount(ref))
             if used:
-                unlearned_rate_c = len(used - ref) / len(used)
-                unlearned_rate_per_cycle.append(unlearned_rate_c)
-            
-            light_history.append(observed_light)  # dodanie observed_light z bieżącego LIGHT[c] do historii obserwacji
-    
-    # ---------------- Agregacja metryk ----------------
-    m1_coverage = sum(coverage_per_cycle) / len(coverage_per_cycle) if coverage_per_cycle else float('nan')
-    m2_unlearned_usage = (sum(unlearned_rate_per_cycle)) / len(unlearned_rate_per_cycle) if unlearned_rate_per_cycle else float('nan')
-
-    # Latencja liczona tylko dla akcji, które kiedykolwiek zobaczono
-    seen_f = set(first_seen_cycle)
-    used_f = set(first_used_cycle)
-    latencies = [first_used_cycle[a] - first_seen_cycle[a] for a in (seen_f & used_f)]
-    m3_latency = (sum(latencies) / len(latencies)) if latencies else float('nan')
-    m4_missed_rate = (len(seen_f - used_f) / len(seen_f)) if seen_f else float('nan')
-
-    m5_cpu_ms = 1000.0 * (sum(cpu_times) / len(cpu_times)) if cpu_times else 0.0
-    difficulty = float(damage_to_player_total)
-
-    return {
-        'm1_coverage': m1_coverage,
-        'm2_unlearned_usage': m2_unlearned_usage,
-        'm3_latency_cycles': m3_latency,
-        'm4_missed_actions_rate': m4_missed_rate,
-        'm5_cpu_ms_per_tick': m5_cpu_ms,
-        'difficulty_proxy': difficulty,
+                unlearned_rate_c = popcount(used & ~ref) / popcount(used)
+                unlearned_rate_per_cycle.add(unlearned_rate_c)
+
+            light_history.push(observed_light)  # dodanie observed_light z bieżącego LIGHT[c] do historii obserwacji
+
+        self.cycle += n_cycles
+        self.tick_no = tick_no
+        self.damage_to_player_total = damage_to_player_total
+        if recording:
+            trajectory.pos = traj_pos
+
+    def metrics(self) -> Dict[str, float]:
+        """Metryki epizodu (po dotychczas zasymulowanych cyklach) — wiersz jak w run_single_experiment."""
+        m1_coverage = self.coverage_per_cycle.mean
+        m2_unlearned_usage = self.unlearned_rate_per_cycle.mean
+
+        # Latencja liczona tylko dla akcji, które kiedykolwiek zobaczono
+        first_seen_cycle, first_used_cycle = self.first_seen_cycle, self.first_used_cycle
+        seen_f = [a for a in range(len(ACTIONS)) if first_seen_cycle[a]]
+        latencies = [first_used_cycle[a] - first_seen_cycle[a] for a in seen_f if first_used_cycle[a]]
+        m3_latency = (sum(latencies) / len(latencies)) if latencies else float('nan')
+        m4_missed_rate = ((len(seen_f) - len(latencies)) / len(seen_f)) if seen_f else float('nan')
+
+        self.profiler.ticks = self.tick_no
+        m5 = self.profiler.metrics()
+        difficulty = float(self.damage_to_player_total)
+
+        return {
+            'm1_coverage': m1_coverage,
+            'm2_unlearned_usage': m2_unlearned_usage,
+            'm3_latency_cycles': m3_latency,
+            'm4_missed_actions_rate': m4_missed_rate,
+            'm5_cpu_ms_per_tick': m5.pop('m5_cpu_ms_per_tick'),
+            'difficulty_proxy': difficulty,
+            **m5,
+        }
+
+
+def run_single_experiment(seed: int = 0, light_ticks: int = 10, dark_ticks: int = 10,
+cycles: int = 20, condition: str = 'memory', memory_k: int = 1, memory_decay: Decay = None,
+memory_threshold: float = 0.5, compact_env: bool = False, timing_sample_every: int = 1,
+trajectory=None, player_kwargs: Optional[dict] = None, agent_kwargs: Optional[dict] = None) -> Dict[str, float]:
+    """
+    Jeden epizod cykli LIGHT/DARK.
+
+    :param player_kwargs: parametry ScriptedPlayer (np. p_skill_light, move_policy)
+    :param agent_kwargs: parametry BTGatedAgent (np. skill_min_distance)
+    :param memory_k: liczba pamiętanych faz LIGHT (warunek memory)
+    :param memory_decay: opcjonalne zanikanie wagi akcji per cykl (float lub dict nazwa -> float)
+    :param memory_threshold: minimalna waga akcji, by była dozwolona (tylko z memory_decay)
+    :param compact_env: użyj CompactGridEnv (indeksy pól + tablice przejść; wyniki identyczne)
+    :param timing_sample_every: mierz czas co N-ty tick (M5)
+    :param trajectory: opcjonalny trajectory.TrajectoryRecorder — zapis każdego ticka (poza pomiarem M5)
+
+    M1/M2 zawsze odnoszą się do LIGHT[c-1], niezależnie od K.
+    """
+    episode = Episode(seed, light_ticks, dark_ticks, condition, memory_k, memory_decay, memory_threshold,
+                      compact_env, timing_sample_every, trajectory, player_kwargs, agent_kwargs)
+    episode.run(cycles if condition in ('memory', 'baseline') else 0)
+    return episode.metrics()
+
+
+# Pliki trajektorii otwarte w bieżącym procesie: ścieżka -> memmap (zob. _episode_row)
+_TRAJECTORY_FILES: Dict[str, object] = {}
+
+
+def _flush_trajectories() -> None:
+    for arr in _TRAJECTORY_FILES.values():
+        arr.flush()
+    _TRAJECTORY_FILES.clear()
+
+
+def _episode_row(seed: int, condition: str, episode_kwargs: dict) -> dict:
+    """Jeden wiersz wyników: seed, warunek + metryki epizodu."""
+    record_to = episode_kwargs.get('record_to')
+    if record_to is not None:
+        # zapis trajektorii do wiersza i pliku .npy (memmap r+, także z procesu workera)
+        import numpy as np
+        from trajectory import TrajectoryRecorder
+
+        path, i = record_to
+        arr = _TRAJECTORY_FILES.get(path)
+        if arr is None:
+            arr = _TRAJECTORY_FILES[path] = np.load(path, mmap_mode='r+')
+        episode_kwargs = {k: v for k, v in episode_kwargs.items() if k != 'record_to'}
+        episode_kwargs['trajectory'] = TrajectoryRecorder(arr.shape[1], out=arr[i])
+    row = {'seed': seed, 'condition': condition}
+    row.update(run_single_experiment(seed=seed, condition=condition, **episode_kwargs))
+    return row
+
+
+def trajectory_tasks(path, seeds: Sequence[int], condition: str, episode_kwargs: dict,
+                     run_kwargs: Optional[dict] = None) -> List[tuple]:
+    """
+    Utwórz plik trajektorii (len(seeds), ticki epizodu) i zwróć zadania (warunek, seed, kwargs),
+    które zapiszą epizod i do wiersza i (metadane przebiegu w pliku .json obok).
+    """
+    from trajectory import TrajectoryRecorder, open_trajectories
+
+    params = inspect.signature(run_single_experiment).parameters
+    kw = {name: p.default for name, p in params.items() if p.default is not inspect.Parameter.empty}
+    kw.update(episode_kwargs)
+    kw.update(run_kwargs or {})
+    n_ticks = kw['cycles'] * (kw['light_ticks'] + kw['dark_ticks'])
+    env = GridEnv()
+    meta = {
+        'seeds': list(seeds),
+        'condition': condition,
+        'light_ticks': kw['light_ticks'],
+        'dark_ticks': kw['dark_ticks'],
+        'cycles': kw['cycles'],
+        'memory_k': kw['memory_k'],
+        'memory_decay': kw['memory_decay'],
+        'memory_threshold': kw['memory_threshold'],
+        'width': env.w,
+        'height': env.h,
+        'max_hp_player': env.max_hp_player,
+        'max_hp_npc': env.max_hp_npc,
     }
+    TrajectoryRecorder.check(kw['cycles'], env.w, env.h, max(kw['light_ticks'], kw['dark_ticks']))
+    arr = open_trajectories(path, len(meta['seeds']), n_ticks, meta)
+    arr.flush()
+    del arr
+    return [(condition, s, {**(run_kwargs or {}), 'record_to': (str(path), i)}) for i, s in enumerate(meta['seeds'])]
+
+
+def _run_chunk(chunk):
+    """Zadanie workera: (lista (warunek, seed[, kwargs]), episode_kwargs) -> (pid, czas [s], wiersze)."""
+    tasks, episode_kwargs = chunk
+    t0 = time.perf_counter()
+    rows = []
+    for cond, s, *task_kwargs in tasks:
+        kwargs = {**episode_kwargs, **task_kwargs[0]} if task_kwargs else episode_kwargs
+        rows.append(_episode_row(s, cond, kwargs))
+    _flush_trajectories()
+    return os.getpid(), time.perf_counter() - t0, rows
+
+
+def _default_chunk_size(n_tasks: int, workers: int) -> int:
+    """Domyślna wielkość paczki: ~4 paczki na workera."""
+    return max(1, math.ceil(n_tasks / (4 * workers)))
+
+
+def _deal_chunks(order: List[int], chunk_size: int) -> List[int]:
+    """
+    Rozdaj indeksy `order` (np. malejąco po koszcie) po kolei do paczek po chunk_size.
+
+    Wynik pocięty na ciągłe paczki chunk_size daje paczki z mieszanką ciężkich i lekkich zadań
+    (zamiast paczki 0 z samymi najdroższymi); ostatnia, niepełna paczka dostaje tyle, ile się mieści.
+    """
+    n = len(order)
+    k = math.ceil(n / chunk_size)
+    caps = [chunk_size] * (k - 1) + [n - (k - 1) * chunk_size]
+    chunks: List[List[int]] = [[] for _ in range(k)]
+    j = 0
+    for i in order:
+        while len(chunks[j]) == caps[j]:
+            j = (j + 1) % k
+        chunks[j].append(i)
+        j = (j + 1) % k
+    return [i for chunk in chunks for i in chunk]
+
+
+def run_episodes_parallel(
+    tasks: Sequence[tuple],
+    workers: int,
+    chunk_size: Optional[int] = None,
+    on_chunk: Optional[Callable[[List[tuple], List[dict]], None]] = None,
+    **episode_kwargs,
+) -> Tuple[List[dict], Dict[int, Dict[str, float]]]:
+    """
+    Rozłóż epizody (warunek, seed) na ProcessPoolExecutor w paczkach.
+
+    Kolejność zwracanych wierszy jest taka sama jak kolejność `tasks` (jak w przebiegu szeregowym).
+
+    :param tasks: lista par (condition, seed) lub trójek (condition, seed, kwargs epizodu)
+    :param workers: liczba procesów
+    :param chunk_size: liczba epizodów w paczce (domyślnie ~4 paczki na workera)
+    :param on_chunk: opcjonalny callback (zadania paczki, wiersze paczki) po każdej paczce, w kolejności
+    :return: (wiersze, statystyki per worker: {pid: {'episodes', 'busy_s', 'episodes_per_s'}})
+    """
+    tasks = list(tasks)
+    if chunk_size is None:
+        chunk_size = _default_chunk_size(len(tasks), workers)
+    chunks = [(tasks[i:i + chunk_size], episode_kwargs) for i in range(0, len(tasks), chunk_size)]
+
+    rows: List[dict] = []
+    stats: Dict[int, Dict[str, float]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        # map() zachowuje kolejność paczek → identyczna kolejność wierszy
+        for (chunk_tasks, _), (pid, busy_s, chunk_rows) in zip(chunks, ex.map(_run_chunk, chunks)):
+            rows.extend(chunk_rows)
+            if on_chunk is not None:
+                on_chunk(chunk_tasks, chunk_rows)
+            st = stats.setdefault(pid, {'episodes': 0, 'busy_s': 0.0})
+            st['episodes'] += len(chunk_rows)
+            st['busy_s'] += busy_s
+    for st in stats.values():
+        st['episodes_per_s'] = st['episodes'] / st['busy_s'] if st['busy_s'] > 0 else float('nan')
+    return rows, stats
+
+
+def run_tasks(
+    tasks: Sequence[tuple],
+    workers: int = 1,
+    chunk_size: Optional[int] = None,
+    store=None,
+    interleave: bool = False,
+    **episode_kwargs,
+) -> Tuple[List[dict], Dict[int, Dict[str, float]]]:
+    """
+    Wykonaj zadania (warunek, seed[, kwargs]) szeregowo lub równolegle, opcjonalnie przez results_store.
+
+    Ze `store` (results_store.ResultsStore) epizody już policzone są czytane z bazy, symulowane są
+    tylko brakujące, a ich wyniki zapisywane paczkami (jedna transakcja na paczkę) — przerwany
+    przebieg można wznowić. Kolejność wierszy odpowiada kolejności `tasks`.
+
+    :param interleave: w trybie równoległym rozdaj zadania do paczek po kolei (_deal_chunks) zamiast
+        ciąć je na ciągłe kawałki — dla zadań posortowanych malejąco po koszcie (sweep.py)
+    :return: (wiersze, statystyki workerów — puste w trybie szeregowym)
+    """
+    tasks = list(tasks)
+    rows: List[Optional[dict]] = [None] * len(tasks)
+    keys: List[Optional[str]] = [None] * len(tasks)
+    todo = list(range(len(tasks)))
+    if store is not None:
+        keys = [store.key(cond, s, {**episode_kwargs, **(extra[0] if extra else {})}) for cond, s, *extra in tasks]
+        cached = store.get_many(keys)
+        todo = [i for i, k in enumerate(keys) if k not in cached]
+        for i, k in enumerate(keys):
+            if k in cached:
+                rows[i] = cached[k]
+        print(f'Store: {len(tasks) - len(todo)} epizodów z bazy, {len(todo)} do policzenia')
+
+    if workers > 1 and todo:
+        chunk_size = chunk_size or _default_chunk_size(len(todo), workers)
+        if interleave:
+            todo = _deal_chunks(todo, chunk_size)
+    todo_tasks = [tasks[i] for i in todo]
+    fresh: List[dict] = []
+
+    def save(chunk_tasks: List[tuple], chunk_rows: List[dict]) -> None:
+        if store is not None:
+            start = len(fresh)
+            store.put_many([(keys[todo[start + j]], t, r) for j, (t, r) in enumerate(zip(chunk_tasks, chunk_rows))],
+                           episode_kwargs)
+        fresh.extend(chunk_rows)
+
+    stats: Dict[int, Dict[str, float]] = {}
+    if workers > 1 and todo_tasks:
+        _, stats = run_episodes_parallel(todo_tasks, workers, chunk_size, on_chunk=save, **episode_kwargs)
+    else:
+        step = chunk_size or 64
+        for i in range(0, len(todo_tasks), step):
+            chunk_tasks = todo_tasks[i:i + step]
+            save(chunk_tasks, _run_chunk((chunk_tasks, episode_kwargs))[2])
+    for i, row in zip(todo, fresh):
+        rows[i] = row
+    return rows, stats
+
+
+def _aggregate_chunk(chunk):
+    """Zadanie workera jak _run_chunk, ale zwraca scalone akumulatory zamiast wierszy."""
+    tasks, episode_kwargs = chunk
+    t0 = time.perf_counter()
+    acc = MetricsAccumulator()
+    for cond, s, *task_kwargs in tasks:
+        kwargs = {**episode_kwargs, **task_kwargs[0]} if task_kwargs else episode_kwargs
+        acc.add_row(run_single_experiment(seed=s, condition=cond, **kwargs))
+    return os.getpid(), time.perf_counter() - t0, len(tasks), acc
+
+
+def aggregate_experiments(
+    seeds: Iterable[int],
+    condition: str = 'memory',
+    workers: int = 1,
+    chunk_size: Optional[int] = None,
+    **episode_kwargs,
+) -> MetricsAccumulator:
+    """
+    Agregaty metryk (n, mean, std, min, max) po seedach bez materializowania wierszy per seed.
+
+    Każdy worker zwraca akumulator swojej paczki; wyniki scalamy w kolejności paczek.
+    """
+    tasks = [(condition, s) for s in seeds]
+    if workers <= 1:
+        return _aggregate_chunk((tasks, episode_kwargs))[3]
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(tasks) / (4 * workers)))
+    chunks = [(tasks[i:i + chunk_size], episode_kwargs) for i in range(0, len(tasks), chunk_size)]
+    acc = MetricsAccumulator()
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for _, _, _, chunk_acc in ex.map(_aggregate_chunk, chunks):
+            acc.merge(chunk_acc)
+    return acc
+
+
+def _metric_converged(st: RunningStats, target: float, min_seeds: int, confidence: float) -> bool:
+    """Czy CI metryki jest dość wąskie; bez ≥2 zdefiniowanych wartości CI nie istnieje — brak zbieżności."""
+    if st.count + st.n_nan < min_seeds or st.count < 2:
+        return False
+    return st.ci_halfwidth(confidence) <= target
+
+
+def run_adaptive(
+    runs: Sequence[Tuple[str, str, dict]],
+    seeds: Sequence[int],
+    targets: Dict[str, float],
+    batch_size: int = 10,
+    min_seeds: int = 10,
+    confidence: float = 0.95,
+    workers: int = 1,
+    chunk_size: Optional[int] = None,
+    store=None,
+    **episode_kwargs,
+) -> Tuple[Dict[str, List[dict]], Dict[str, Dict[str, object]]]:
+    """
+    Sekwencyjne próbkowanie seedów: epizody liczone paczkami po `batch_size` seedów, aż połowa
+    szerokości CI każdej metryki z `targets` spadnie poniżej progu albo skończą się seedy (budżet).
+
+    Warunek, który osiągnął zbieżność, nie dostaje kolejnych paczek; pozostałe liczone są razem
+    (jedna pula procesów na paczkę). Seedy pobierane są po kolei z `seeds`.
+
+    :param runs: lista (etykieta, warunek, kwargs przebiegu) jak w run_experiment.py
+    :param targets: {metryka: docelowa połowa szerokości CI (w jednostkach metryki)}
+    :param min_seeds: minimalna liczba epizodów przed sprawdzaniem zbieżności
+    :param confidence: poziom ufności CI (przybliżenie normalne)
+    :return: (wiersze per etykieta, raport per etykieta: seeds, status, {metryka: n/mean/halfwidth/target/converged})
+
+    Status etykiety: 'converged', 'budget' (seedy się skończyły) albo 'undefined' (seedy się skończyły,
+    a któraś metryka ma mniej niż 2 zdefiniowane wartości — CI nie da się policzyć).
+    """
+    known = Episode().metrics()  # kolumny wiersza wyników (epizod bez cykli — bez symulacji)
+    unknown = [m for m in targets if m not in known]
+    if unknown:
+        raise ValueError(f'Nieznana metryka w targets: {", ".join(map(repr, unknown))} (dostępne: {", ".join(known)})')
+    seeds = list(seeds)
+    rows: Dict[str, List[dict]] = {label: [] for label, _, _ in runs}
+    stats: Dict[str, Dict[str, RunningStats]] = {label: {m: RunningStats() for m in targets} for label, _, _ in runs}
+    active = list(runs)
+    used = 0
+    while active and used < len(seeds):
+        batch = seeds[used:used + batch_size]
+        used += len(batch)
+        tasks = [(cond, s, run_kwargs) for _, cond, run_kwargs in active for s in batch]
+        batch_rows, _ = run_tasks(tasks, workers, chunk_size, store, **episode_kwargs)
+        for j, (label, _, _) in enumerate(active):
+            for row in batch_rows[j * len(batch):(j + 1) * len(batch)]:
+                rows[label].append(row)
+                for m, st in stats[label].items():
+                    st.add(float(row[m]))
+        active = [run for run in active
+                  if not all(_metric_converged(stats[run[0]][m], t, min_seeds, confidence) for m, t in targets.items())]
+
+    report: Dict[str, Dict[str, object]] = {}
+    for label, _, _ in runs:
+        metrics = {}
+        for m, st in stats[label].items():
+            metrics[m] = {'n': st.count, 'mean': st.mean, 'halfwidth': st.ci_halfwidth(confidence),
+                          'target': targets[m], 'converged': _metric_converged(st, targets[m], min_seeds, confidence)}
+        if all(v['converged'] for v in metrics.values()):
+            status = 'converged'
+        elif any(v['n'] < 2 for v in metrics.values()):
+            status = 'undefined'
+        else:
+            status = 'budget'
+        report[label] = {
+            'seeds': len(rows[label]),
+            'status': status,
+            'metrics': metrics,
+        }
+    return rows, report
+
+
+def format_worker_stats(stats: Dict[int, Dict[str, float]]) -> str:
+    """Czytelny opis przepustowości workerów (jedna linia na proces)."""
+    lines = []
+    for pid, st in sorted(stats.items()):
+        lines.append(f'  worker pid={pid}: {st["episodes"]} epizodów, {st["busy_s"]:.2f} s, {st["episodes_per_s"]:.1f} ep/s')
+    return '\n'.join(lines)
+
+
+def write_results_csv(out_csv_path, rows: List[dict]) -> None:
+    """Zapisz wiersze wyników do CSV (kolumny wg pierwszego wiersza)."""
+    import csv
+
+    out_csv_path = str(out_csv_path)
+    with open(out_csv_path, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+
+
+RESULT_FORMATS = ('csv', 'npy', 'both')
+
+
+def write_results(out_csv_path, rows: List[dict], results_format: str = 'csv') -> List[str]:
+    """
+    Zapisz wiersze jako CSV, kolumnowy .npy (columnar.py, ta sama nazwa z rozszerzeniem .npy) lub oba.
+
+    :return: ścieżki zapisanych plików
+    """
+    from pathlib import Path
+
+    if results_format not in RESULT_FORMATS:
+        raise ValueError(f'Nieznany format wyników: {results_format!r} (dostępne: {", ".join(RESULT_FORMATS)})')
+    written = []
+    if results_format in ('csv', 'both'):
+        write_results_csv(out_csv_path, rows)
+        written.append(str(out_csv_path))
+    if results_format in ('npy', 'both'):
+        from columnar import columns_from_rows, write_columns
+
+        npy_path = Path(out_csv_path).with_suffix('.npy')
+        write_columns(npy_path, columns_from_rows(rows))
+        written.append(str(npy_path))
+    return written
 
 
 def run_experiments(
     out_csv_path,
     seeds: Iterable[int] = (0, 1, 2, 3, 4),
     condition: str = 'memory',
+    workers: int = 1,
+    chunk_size: Optional[int] = None,
+    trajectory_path=None,
+    store=None,
+    results_format: str = 'csv',
     **episode_kwargs,
 ):
     """
-    Uruchom serię epizodów i zapisz wyniki do CSV.
+    Uruchom serię epizodów i zapisz wyniki do CSV (lub kolumnowo do .npy — results_format).
 
     :param out_csv_path: ścieżka pliku CSV do zapisu wyników
     :param seeds: lista seedów
     :param condition: 'baseline' lub 'memory'
+    :param workers: liczba procesów (1 = przebieg szeregowy)
+    :param chunk_size: liczba epizodów w paczce dla workera (None = automatycznie)
+    :param trajectory_path: opcjonalny plik .npy na trajektorie wszystkich epizodów (trajectory.py)
+    :param store: opcjonalny results_store.ResultsStore — policzone epizody są czytane z bazy
+    :param results_format: 'csv', 'npy' (columnar.py, obok pliku CSV) lub 'both'
     :param episode_kwargs: parametry przekazywane do run_episode (np. memory_k=1)
     """
-    import csv
+    seeds = list(seeds)
+    if trajectory_path is not None and store is not None:
+        raise ValueError('Zapis trajektorii wymaga symulacji wszystkich epizodów — nie łącz go ze store')
+    if trajectory_path is not None:
+        tasks = trajectory_tasks(trajectory_path, seeds, condition, episode_kwargs)
+    else:
+        tasks = [(condition, s) for s in seeds]
+    rows, stats = run_tasks(tasks, workers, chunk_size, store, **episode_kwargs)
+    if stats:
+        print(format_worker_stats(stats))
 
-    rows: List[dict] = []
-    for s in seeds:
-        res = run_single_experiment(seed=s, condition=condition, **episode_kwargs)
-        row = {'seed': s, 'condition': condition}
-        row.update(res)
-        rows.append(row)
-
-    # zapis CSV
-    out_csv_path = str(out_csv_path)
-    with open(out_csv_path, 'w', newline='') as f:
-        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
+    # zapis CSV / kolumn
+    write_results(out_csv_path, rows, results_format)
     return rows
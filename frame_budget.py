@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+frame_budget.py — test budżetu klatki: ile par NPC/gracz da się krokować w stałym tempie (np. 16 / 50 ms).
+
+Średni koszt ticka (m5_cpu_ms_per_tick) nie mówi, czy N NPC zmieści się w klatce gry — liczy się
+rozkład czasu całej klatki i odsetek klatek po terminie. Harness trzyma N niezależnych trójek
+środowisko / NPC (BTGatedAgent) / gracz (ScriptedPlayer) z pamięcią LIGHT jak w experiment.Episode
+i w pętli o stałym tempie wykonuje jeden tick wszystkich trójek na klatkę.
+
+Tryby krokowania:
+- 'sequential' — lista GridEnv / ScriptedPlayer / BTGatedAgent krokowanych po kolei (jak Episode.run)
+- 'batch'      — BatchGridEnv + BatchScriptedPlayer + BTGatedAgent.pick_actions_batch (jeden krok wektorowy)
+- 'threads'    — trójki sekwencyjne podzielone na --workers wątków (pula wątków, klatka = wszystkie części)
+- 'procs'      — trójki sekwencyjne podzielone na --workers procesów (klatka = komunikat do każdego procesu)
+Gracz używa strumieni 'philox' (rng_streams), więc wszystkie tryby symulują dokładnie te same epizody.
+
+Pętla klatek: klatka f ma zaplanowany start start + f * budżet; po pracy śpimy do następnego startu.
+Termin jest przekroczony, gdy klatka kończy się później niż start planowy + budżet (liczy się też
+zaspanie); spóźniona pętla nie nadrabia klatek seriami — kolejny start przesuwa się na „teraz”.
+
+Wyniki:
+- data/frame_budget/results_<tryb>_<budżet>ms.csv — wiersz na N (seed = N, więc analysis_plot porównuje
+  tryby parami przy tym samym N): czas klatki p50 / p99 / max / średni [ms], miss_rate, sustained
+- data/frame_budget/max_n.csv — największe N utrzymujące budżet (miss_rate <= --max_miss) per tryb i budżet
+  (bounded = 0: utrzymany był najwyższy poziom --n, więc to tylko dolne oszacowanie)
+
+Dla każdego trybu i budżetu N rośnie wg --n aż do pierwszego poziomu, który nie utrzymuje budżetu;
+--refine K zawęża wtedy granicę K krokami bisekcji (poziomy pośrednie trafiają do tych samych CSV).
+
+Użycie:
+  python frame_budget.py --modes sequential,batch --budgets_ms 16,50 --n 250,500,1000,2000,4000,8000
+  python frame_budget.py --modes threads,procs --workers 4 --budgets_ms 16 --refine 3
+  python analysis_plot.py --outdir data/frame_budget --metrics p50_frame_ms,p99_frame_ms,miss_rate --n_boot 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import multiprocessing as mp
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from agent import BTGatedAgent
+from batch_env import BatchGridEnv
+from batch_player import BatchScriptedPlayer
+from env import ALL_MASK, LEARNABLE_MASK, MOVES_MASK, NOOP, GridEnv
+from instrumentation import LatencyHistogram
+from memory import LightMemory
+from player import ScriptedPlayer
+
+MODES = ('sequential', 'batch', 'threads', 'procs')
+
+# Parametry grupy trójek (wspólne dla trybów)
+GROUP_PARAMS = ('light_ticks', 'dark_ticks', 'condition', 'memory_k', 'width', 'height')
+
+
+class SequentialGroup:
+    def __init__(self, seeds: Sequence[int], light_ticks: int = 10, dark_ticks: int = 10, condition: str = 'memory',
+                 memory_k: int = 1, width: int = 45, height: int = 15) -> None:
+        """
+        Trójki GridEnv / ScriptedPlayer / BTGatedAgent krokowane po kolei (wspólny zegar faz).
+
+        :param seeds: seedy epizodów (jeden na trójkę)
+        :param light_ticks: długość fazy LIGHT (ticki)
+        :param dark_ticks: długość fazy DARK (ticki)
+        :param condition: 'memory' albo 'baseline'
+        :param memory_k: liczba pamiętanych faz LIGHT
+        """
+        self.envs = [GridEnv(width, height, seed=s) for s in seeds]
+        self.players = [ScriptedPlayer(rng_mode='philox', rng_episode=s) for s in seeds]
+        self.agent = BTGatedAgent(compiled=True)  # bezstanowy — wspólny dla trójek
+        self.memories = [LightMemory(memory_k) for _ in seeds]
+        self.memory = condition == 'memory'
+        self.allowed = [MOVES_MASK if self.memory else ALL_MASK] * len(self.envs)
+        self.observed = [0] * len(self.envs)
+        self.light_ticks = light_ticks
+        self.period = light_ticks + dark_ticks
+        self.tick_no = 0
+
+    def step(self) -> None:
+        """Jeden tick wszystkich trójek (kolejność jak w experiment.Episode)."""
+        r = self.tick_no % self.period
+        light = r < self.light_ticks
+        phase, t = ('LIGHT', r) if light else ('DARK', r - self.light_ticks)
+        pick_action = self.agent.pick_action_code
+        allowed, observed = self.allowed, self.observed
+        for i, (env, player) in enumerate(zip(self.envs, self.players)):
+            action_p = player.act_code(env, t, phase)
+            action_n = pick_action(env, allowed[i])
+            env.step_player(action_p)
+            if light:
+                observed[i] |= 1 << action_p
+            if action_n != NOOP:
+                env.step_npc(action_n)
+            env.tick_cooldowns()
+        self.tick_no += 1
+        if self.tick_no % self.period == 0:
+            for i, mem in enumerate(self.memories):
+                mem.push(observed[i])
+                allowed[i] = MOVES_MASK | (mem.mask & LEARNABLE_MASK) if self.memory else ALL_MASK
+                observed[i] = 0
+
+    def positions(self) -> np.ndarray:
+        """Pozycje [gracz x, y, NPC x, y] trójek (porównanie trybów)."""
+        return np.array([env.player + env.npc for env in self.envs], dtype=np.int32).reshape(-1, 4)
+
+
+class BatchGroup:
+    def __init__(self, seeds: Sequence[int], light_ticks: int = 10, dark_ticks: int = 10, condition: str = 'memory',
+                 memory_k: int = 1, width: int = 45, height: int = 15) -> None:
+        """Te same trójki co SequentialGroup jako jeden BatchGridEnv / BatchScriptedPlayer (parametry jak tam)."""
+        self.env = BatchGridEnv(seeds, width, height)
+        self.player = BatchScriptedPlayer(seeds)
+        self.agent = BTGatedAgent(compiled=True)
+        self.memory = condition == 'memory'
+        n = len(self.env.seeds)
+        self.allowed = np.full(n, MOVES_MASK if self.memory else ALL_MASK, dtype=np.int32)
+        self.observed = np.zeros(n, dtype=np.int32)
+        self.history = np.zeros((memory_k, n), dtype=np.int32)  # pierścień K ostatnich masek LIGHT
+        self.hist_pos = 0
+        self.light_ticks = light_ticks
+        self.period = light_ticks + dark_ticks
+        self.tick_no = 0
+
+    def step(self) -> None:
+        """Jeden wektorowy tick wszystkich epizodów."""
+        env = self.env
+        light = self.tick_no % self.period < self.light_ticks
+        actions_p = self.player.act_codes(env, light)
+        actions_n = self.agent.pick_actions_batch(env, self.allowed)
+        env.step_player(actions_p)
+        if light:
+            self.observed |= 1 << actions_p
+        env.step_npc(actions_n)
+        env.tick_cooldowns()
+        self.tick_no += 1
+        if self.tick_no % self.period == 0:
+            self.history[self.hist_pos] = self.observed
+            self.hist_pos = (self.hist_pos + 1) % len(self.history)
+            if self.memory:
+                self.allowed = MOVES_MASK | (np.bitwise_or.reduce(self.history, axis=0) & LEARNABLE_MASK)
+            self.observed = np.zeros_like(self.observed)
+
+    def positions(self) -> np.ndarray:
+        return np.hstack([self.env.player, self.env.npc])
+
+
+def _shards(seeds: Sequence[int], parts: int) -> List[List[int]]:
+    """Podział seedów na `parts` ciągłych części (różnica długości <= 1)."""
+    bounds = np.linspace(0, len(seeds), parts + 1).astype(int)
+    return [list(seeds[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+class ThreadedGroup:
+    def __init__(self, seeds: Sequence[int], workers: int = 2, **params) -> None:
+        """Części SequentialGroup krokowane w puli wątków (klatka kończy się po wszystkich częściach)."""
+        self.groups = [SequentialGroup(s, **params) for s in _shards(seeds, workers)]
+        self.pool = ThreadPoolExecutor(len(self.groups))
+
+    def step(self) -> None:
+        for f in [self.pool.submit(g.step) for g in self.groups]:
+            f.result()
+
+    def positions(self) -> np.ndarray:
+        return np.vstack([g.positions() for g in self.groups])
+
+    def close(self) -> None:
+        self.pool.shutdown()
+
+
+def _shard_worker(conn, seeds: List[int], params: Dict[str, Any]) -> None:
+    """Proces części: krok na każdy komunikat True, False kończy (odpowiedź None po kroku)."""
+    group = SequentialGroup(seeds, **params)
+    conn.send(None)
+    while True:
+        msg = conn.recv()
+        if msg is False:
+            break
+        if msg == 'positions':
+            conn.send(group.positions())
+            continue
+        group.step()
+        conn.send(None)
+    conn.close()
+
+
+class ProcessGroup:
+    def __init__(self, seeds: Sequence[int], workers: int = 2, **params) -> None:
+        """Części SequentialGroup w osobnych procesach; klatka = komunikat do każdego i czekanie na odpowiedzi."""
+        ctx = mp.get_context('spawn')
+        self.conns, self.procs = [], []
+        for shard in _shards(seeds, workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_shard_worker, args=(child, shard, params), daemon=True)
+            proc.start()
+            self.conns.append(parent)
+            self.procs.append(proc)
+        for conn in self.conns:
+            conn.recv()  # części zbudowane
+
+    def step(self) -> None:
+        for conn in self.conns:
+            conn.send(True)
+        for conn in self.conns:
+            conn.recv()
+
+    def positions(self) -> np.ndarray:
+        for conn in self.conns:
+            conn.send('positions')
+        return np.vstack([conn.recv() for conn in self.conns])
+
+    def close(self) -> None:
+        for conn in self.conns:
+            conn.send(False)
+        for proc in self.procs:
+            proc.join()
+
+
+def make_group(mode: str, seeds: Sequence[int], workers: int = 2, **params):
+    """Grupa trójek dla trybu krokowania (metody step(), positions(); close() w trybach z pulą)."""
+    if mode == 'sequential':
+        return SequentialGroup(seeds, **params)
+    if mode == 'batch':
+        return BatchGroup(seeds, **params)
+    if mode == 'threads':
+        return ThreadedGroup(seeds, workers, **params)
+    if mode == 'procs':
+        return ProcessGroup(seeds, workers, **params)
+    raise ValueError(f'Nieznany tryb: {mode!r} (dostępne: {", ".join(MODES)})')
+
+
+def run_frames(step: Callable[[], None], frames: int, budget_ms: float, warmup: int = 10):
+    """
+    Pętla o stałym tempie: `warmup` klatek bez pomiaru, potem `frames` mierzonych.
+
+    :return: (LatencyHistogram czasów klatek [ns], liczba klatek po terminie)
+    """
+    ns = time.perf_counter_ns
+    budget = int(budget_ms * 1e6)
+    hist = LatencyHistogram()
+    misses = 0
+    start = ns()
+    for f in range(warmup + frames):
+        t0 = ns()
+        step()
+        t1 = ns()
+        if f >= warmup:
+            hist.add(t1 - t0)
+            misses += t1 > start + budget
+        # następna klatka: planowo start + budżet; po spóźnieniu od razu (bez nadrabiania serią)
+        start = max(start + budget, t1)
+        delay = start - ns()
+        if delay > 0:
+            time.sleep(delay / 1e9)
+    return hist, misses
+
+
+def measure(mode: str, n: int, budget_ms: float, frames: int, warmup: int = 10, workers: int = 2,
+            seed0: int = 0, **params) -> Dict[str, Any]:
+    """Jeden pomiar: N trójek w trybie `mode`; wiersz wyników (czasy klatki w ms, miss_rate)."""
+    group = make_group(mode, range(seed0, seed0 + n), workers, **params)
+    try:
+        hist, misses = run_frames(group.step, frames, budget_ms, warmup)
+    finally:
+        if hasattr(group, 'close'):
+            group.close()
+    return {
+        'seed': n,
+        'n_npcs': n,
+        'budget_ms': budget_ms,
+        'workers': workers if mode in ('threads', 'procs') else 1,
+        'frames': frames,
+        'p50_frame_ms': hist.percentile_ns(50) / 1e6,
+        'p99_frame_ms': hist.percentile_ns(99) / 1e6,
+        'max_frame_ms': hist.max_ns / 1e6,
+        'mean_frame_ms': hist.mean_ns / 1e6,
+        'miss_rate': misses / frames,
+        'ms_per_npc_tick': hist.mean_ns / 1e6 / n,
+    }
+
+
+def find_max_n(mode: str, budget_ms: float, levels: Sequence[int], max_miss: float, refine: int = 0,
+               report: Callable[[Dict[str, Any]], None] = lambda row: None, **kwargs) -> Tuple[int, bool]:
+    """
+    Największe N (z poziomów `levels`, potem bisekcja `refine` razy) o miss_rate <= max_miss.
+
+    Poziomy są mierzone rosnąco do pierwszego, który nie utrzymuje budżetu. Każdy pomiar trafia do report().
+    :return: (największe utrzymane N — 0, gdy żadne; czy granica znaleziona — False, gdy utrzymany był
+             najwyższy poziom i prawdziwe maksimum może być większe)
+    """
+    best, fail = 0, None
+    for n in sorted(levels):
+        row = measure(mode, n, budget_ms, **kwargs)
+        row['sustained'] = int(row['miss_rate'] <= max_miss)
+        report(row)
+        if not row['sustained']:
+            fail = n
+            break
+        best = n
+    for _ in range(refine if fail is not None else 0):
+        n = (best + fail) // 2
+        if n <= best:
+            break
+        row = measure(mode, n, budget_ms, **kwargs)
+        row['sustained'] = int(row['miss_rate'] <= max_miss)
+        report(row)
+        if row['sustained']:
+            best = n
+        else:
+            fail = n
+    return best, fail is not None
+
+
+def write_rows(path: Path, rows: List[Dict[str, Any]]) -> None:
+    """CSV w układzie results_*.csv (rosnąco po N)."""
+    rows = sorted(rows, key=lambda r: r['n_npcs'])
+    with path.open('w', newline='') as fh:
+        w = csv.DictWriter(fh, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Budżet klatki: N par NPC/gracz w pętli o stałym tempie')
+    ap.add_argument('--modes', type=str, default='sequential,batch', help=f'Tryby krokowania ({", ".join(MODES)})')
+    ap.add_argument('--budgets_ms', type=str, default='16,50', help='Budżety klatki [ms]')
+    ap.add_argument('--n', type=str, default='250,500,1000,2000,4000,8000,16000', help='Poziomy N (rosnąco)')
+    ap.add_argument('--refine', type=int, default=0, help='Kroki bisekcji granicy po pierwszym nieutrzymanym N')
+    ap.add_argument('--frames', type=int, default=200, help='Liczba mierzonych klatek na pomiar')
+    ap.add_argument('--warmup', type=int, default=10, help='Klatki rozgrzewki (bez pomiaru)')
+    ap.add_argument('--max_miss', type=float, default=0.01, help='Dopuszczalny odsetek klatek po terminie')
+    ap.add_argument('--workers', type=int, default=2, help='Liczba wątków / procesów (tryby threads, procs)')
+    ap.add_argument('--light_ticks', type=int, default=10, help='Długość fazy LIGHT (ticki)')
+    ap.add_argument('--dark_ticks', type=int, default=10, help='Długość fazy DARK (ticki)')
+    ap.add_argument('--condition', type=str, default='memory', help='Warunek: memory / baseline')
+    ap.add_argument('--memory_k', type=int, default=1, help='Liczba pamiętanych faz LIGHT')
+    ap.add_argument('--outdir', type=str, default='data/frame_budget', help='Katalog wyników')
+    return ap.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        raise SystemExit(f'Nieznany tryb: {", ".join(sorted(unknown))} (dostępne: {", ".join(MODES)})')
+    budgets = [float(b) for b in args.budgets_ms.split(',') if b.strip()]
+    levels = [int(n) for n in args.n.split(',') if n.strip()]
+    params = dict(light_ticks=args.light_ticks, dark_ticks=args.dark_ticks, condition=args.condition,
+                  memory_k=args.memory_k)
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    def report(row: Dict[str, Any]) -> None:
+        rows.append(row)
+        print(f'[frame_budget] {mode:>10} budget={budget:g} ms N={row["n_npcs"]:>6} '
+              f'p50={row["p50_frame_ms"]:.2f} p99={row["p99_frame_ms"]:.2f} max={row["max_frame_ms"]:.2f} ms '
+              f'miss={row["miss_rate"]:.1%}', flush=True)
+
+    summary = []
+    for mode in modes:
+        for budget in budgets:
+            rows: List[Dict[str, Any]] = []
+            best, bounded = find_max_n(mode, budget, levels, args.max_miss, args.refine, report, frames=args.frames,
+                                       warmup=args.warmup, workers=args.workers, **params)
+            condition = f'{mode}_{budget:g}ms'
+            write_rows(outdir / f'results_{condition}.csv', [{**r, 'condition': condition} for r in rows])
+            summary.append({'mode': mode, 'budget_ms': budget, 'workers': rows[0]['workers'], 'max_n': best,
+                            'bounded': int(bounded), 'max_miss': args.max_miss})
+            note = '' if bounded else ' (najwyższy poziom --n utrzymany — granica może być wyżej)'
+            print(f'[frame_budget] {mode}: max N = {best} przy budżecie {budget:g} ms{note}', flush=True)
+
+    with (outdir / 'max_n.csv').open('w', newline='') as fh:
+        w = csv.DictWriter(fh, fieldnames=list(summary[0]))
+        w.writeheader()
+        w.writerows(summary)
+    print(f'Wrote {outdir} ({len(summary)} konfiguracji)')
+
+
+if __name__ == '__main__':
+    main()
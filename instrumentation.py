@@ -0,0 +1,173 @@
+"""
+instrumentation.py — tani pomiar czasu ticka (M5) z podziałem na komponenty.
+
+Interfejs:
+- klasa TickProfiler(sample_every=1)
+- metoda should_sample() -> bool        — czy mierzyć bieżący tick (co N-ty tick)
+- metoda record(t0, t1, t2, t3)         — znaczniki perf_counter_ns: przed player.act, przed
+                                          agent.pick_action, przed env.step_*, po tick_cooldowns
+- metoda metrics() -> dict              — kolumny m5_* do CSV (ms)
+- metoda copy()                         — niezależna kopia (rozgałęzianie epizodów)
+- funkcja timer_overhead_ns()           — skalibrowany koszt jednego odczytu perf_counter_ns
+- klasa LatencyHistogram                — add(ns), merge(other), count / mean_ns / max_ns, percentile_ns(q)
+                                          (opóźnienia pętli czasu rzeczywistego, serwera, harnessu)
+
+Uwagi:
+- Każdy przedział między dwoma kolejnymi odczytami zawiera koszt jednego odczytu zegara;
+  odejmujemy skalibrowany narzut (medianę różnic odczytów „back-to-back”), nie schodząc poniżej 0.
+- Percentyle p50/p95/p99 czasu ticka liczymy ze stałego histogramu (8 kubełków na oktawę,
+  błąd względny < 7%), więc pamięć nie rośnie z liczbą ticków.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Optional
+
+COMPONENTS = ('player', 'agent', 'env')
+
+# Histogram: kubełek = (oktawa, 3 najstarsze bity mantysy) → 8 kubełków na podwojenie wartości
+_SUB_BITS = 3
+_SUB = 1 << _SUB_BITS
+_N_BUCKETS = 64 * _SUB
+
+_OVERHEAD_NS: Optional[int] = None
+
+
+def timer_overhead_ns(samples: int = 20001) -> int:
+    """Mediana różnicy dwóch kolejnych odczytów perf_counter_ns (liczona raz na proces)."""
+    global _OVERHEAD_NS
+    if _OVERHEAD_NS is None:
+        ns = time.perf_counter_ns
+        diffs = []
+        for _ in range(samples):
+            a = ns()
+            diffs.append(ns() - a)
+        diffs.sort()
+        _OVERHEAD_NS = diffs[len(diffs) // 2]
+    return _OVERHEAD_NS
+
+
+def _bucket(x: int) -> int:
+    """Indeks kubełka histogramu dla wartości x >= 0 [ns]."""
+    if x < _SUB:
+        return x
+    shift = x.bit_length() - 1 - _SUB_BITS
+    return (shift + 1) * _SUB + ((x >> shift) & (_SUB - 1))
+
+
+def _bucket_mid(i: int) -> float:
+    """Środek przedziału wartości kubełka i [ns]."""
+    if i < _SUB:
+        return float(i)
+    shift = i // _SUB - 1
+    low = (_SUB + i % _SUB) << shift
+    return low + ((1 << shift) - 1) / 2.0
+
+
+def _hist_percentile(hist: List[int], n: int, q: float) -> float:
+    """Percentyl q (0..100) z histogramu n wartości [ns]; nan gdy n == 0."""
+    if not n:
+        return float('nan')
+    rank = q / 100.0 * n
+    cum = 0
+    for i, c in enumerate(hist):
+        cum += c
+        if c and cum >= rank:
+            return _bucket_mid(i)
+    return float('nan')
+
+
+class LatencyHistogram:
+    __slots__ = ('count', 'total_ns', 'max_ns', 'hist')
+
+    def __init__(self) -> None:
+        """Rozkład opóźnień [ns] w stałej pamięci (ten sam histogram co percentyle M5)."""
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.hist: List[int] = [0] * _N_BUCKETS
+
+    def add(self, x: int) -> None:
+        """Dodaj opóźnienie x [ns] (wartości ujemne liczone jako 0)."""
+        x = int(x) if x > 0 else 0
+        self.hist[_bucket(x)] += 1
+        self.count += 1
+        self.total_ns += x
+        if x > self.max_ns:
+            self.max_ns = x
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        self.hist = [a + b for a, b in zip(self.hist, other.hist)]
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        return self
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.count if self.count else float('nan')
+
+    def percentile_ns(self, q: float) -> float:
+        """Percentyl q (0..100) [ns]; nan bez pomiarów. Środek kubełka jest przycinany do zmierzonego maksimum."""
+        if not self.count:
+            return float('nan')
+        return min(_hist_percentile(self.hist, self.count, q), self.max_ns)
+
+
+class TickProfiler:
+    def __init__(self, sample_every: int = 1) -> None:
+        """
+        :param sample_every: mierz co N-ty tick (1 = każdy)
+        """
+        if sample_every < 1:
+            raise ValueError(f'sample_every musi być >= 1 (podano {sample_every})')
+        self.sample_every = int(sample_every)
+        self.overhead_ns = timer_overhead_ns()
+        self.ticks = 0            # wszystkie ticki
+        self.sampled = 0          # zmierzone ticki
+        self.total_ns: List[int] = [0] * len(COMPONENTS)
+        self.hist: List[int] = [0] * _N_BUCKETS
+
+    def copy(self) -> 'TickProfiler':
+        other = object.__new__(TickProfiler)
+        other.__dict__.update(self.__dict__)
+        other.total_ns = list(self.total_ns)
+        other.hist = list(self.hist)
+        return other
+
+    def should_sample(self) -> bool:
+        """Zlicz tick i zwróć True, gdy ma być zmierzony."""
+        self.ticks += 1
+        return (self.ticks - 1) % self.sample_every == 0
+
+    def record(self, t0: int, t1: int, t2: int, t3: int) -> None:
+        """Dodaj pomiar ticka: [t0, t1) gracz, [t1, t2) agent, [t2, t3) środowisko."""
+        ov = self.overhead_ns
+        player = t1 - t0 - ov
+        agent = t2 - t1 - ov
+        env = t3 - t2 - ov
+        player = player if player > 0 else 0
+        agent = agent if agent > 0 else 0
+        env = env if env > 0 else 0
+        tot = self.total_ns
+        tot[0] += player
+        tot[1] += agent
+        tot[2] += env
+        self.hist[_bucket(player + agent + env)] += 1
+        self.sampled += 1
+
+    def percentile_ns(self, q: float) -> float:
+        """Percentyl q (0..100) czasu ticka z histogramu [ns]; nan bez pomiarów."""
+        return _hist_percentile(self.hist, self.sampled, q)
+
+    def metrics(self) -> Dict[str, float]:
+        """Kolumny M5 (ms/tick): średnia całkowita, średnie per komponent, p50/p95/p99."""
+        n = self.sampled
+        out: Dict[str, float] = {}
+        out['m5_cpu_ms_per_tick'] = sum(self.total_ns) / n / 1e6 if n else 0.0
+        for name, t in zip(COMPONENTS, self.total_ns):
+            out[f'm5_{name}_ms'] = t / n / 1e6 if n else 0.0
+        for q in (50, 95, 99):
+            out[f'm5_p{q}_ms'] = self.percentile_ns(q) / 1e6
+        return out
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+load_test.py — generator obciążenia dla sim_server.py: N równoległych sesji sterowanych ScriptedPlayer.
+
+Każdy klient to osobne połączenie (sesja serwera): reset z własnym seedem, potem `steps` kroków
+akcjami ScriptedPlayer(rng_seed=seed + 13) liczonymi ze stanu odesłanego przez serwer. Klient wysyła
+kolejny krok dopiero po odpowiedzi na poprzedni (zamknięta pętla), więc opóźnienie kroku to czas
+od wysłania akcji do odebrania odpowiedzi.
+
+Poziom obciążenia (liczba sesji) przebiega w trzech etapach: wszystkie sesje się łączą (z limitem
+równoczesnych połączeń), czekają na wspólny start, po czym krokują. Klienci mogą być rozłożeni
+na kilka procesów (--procs), żeby generator nie był wąskim gardłem.
+
+Raport per poziom: kroki/s (łącznie), opóźnienie kroku p50/p99/max (ms, instrumentation.LatencyHistogram)
+i średni rozmiar paczki kroków po stronie serwera (op "stats").
+
+Użycie:
+  python load_test.py --spawn_server --sessions 1000,5000,10000 --steps 50     # -> data/load_test.csv
+  python load_test.py --unix /tmp/echo_sim.sock --sessions 2000 --procs 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from instrumentation import LatencyHistogram
+from player import ScriptedPlayer
+
+# Maksymalna liczba równocześnie otwieranych połączeń (kolejka listen serwera)
+CONNECT_CONCURRENCY = 256
+
+
+class _ClientView:
+    """Stan sesji z odpowiedzi serwera z interfejsem GridEnv potrzebnym ScriptedPlayer."""
+
+    def __init__(self, state: Dict[str, Any]) -> None:
+        self.update(state)
+
+    def update(self, state: Dict[str, Any]) -> None:
+        self.player = state['player']
+        self.npc = state['npc']
+        self.skill_cd_player = state['skill_cd_player']
+        self.phase = state['phase']
+        self.tick = state['tick']
+
+    def dist(self) -> int:
+        return abs(self.player[0] - self.npc[0]) + abs(self.player[1] - self.npc[1])
+
+
+async def _open(address: Dict[str, Any]):
+    if address.get('unix'):
+        return await asyncio.open_unix_connection(address['unix'], limit=1 << 16)
+    return await asyncio.open_connection(address['host'], address['port'], limit=1 << 16)
+
+
+async def _request(reader, writer, msg: Dict[str, Any]) -> Dict[str, Any]:
+    writer.write(json.dumps(msg).encode() + b'\n')
+    resp = json.loads(await reader.readline())
+    if 'error' in resp:
+        raise RuntimeError(f'Błąd serwera: {resp["error"]}')
+    return resp
+
+
+async def _run_clients(address: Dict[str, Any], seeds: List[int], steps: int, session: Dict[str, Any],
+                       ready, start) -> Dict[str, Any]:
+    """Klienci jednego procesu: połącz wszystkich, zgłoś gotowość, po starcie krokuj."""
+    sem = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def connect(seed: int):
+        async with sem:
+            reader, writer = await _open(address)
+            resp = await _request(reader, writer, {'op': 'reset', 'seed': seed, **session})
+        return reader, writer, resp['state']
+
+    conns = await asyncio.gather(*(connect(s) for s in seeds))
+    ready.put(len(conns))
+    await asyncio.get_running_loop().run_in_executor(None, start.wait)
+
+    hist = LatencyHistogram()
+    ns = time.perf_counter_ns
+
+    async def client(seed: int, reader, writer, state) -> None:
+        player = ScriptedPlayer(rng_seed=seed + 13)
+        view = _ClientView(state)
+        for _ in range(steps):
+            action = player.act_code(view, view.tick, view.phase)
+            t0 = ns()
+            writer.write(b'{"action": %d}\n' % action)
+            resp = json.loads(await reader.readline())
+            hist.add(ns() - t0)
+            view.update(resp['state'])
+
+    t_start = time.time()
+    await asyncio.gather(*(client(s, *c) for s, c in zip(seeds, conns)))
+    t_end = time.time()
+    for _, writer, _ in conns:
+        writer.close()
+    return {'hist': hist.hist, 'count': hist.count, 'total_ns': hist.total_ns, 'max_ns': hist.max_ns,
+            't_start': t_start, 't_end': t_end}
+
+
+def _client_proc(address, seeds, steps, session, ready, start, results) -> None:
+    try:
+        results.put(asyncio.run(_run_clients(address, seeds, steps, session, ready, start)))
+    except Exception as e:
+        ready.put(-1)
+        results.put({'error': repr(e)})
+
+
+def _server_stats(address: Dict[str, Any]) -> Dict[str, Any]:
+    async def query():
+        reader, writer = await _open(address)
+        resp = await _request(reader, writer, {'op': 'stats'})
+        writer.close()
+        return resp['stats']
+    return asyncio.run(query())
+
+
+def run_level(address: Dict[str, Any], n_sessions: int, steps: int, procs: int = 1,
+              session: Optional[Dict[str, Any]] = None, seed0: int = 0) -> Dict[str, Any]:
+    """
+    Jeden poziom obciążenia: n_sessions równoległych sesji po `steps` kroków.
+
+    :return: wiersz raportu (sessions, steps, wall_s, steps_per_s, p50/p99/max ms, mean_batch)
+    """
+    ctx = mp.get_context('spawn')
+    ready, results, start = ctx.Queue(), ctx.Queue(), ctx.Event()
+    seeds = list(range(seed0, seed0 + n_sessions))
+    before = _server_stats(address)
+    workers = [ctx.Process(target=_client_proc, args=(address, seeds[p::procs], steps, session or {},
+                                                      ready, start, results))
+               for p in range(procs)]
+    for w in workers:
+        w.start()
+    connected = [ready.get() for _ in workers]
+    start.set()
+    outs = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+    errors = [o['error'] for o in outs if 'error' in o]
+    if errors or min(connected) < 0:
+        raise RuntimeError(f'Klienci zakończyli się błędem: {"; ".join(errors)}')
+    after = _server_stats(address)
+
+    hist = LatencyHistogram()
+    for o in outs:
+        part = LatencyHistogram()
+        part.hist, part.count, part.total_ns, part.max_ns = o['hist'], o['count'], o['total_ns'], o['max_ns']
+        hist.merge(part)
+    wall = max(o['t_end'] for o in outs) - min(o['t_start'] for o in outs)
+    batches = after['batches'] - before['batches']
+    return {
+        'sessions': n_sessions,
+        'procs': procs,
+        'steps_per_session': steps,
+        'steps': hist.count,
+        'wall_s': wall,
+        'steps_per_s': hist.count / wall if wall > 0 else float('nan'),
+        'p50_ms': hist.percentile_ns(50) / 1e6,
+        'p99_ms': hist.percentile_ns(99) / 1e6,
+        'max_ms': hist.max_ns / 1e6,
+        'mean_batch': (after['steps'] - before['steps']) / batches if batches else float('nan'),
+    }
+
+
+def spawn_server(address: Dict[str, Any], extra: List[str]) -> subprocess.Popen:
+    """Uruchom sim_server.py jako podproces i poczekaj, aż zacznie nasłuchiwać."""
+    cmd = [sys.executable, str(Path(__file__).with_name('sim_server.py'))]
+    if address.get('unix'):
+        cmd += ['--unix', address['unix']]
+    else:
+        cmd += ['--host', address['host'], '--port', str(address['port'])]
+    proc = subprocess.Popen(cmd + extra, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if 'listening' not in line:
+        proc.kill()
+        raise RuntimeError(f'Serwer nie wystartował: {line!r}')
+    return proc
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Generator obciążenia sim_server.py (klienci ScriptedPlayer)')
+    ap.add_argument('--sessions', type=str, default='1000,5000,10000', help='Liczby równoległych sesji (poziomy)')
+    ap.add_argument('--steps', type=int, default=50, help='Liczba kroków na sesję')
+    ap.add_argument('--procs', type=int, default=1, help='Liczba procesów klientów')
+    ap.add_argument('--host', type=str, default='127.0.0.1', help='Adres TCP serwera')
+    ap.add_argument('--port', type=int, default=8765, help='Port TCP serwera')
+    ap.add_argument('--unix', type=str, default='', help='Gniazdo Unix serwera (zamiast TCP)')
+    ap.add_argument('--spawn_server', action='store_true', help='Uruchom sim_server.py na czas testu')
+    ap.add_argument('--condition', type=str, default='memory', help='Warunek sesji')
+    ap.add_argument('--light_ticks', type=int, default=10, help='Długość fazy LIGHT (ticki)')
+    ap.add_argument('--dark_ticks', type=int, default=10, help='Długość fazy DARK (ticki)')
+    ap.add_argument('--out', type=str, default='data/load_test.csv', help='Plik CSV z raportem')
+    return ap.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    address: Dict[str, Any] = {'host': args.host, 'port': args.port}
+    if args.unix:
+        address = {'unix': args.unix}
+    elif args.spawn_server:
+        address = {'unix': f'/tmp/echo_sim_{os.getpid()}.sock'}
+    session = dict(condition=args.condition, light_ticks=args.light_ticks, dark_ticks=args.dark_ticks)
+
+    server = spawn_server(address, []) if args.spawn_server else None
+    rows = []
+    try:
+        for n in [int(s) for s in args.sessions.split(',') if s.strip()]:
+            row = run_level(address, n, args.steps, args.procs, session)
+            rows.append(row)
+            print(f'[load_test] sessions={n:>6} steps/s={row["steps_per_s"]:>9.0f} '
+                  f'p50={row["p50_ms"]:.2f} ms p99={row["p99_ms"]:.2f} ms max={row["max_ms"]:.2f} ms '
+                  f'mean_batch={row["mean_batch"]:.1f}', flush=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            if address.get('unix') and os.path.exists(address['unix']):
+                os.unlink(address['unix'])
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with out.open('w', newline='') as fh:
+        w = csv.DictWriter(fh, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+    print(f'Wrote {out} ({len(rows)} wierszy)')
+
+
+if __name__ == '__main__':
+    main()
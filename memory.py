@@ -0,0 +1,116 @@
+"""
+memory.py — pamięć K ostatnich faz LIGHT dla warunku `memory`.
+
+Interfejs:
+- klasa LightMemory(k=1, decay=None, threshold=0.5)
+- metoda push(observed_mask) — dopisz maskę akcji zaobserwowanych w bieżącym LIGHT[c]
+- atrybuty: mask (akcje „pamiętane” → dozwolone w cyklu c+1), last (maska LIGHT[c])
+- metoda copy() — niezależna kopia (rozgałęzianie epizodów)
+
+Historia to pierścień K masek bitowych (env.mask_of). Unia jest aktualizowana przyrostowo:
+dla każdej akcji trzymamy liczbę wystąpień w oknie (lub wagę przy zanikaniu), więc push()
+kosztuje O(liczba akcji) niezależnie od K.
+
+Zanikanie (opcjonalne, per akcja): waga akcji a to suma decay_a^(wiek-1) po cyklach okna,
+w których ją zaobserwowano (wiek = 1 dla LIGHT[c]). Akcja jest pamiętana, gdy waga >= threshold.
+Bez zanikania (decay=None) waga to liczba wystąpień, czyli mask = unia K ostatnich masek.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Union
+
+from env import ACTIONS
+
+# tolerancja dla wag zmiennoprzecinkowych (odejmowanie wygasłych wkładów)
+_EPS = 1e-9
+
+Decay = Union[float, Dict[str, float], None]
+
+
+def parse_decay(spec: str) -> Decay:
+    """'0.5' -> 0.5; 'SKILL=0.5,ATTACK=0.9' -> {'SKILL': 0.5, 'ATTACK': 0.9}; '' -> None."""
+    spec = spec.strip()
+    if not spec:
+        return None
+    if '=' not in spec:
+        return float(spec)
+    out: Dict[str, float] = {}
+    for part in spec.split(','):
+        if part.strip():
+            name, value = part.split('=', 1)
+            out[name.strip()] = float(value)
+    return out
+
+
+class LightMemory:
+    def __init__(self, k: int = 1, decay: Decay = None, threshold: float = 0.5) -> None:
+        """
+        :param k: liczba pamiętanych faz LIGHT (K >= 1)
+        :param decay: współczynnik zanikania (float dla wszystkich akcji lub dict nazwa -> float); None = brak
+        :param threshold: minimalna waga akcji, by była pamiętana
+        """
+        if k < 1:
+            raise ValueError(f'memory_k musi być >= 1 (podano {k})')
+        self.k = int(k)
+        self.threshold = float(threshold)
+        self.ring: List[int] = [0] * self.k
+        self.pos = 0  # indeks najstarszego wpisu (nadpisywany przy push)
+        self.mask = 0
+        self.last = 0
+
+        if decay is None:
+            self.gamma: Optional[List[float]] = None
+        elif isinstance(decay, dict):
+            unknown = set(decay) - set(ACTIONS)
+            if unknown:
+                raise ValueError(f'Nieznane akcje w memory_decay: {sorted(unknown)}')
+            self.gamma = [float(decay.get(a, 1.0)) for a in ACTIONS]
+        else:
+            self.gamma = [float(decay)] * len(ACTIONS)
+        # wkład obserwacji w chwili wypadnięcia z okna: decay^K
+        self._gamma_k = None if self.gamma is None else [g ** self.k for g in self.gamma]
+        self.weights: List[float] = [0.0] * len(ACTIONS)
+        self.counts: List[int] = [0] * len(ACTIONS)
+
+    def copy(self) -> 'LightMemory':
+        """Niezależna kopia pamięci (pierścień, wagi, liczniki)."""
+        other = object.__new__(LightMemory)
+        other.__dict__.update(self.__dict__)
+        other.ring = list(self.ring)
+        other.weights = list(self.weights)
+        other.counts = list(self.counts)
+        return other
+
+    def push(self, observed: int) -> None:
+        """Dopisz maskę LIGHT[c]; najstarsza maska wypada z okna."""
+        evicted = self.ring[self.pos]
+        self.ring[self.pos] = observed
+        self.pos = (self.pos + 1) % self.k
+        self.last = observed
+
+        if self.gamma is None:
+            counts = self.counts
+            changed = observed ^ evicted
+            a = 0
+            while changed:
+                if changed & 1:
+                    if observed >> a & 1:
+                        counts[a] += 1
+                        self.mask |= 1 << a
+                    else:
+                        counts[a] -= 1
+                        if counts[a] == 0:
+                            self.mask &= ~(1 << a)
+                changed >>= 1
+                a += 1
+            return
+
+        mask = 0
+        weights = self.weights
+        for a in range(len(ACTIONS)):
+            w = self.gamma[a] * weights[a] + (observed >> a & 1) - self._gamma_k[a] * (evicted >> a & 1)
+            weights[a] = w if w > _EPS else 0.0
+            if weights[a] >= self.threshold - _EPS:
+                mask |= 1 << a
+        self.mask = mask
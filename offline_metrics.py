@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+offline_metrics.py — przeliczanie metryk M1–M4 i difficulty_proxy z zapisanych trajektorii.
+
+Interfejs:
+- funkcja recompute_metrics(trajectories, meta, chunk_episodes=4096) -> {metryka: tablica (E,)}
+- funkcja metrics_rows(path) -> wiersze jak w run_experiments (seed, condition, metryki)
+
+Wejście to plik traj_{warunek}.npy (trajectory.py) — tablica (epizody, ticki) mapowana z dysku;
+redukcje są wektorowe po paczkach epizodów, więc pamięć nie zależy od liczby epizodów.
+Wyniki są bit w bit równe run_single_experiment (te same dzielenia liczb całkowitych i sumy
+w tej samej kolejności — sumy po cyklach liczymy przez cumsum, który dodaje sekwencyjnie).
+M5 (czas CPU) nie jest odtwarzalne z trajektorii i nie jest liczone.
+
+Użycie:
+  python offline_metrics.py data/traj_memory.npy --out data/offline_memory.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+from typing import Any, Dict, List
+
+import numpy as np
+
+from env import Action, LEARNABLE_MASK
+from trajectory import load_trajectories
+
+METRICS = ['m1_coverage', 'm2_unlearned_usage', 'm3_latency_cycles', 'm4_missed_actions_rate', 'difficulty_proxy']
+
+_POPCOUNT = np.array([bin(m).count('1') for m in range(256)], dtype=np.int64)
+_BITS = np.array([1 << a for a in range(8)] + [0], dtype=np.int64)  # _BITS[-1] = 0 dla NOOP (-1)
+
+
+def _mean_over_cycles(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Średnia po cyklach z maską — suma sekwencyjna (cumsum), jak total += x w pętli epizodu."""
+    total = np.cumsum(np.where(valid, values, 0.0), axis=1)[:, -1]
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def _chunk_metrics(traj: np.ndarray, light_ticks: int, dark_ticks: int, cycles: int,
+                   max_hp_player: int) -> Dict[str, np.ndarray]:
+    """Metryki dla paczki epizodów traj (E, T)."""
+    n_ep = traj.shape[0]
+    period = light_ticks + dark_ticks
+    action_p = np.asarray(traj['action_p'], dtype=np.int64).reshape(n_ep, cycles, period)
+    action_n = np.asarray(traj['action_n'], dtype=np.int64).reshape(n_ep, cycles, period)
+
+    # Zbiory akcji per cykl jako maski bitowe
+    observed = np.bitwise_or.reduce(_BITS[action_p[:, :, :light_ticks]], axis=2)
+    used = np.bitwise_or.reduce(_BITS[action_n], axis=2) & LEARNABLE_MASK
+    ref = np.zeros_like(observed)
+    ref[:, 1:] = observed[:, :-1] & LEARNABLE_MASK  # LIGHT[c-1]
+
+    pop_ref = _POPCOUNT[ref]
+    pop_used = _POPCOUNT[used]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coverage = _POPCOUNT[used & ref] / pop_ref
+        unlearned = _POPCOUNT[used & ~ref] / pop_used
+    m1 = _mean_over_cycles(coverage, pop_ref > 0)
+    m2 = _mean_over_cycles(unlearned, pop_used > 0)
+
+    # Latencja: cykl pierwszej obserwacji (LIGHT) vs cykl pierwszego użycia przez NPC od tego ticka
+    ap = action_p.reshape(n_ep, -1)
+    an = action_n.reshape(n_ep, -1)
+    ticks = np.arange(ap.shape[1])
+    is_light = (ticks % period) < light_ticks
+    cycle_of_tick = ticks // period + 1
+    lat_sum = np.zeros(n_ep, dtype=np.int64)
+    n_seen = np.zeros(n_ep, dtype=np.int64)
+    n_used = np.zeros(n_ep, dtype=np.int64)
+    for a in (int(Action.ATTACK), int(Action.SKILL)):
+        seen_at = (ap == a) & is_light
+        seen = seen_at.any(axis=1)
+        i_seen = np.where(seen, seen_at.argmax(axis=1), ap.shape[1])
+        used_at = (an == a) & (ticks[None, :] >= i_seen[:, None])
+        was_used = used_at.any(axis=1)
+        i_used = used_at.argmax(axis=1)
+        lat = cycle_of_tick[i_used] - cycle_of_tick[np.minimum(i_seen, ap.shape[1] - 1)]
+        lat_sum += np.where(was_used, lat, 0)
+        n_seen += seen
+        n_used += was_used
+    with np.errstate(invalid='ignore', divide='ignore'):
+        m3 = np.where(n_used > 0, lat_sum / np.maximum(n_used, 1), np.nan)
+        m4 = np.where(n_seen > 0, (n_seen - n_used) / np.maximum(n_seen, 1), np.nan)
+
+    final_hp = np.asarray(traj['player_hp'][:, -1], dtype=np.int64)
+    difficulty = (max_hp_player - final_hp).astype(np.float64)
+
+    return {
+        'm1_coverage': m1,
+        'm2_unlearned_usage': m2,
+        'm3_latency_cycles': m3,
+        'm4_missed_actions_rate': m4,
+        'difficulty_proxy': difficulty,
+    }
+
+
+def recompute_metrics(trajectories: np.ndarray, meta: Dict[str, Any],
+                      chunk_episodes: int = 4096) -> Dict[str, np.ndarray]:
+    """
+    Przelicz metryki dla wszystkich epizodów tablicy trajektorii (E, T).
+
+    :param trajectories: tablica/memmap TRAJ_DTYPE o kształcie (epizody, ticki)
+    :param meta: metadane przebiegu (light_ticks, dark_ticks, cycles, max_hp_player)
+    :param chunk_episodes: liczba epizodów przetwarzanych naraz (ogranicza pamięć)
+    """
+    light, dark, cycles = int(meta['light_ticks']), int(meta['dark_ticks']), int(meta['cycles'])
+    if trajectories.shape[1] != cycles * (light + dark):
+        raise ValueError(f'Trajektoria ma {trajectories.shape[1]} ticków, meta wskazuje {cycles * (light + dark)}')
+    max_hp = int(meta.get('max_hp_player', 10))
+    n_ep = trajectories.shape[0]
+    out = {m: np.empty(n_ep, dtype=np.float64) for m in METRICS}
+    for start in range(0, n_ep, chunk_episodes):
+        stop = min(start + chunk_episodes, n_ep)
+        part = _chunk_metrics(trajectories[start:stop], light, dark, cycles, max_hp)
+        for m in METRICS:
+            out[m][start:stop] = part[m]
+    return out
+
+
+def metrics_rows(path, chunk_episodes: int = 4096) -> List[dict]:
+    """Wiersze (seed, condition, metryki) jak w run_experiments — z pliku traj_*.npy."""
+    traj, meta = load_trajectories(path)
+    cols = recompute_metrics(traj, meta, chunk_episodes)
+    seeds = meta.get('seeds', list(range(traj.shape[0])))
+    rows = []
+    for i, s in enumerate(seeds):
+        row = {'seed': s, 'condition': meta.get('condition', '')}
+        row.update({m: float(cols[m][i]) for m in METRICS})
+        rows.append(row)
+    return rows
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Przelicz metryki M1–M4 i difficulty_proxy z trajektorii')
+    ap.add_argument('trajectories', type=str, help='Plik traj_*.npy (z run_experiment.py --record_trajectories)')
+    ap.add_argument('--out', type=str, default='', help='Opcjonalny CSV z wierszami per epizod')
+    ap.add_argument('--chunk_episodes', type=int, default=4096)
+    return ap.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rows = metrics_rows(args.trajectories, args.chunk_episodes)
+    for m in METRICS:
+        vals = np.array([r[m] for r in rows])
+        print(f'{m}: mean={np.nanmean(vals) if np.isfinite(vals).any() else float("nan"):.4f} (n={len(vals)})')
+    if args.out and rows:
+        with open(args.out, 'w', newline='') as fh:
+            w = csv.DictWriter(fh, fieldnames=list(rows[0].keys()))
+            w.writeheader()
+            w.writerows(rows)
+        print('Saved', args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,22 +2,40 @@
 player.py — skryptowy „gracz” do eksperymentu ECHO-like.
 
 Interfejs:
-- klasa ScriptedPlayer(rng_seed=0, ...)
+- klasa ScriptedPlayer(rng_seed=0, ..., rng_mode='legacy', rng_episode=0)
 - metoda act(env, tick, phase) -> str
+- metoda act_code(env, tick, phase) -> int (kod Action; wersja dla pętli eksperymentu)
+- metody snapshot() / restore(snap) — stan RNG (rozgałęzianie epizodów)
 
 Założenia:
 - „Gracz” czasem atakuje, czasem używa SKILL, a w ruchu ma lekki bias:
   domyślnie „oddalaj się od NPC” (czytelne dla eksperymentu), z domieszką losowości.
 - Parametry sterują częstotliwością akcji, aby wygodnie testować pamięć cyklu.
 
-Zwracane akcje pochodzą z env.ACTIONS.
+Zwracane akcje pochodzą z env.ACTIONS (act) lub env.Action (act_code).
+
+Losowość (rng_mode):
+- 'legacy' — random.Random(rng_seed), sekwencja jak dotąd (stare wyniki pozostają odtwarzalne)
+- 'philox' — strumień licznikowy rng_streams.TickDraws kluczowany (rng_seed, rng_episode, STREAM_PLAYER),
+  losowany blokami; każdy tick zużywa dokładnie 4 liczby (atak, SKILL, jitter, wybór ruchu), więc
+  decyzje nie zależą od liczby workerów ani rozmiaru bloku i zgadzają się z graczem wsadowym
 """
 
 from __future__ import annotations
 
 from typing import Literal
 import random
-from env import ACTIONS
+from env import ACTIONS, Action
+from rng_streams import STREAM_PLAYER, TickDraws
+
+_ATTACK = int(Action.ATTACK)
+_SKILL = int(Action.SKILL)
+_MOVE_UP = int(Action.MOVE_up)
+_MOVE_DOWN = int(Action.MOVE_down)
+_MOVE_RIGHT = int(Action.MOVE_right)
+_MOVE_LEFT = int(Action.MOVE_left)
+# Ruchy w kolejności ACTIONS — rng.choice po tej krotce zużywa RNG tak samo jak po liście nazw
+_MOVE_CODES = tuple(i for i, a in enumerate(ACTIONS) if a.startswith('MOVE_'))
 
 
 MovePolicy = Literal['away', 'towards', 'random']
@@ -32,6 +50,8 @@ class ScriptedPlayer:
         p_skill_dark: float = 0.04,
         move_policy: MovePolicy = 'away',
         jitter_move_prob: float = 0.15,
+        rng_mode: Literal['legacy', 'philox'] = 'legacy',
+        rng_episode: int = 0,
     ) -> None:
         """
         :param rng_seed: ziarno deterministycznej losowości
@@ -40,24 +60,49 @@ class ScriptedPlayer:
         :param p_skill_dark: prawd. użycia SKILL w fazie DARK (jeśli CD==0)
         :param move_policy: 'away' (od NPC), 'towards' (w stronę NPC) lub 'random'
         :param jitter_move_prob: prawd. wykonania kroku losowego zamiast polityki bazowej
+        :param rng_mode: 'legacy' (random.Random) lub 'philox' (rng_streams, klucz (rng_seed, rng_episode))
+        :param rng_episode: numer epizodu w kluczu strumienia Philox
         """
+        if rng_mode not in ('legacy', 'philox'):
+            raise ValueError(f'Nieznany rng_mode: {rng_mode!r}')
+        self.rng_mode = rng_mode
         self.rng = random.Random(rng_seed)
+        self.draws = None
+        if rng_mode == 'philox':
+            self.draws = TickDraws(rng_seed, rng_episode, STREAM_PLAYER)
+            self.act_code = self._act_code_philox
         self.p_attack_adjacent = float(p_attack_adjacent)
         self.p_skill_light = float(p_skill_light)
         self.p_skill_dark = float(p_skill_dark)
         self.move_policy = move_policy
         self.jitter_move_prob = float(jitter_move_prob)
 
+    def snapshot(self):
+        """Zrzut stanu gracza (jedyny stan to RNG)."""
+        if self.draws is not None:
+            return self.draws.snapshot()
+        return self.rng.getstate()
+
+    def restore(self, snap) -> None:
+        if self.draws is not None:
+            self.draws.restore(snap)
+        else:
+            self.rng.setstate(snap)
+
     def act(self, env, tick: int, phase: str) -> str:
         """Zdecyduj o akcji na danym ticku i fazie ('LIGHT' / 'DARK')."""
+        return ACTIONS[self.act_code(env, tick, phase)]
+
+    def act_code(self, env, tick: int, phase: str) -> int:
+        """Jak act(), ale zwraca kod Action (bez konwersji na nazwę)."""
         # 1) Jeśli jesteśmy obok przeciwnika → często atakuj
         if env.dist() == 1 and self.rng.random() < self.p_attack_adjacent:
-            return 'ATTACK'
+            return _ATTACK
 
         # 2) Czasem użyj SKILL (zależnie od fazy), tylko gdy brak CD
         p_skill = self.p_skill_light if phase == 'LIGHT' else self.p_skill_dark
         if env.skill_cd_player == 0 and self.rng.random() < p_skill:
-            return 'SKILL'
+            return _SKILL
 
         # 3) Ruch
         if self.rng.random() < self.jitter_move_prob or self.move_policy == 'random':
@@ -67,28 +112,49 @@ class ScriptedPlayer:
         # domyślnie: away
         return self._move_away(env)
 
+    def _act_code_philox(self, env, tick: int, phase: str) -> int:
+        """act_code w trybie 'philox': te same reguły, 4 liczby z bufora na każdy tick."""
+        draws = self.draws
+        i = draws.i
+        if i >= len(draws.buf):
+            draws.refill()
+            i = 0
+        buf = draws.buf
+        draws.i = i + 4
+
+        if env.dist() == 1 and buf[i] < self.p_attack_adjacent:
+            return _ATTACK
+        p_skill = self.p_skill_light if phase == 'LIGHT' else self.p_skill_dark
+        if env.skill_cd_player == 0 and buf[i + 1] < p_skill:
+            return _SKILL
+        if buf[i + 2] < self.jitter_move_prob or self.move_policy == 'random':
+            return _MOVE_CODES[int(buf[i + 3] * 4)]
+        if self.move_policy == 'towards':
+            return self._move_towards(env)
+        return self._move_away(env)
+
     # ------------------
     # Ruchy pomocnicze
     # ------------------
-    def _random_move(self) -> str:
-        return self.rng.choice([a for a in ACTIONS if a.startswith('MOVE_')])
+    def _random_move(self) -> int:
+        return self.rng.choice(_MOVE_CODES)
 
-    def _move_towards(self, env) -> str:
+    def _move_towards(self, env) -> int:
         dx = env.player[0] - env.npc[0]
         dy = env.player[1] - env.npc[1]
         # Chcemy iść „w stronę” NPC: odwróć wektor względem pozycji gracza
         # (czyli dąż do zmniejszenia |dx| i |dy|)
         # Wybieramy oś o większym |delta|, żeby ruch był zdecydowany.
         if abs(dx) >= abs(dy):
-            return 'MOVE_left' if dx > 0 else 'MOVE_right'
+            return _MOVE_LEFT if dx > 0 else _MOVE_RIGHT
         else:
-            return 'MOVE_up' if dy > 0 else 'MOVE_down'
+            return _MOVE_UP if dy > 0 else _MOVE_DOWN
 
-    def _move_away(self, env) -> str:
+    def _move_away(self, env) -> int:
         dx = env.player[0] - env.npc[0]
         dy = env.player[1] - env.npc[1]
         # Oddalaj się od NPC: zwiększaj |dx| lub |dy| w osi o większym gapie
         if abs(dx) >= abs(dy):
-            return 'MOVE_right' if dx > 0 else 'MOVE_left'
+            return _MOVE_RIGHT if dx > 0 else _MOVE_LEFT
         else:
-            return 'MOVE_down' if dy > 0 else 'MOVE_up'
+            return _MOVE_DOWN if dy > 0 else _MOVE_UP
@@ -0,0 +1,294 @@
+"""
+replay.py — kompaktowy, przewijalny zapis sesji viewer_ascii (delty stanu per tick + klatki kluczowe).
+
+Interfejs:
+- klasa ReplayRecorder(path, meta, keyframe_every=64) — record(env, action_p, action_n, allowed), close()
+- klasa ReplayReader(path) — len(), state(i) -> rekord TRAJ_DTYPE, view(i) -> StateView,
+    index_of(spec), next_event(kind, i) / prev_event(kind, i), events {rodzaj: tablica ticków}
+- klasa StateView — stan ticka z interfejsem GridEnv potrzebnym do rysowania (render_grid, frame_header)
+- EVENT_KINDS — rodzaje zdarzeń indeksowanych przy zapisie
+
+Stan ticka to rekord trajectory.TRAJ_DTYPE (stan PO ticku + akcje ticka + maska dozwolonych akcji).
+cycle / phase / tick nie są zapisywane — wynikają z numeru ticka i light_ticks / dark_ticks z metadanych.
+Tick i >= 1 to delta względem ticka i - 1: maska zmienionych pól (<u2) i po jednym bajcie na zmienione
+pole (pozycje, cooldowny, akcje, maska — wartość; HP — różnica). Co keyframe_every ticków zapisywany
+jest pełny rekord (klatka kluczowa) z offsetem delt następnego ticka, więc state(i) dekoduje najwyżej
+keyframe_every - 1 delt niezależnie od długości sesji. Zdekodowany blok jest trzymany w pamięci —
+odtwarzanie w przód i w tył w obrębie bloku to odczyt z tablicy.
+
+Układ pliku (.rpl):
+  MAGIC | delty | klatki kluczowe (TRAJ_DTYPE) | offsety delt (<u8) | ticki zdarzeń (<u4) | JSON | <u4 len(JSON) | MAGIC
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from env import Action
+from trajectory import PHASE_CODES, TRAJ_DTYPE
+
+MAGIC = b'ECHORPL1'
+REPLAY_VERSION = 2  # 2: klatki kluczowe z HP <i4 i cycle <u4 (trajectory.TRAJ_DTYPE)
+
+# Pola zapisywane deltą (kolejność = bity maski); cycle / phase / tick wynikają z numeru ticka
+_FIELDS = ('player_x', 'player_y', 'npc_x', 'npc_y', 'player_hp', 'npc_hp',
+           'skill_cd_player', 'skill_cd_npc', 'action_p', 'action_n', 'allowed')
+_HP_FIELDS = frozenset(i for i, f in enumerate(_FIELDS) if f.endswith('_hp'))  # zapisywane różnicą
+_SIGNED_FIELDS = frozenset(i for i, f in enumerate(_FIELDS) if f.startswith('action_')) | _HP_FIELDS
+
+EVENT_KINDS = ('npc_skill', 'player_skill', 'npc_attack', 'player_attack', 'player_hp_drop', 'npc_hp_drop')
+
+_SKILL = int(Action.SKILL)
+_ATTACK = int(Action.ATTACK)
+_MASK = struct.Struct('<H')
+_TRAILER = struct.Struct('<I')
+
+
+class StateView:
+    def __init__(self, rec, width: int, height: int) -> None:
+        """Widok rekordu TRAJ_DTYPE z atrybutami GridEnv (w, h, player, npc, HP, cooldowny, dist())."""
+        self.w = width
+        self.h = height
+        self.cycle = int(rec['cycle'])
+        self.phase = 'LIGHT' if rec['phase'] == PHASE_CODES['LIGHT'] else 'DARK'
+        self.tick = int(rec['tick'])
+        self.player = [int(rec['player_x']), int(rec['player_y'])]
+        self.npc = [int(rec['npc_x']), int(rec['npc_y'])]
+        self.player_hp = int(rec['player_hp'])
+        self.npc_hp = int(rec['npc_hp'])
+        self.skill_cd_player = int(rec['skill_cd_player'])
+        self.skill_cd_npc = int(rec['skill_cd_npc'])
+        self.action_p = int(rec['action_p'])
+        self.action_n = int(rec['action_n'])
+        self.allowed = int(rec['allowed'])
+
+    def dist(self) -> int:
+        return abs(self.player[0] - self.npc[0]) + abs(self.player[1] - self.npc[1])
+
+
+def _tick_fields(period: int, light_ticks: int, i: int) -> Tuple[int, int, int]:
+    """(cycle, phase, tick) dla ticka sesji i."""
+    cycle, r = divmod(i, period)
+    if r < light_ticks:
+        return cycle + 1, PHASE_CODES['LIGHT'], r
+    return cycle + 1, PHASE_CODES['DARK'], r - light_ticks
+
+
+class ReplayRecorder:
+    def __init__(self, path, meta: Dict[str, Any], keyframe_every: int = 64, buffer_size: int = 1 << 20) -> None:
+        """
+        :param path: plik wyjściowy (.rpl)
+        :param meta: metadane sesji — wymagane light_ticks, dark_ticks, width, height
+        :param keyframe_every: odstęp klatek kluczowych (ticki); koszt przewinięcia to najwyżej tyle delt
+        """
+        for key in ('light_ticks', 'dark_ticks', 'width', 'height'):
+            if key not in meta:
+                raise ValueError(f'Brak {key!r} w metadanych zapisu')
+        self.meta = dict(meta)
+        self.keyframe_every = int(keyframe_every)
+        self.fh = open(path, 'wb', buffering=buffer_size)
+        self.fh.write(MAGIC)
+        self.pos = len(MAGIC)
+        self.n_ticks = 0
+        self.prev: Optional[Tuple[int, ...]] = None
+        self.keyframes: List[np.ndarray] = []
+        self.offsets: List[int] = []
+        self.events: Dict[str, List[int]] = {k: [] for k in EVENT_KINDS}
+        self._period = int(meta['light_ticks']) + int(meta['dark_ticks'])
+        self._light_ticks = int(meta['light_ticks'])
+
+    def record(self, env, action_p: int, action_n: int, allowed: int) -> None:
+        """Dopisz tick (stan env po ticku, kody akcji gracza i NPC (NOOP = -1), maska dozwolonych akcji)."""
+        player, npc = env.player, env.npc
+        state = (player[0], player[1], npc[0], npc[1], env.player_hp, env.npc_hp,
+                 env.skill_cd_player, env.skill_cd_npc, action_p, action_n, allowed)
+        i = self.n_ticks
+        prev = self.prev
+        # klatka kluczowa pakowana od razu: wartość spoza TRAJ_DTYPE przerywa record() przed zapisem ticka,
+        # a close() (np. z finally) zapisuje poprawny indeks dotychczasowych ticków
+        keyframe = None
+        if i % self.keyframe_every == 0:
+            keyframe = np.array((*_tick_fields(self._period, self._light_ticks, i), *state), dtype=TRAJ_DTYPE)
+        if prev is not None:
+            mask = 0
+            payload = []
+            for f in range(len(_FIELDS)):
+                if state[f] != prev[f]:
+                    mask |= 1 << f
+                    v = state[f] - prev[f] if f in _HP_FIELDS else state[f]
+                    if not -128 <= v <= 255:
+                        raise ValueError(f'Pole {_FIELDS[f]} poza zakresem delty: {v}')
+                    payload.append(v & 0xFF)
+            record = _MASK.pack(mask) + bytes(payload)
+            self.fh.write(record)
+            self.pos += len(record)
+            if prev[4] > state[4]:
+                self.events['player_hp_drop'].append(i)
+            if prev[5] > state[5]:
+                self.events['npc_hp_drop'].append(i)
+        if keyframe is not None:
+            self.keyframes.append(keyframe)
+            self.offsets.append(self.pos)
+        if action_n == _SKILL:
+            self.events['npc_skill'].append(i)
+        elif action_n == _ATTACK:
+            self.events['npc_attack'].append(i)
+        if action_p == _SKILL:
+            self.events['player_skill'].append(i)
+        elif action_p == _ATTACK:
+            self.events['player_attack'].append(i)
+        self.prev = state
+        self.n_ticks = i + 1
+
+    def close(self) -> None:
+        """Dopisz indeks (klatki kluczowe, offsety, zdarzenia) i metadane; zamknij plik (ponowne wywołanie nic nie robi)."""
+        fh = self.fh
+        if fh.closed:
+            return
+        try:
+            sections: Dict[str, Any] = {}
+            keyframes = np.array(self.keyframes, dtype=TRAJ_DTYPE)
+            sections['keyframes'] = self.pos
+            fh.write(keyframes.tobytes())
+            self.pos += keyframes.nbytes
+            offsets = np.array(self.offsets, dtype='<u8')
+            sections['offsets'] = self.pos
+            fh.write(offsets.tobytes())
+            self.pos += offsets.nbytes
+            events = {}
+            for kind, ticks in self.events.items():
+                arr = np.array(ticks, dtype='<u4')
+                events[kind] = [self.pos, len(ticks)]
+                fh.write(arr.tobytes())
+                self.pos += arr.nbytes
+            trailer = json.dumps({
+                'version': REPLAY_VERSION, 'meta': self.meta, 'n_ticks': self.n_ticks,
+                'keyframe_every': self.keyframe_every, 'n_keyframes': len(self.keyframes),
+                'sections': sections, 'events': events,
+            }).encode()
+            fh.write(trailer)
+            fh.write(_TRAILER.pack(len(trailer)))
+            fh.write(MAGIC)
+        finally:
+            fh.close()
+
+    def __enter__(self) -> 'ReplayRecorder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ReplayReader:
+    def __init__(self, path) -> None:
+        """Otwórz zapis .rpl (plik wczytany raz — kilka bajtów na tick; dekodowane są tylko potrzebne bloki)."""
+        self._data = data = Path(path).read_bytes()
+        tail = len(data) - len(MAGIC)
+        if data[:len(MAGIC)] != MAGIC or data[tail:] != MAGIC:
+            raise ValueError(f'{path}: to nie jest plik zapisu replay (.rpl)')
+        (n,) = _TRAILER.unpack_from(data, tail - _TRAILER.size)
+        trailer = json.loads(data[tail - _TRAILER.size - n:tail - _TRAILER.size])
+        if trailer.get('version') != REPLAY_VERSION:
+            raise ValueError(f'{path}: nieobsługiwana wersja zapisu {trailer.get("version")}')
+
+        self.meta: Dict[str, Any] = trailer['meta']
+        self.n_ticks = int(trailer['n_ticks'])
+        self.keyframe_every = int(trailer['keyframe_every'])
+        n_kf = int(trailer['n_keyframes'])
+        sections = trailer['sections']
+        self.keyframes = np.frombuffer(data, dtype=TRAJ_DTYPE, count=n_kf, offset=sections['keyframes'])
+        self.offsets = np.frombuffer(data, dtype='<u8', count=n_kf, offset=sections['offsets'])
+        self.events: Dict[str, np.ndarray] = {
+            kind: np.frombuffer(data, dtype='<u4', count=count, offset=at)
+            for kind, (at, count) in trailer['events'].items()
+        }
+        self.light_ticks = int(self.meta['light_ticks'])
+        self.period = self.light_ticks + int(self.meta['dark_ticks'])
+        self.width = int(self.meta['width'])
+        self.height = int(self.meta['height'])
+        self._block_no = -1
+        self._block: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self.n_ticks
+
+    def _decode_block(self, k: int) -> np.ndarray:
+        """Rekordy ticków [k * keyframe_every, (k + 1) * keyframe_every): klatka kluczowa + delty."""
+        start = k * self.keyframe_every
+        n = min(self.keyframe_every, self.n_ticks - start)
+        out = np.empty(n, dtype=TRAJ_DTYPE)
+        kf = self.keyframes[k]
+        out[0] = kf
+        state = [int(kf[f]) for f in _FIELDS]
+        data = self._data
+        pos = int(self.offsets[k])
+        n_fields = len(_FIELDS)
+        for j in range(1, n):
+            mask = data[pos] | data[pos + 1] << 8
+            pos += 2
+            for f in range(n_fields):
+                if mask >> f & 1:
+                    v = data[pos]
+                    pos += 1
+                    if f in _SIGNED_FIELDS and v > 127:
+                        v -= 256
+                    state[f] = state[f] + v if f in _HP_FIELDS else v
+            out[j] = (*_tick_fields(self.period, self.light_ticks, start + j), *state)
+        return out
+
+    def state(self, i: int):
+        """Rekord TRAJ_DTYPE ticka i (0..len-1): najbliższa wcześniejsza klatka kluczowa + najwyżej N-1 delt."""
+        if not 0 <= i < self.n_ticks:
+            raise IndexError(f'Tick {i} poza zakresem 0..{self.n_ticks - 1}')
+        k, j = divmod(i, self.keyframe_every)
+        if k != self._block_no:
+            self._block = self._decode_block(k)
+            self._block_no = k
+        return self._block[j]
+
+    def view(self, i: int) -> StateView:
+        return StateView(self.state(i), self.width, self.height)
+
+    def index_of(self, spec: str) -> int:
+        """
+        Numer ticka sesji dla opisu 'CYKL', 'CYKL:TICK' (tick liczony od początku cyklu)
+        albo 'CYKL:FAZA:TICK' (FAZA = LIGHT / DARK, tick w fazie); cykle od 1.
+        """
+        parts = [p.strip() for p in spec.split(':')]
+        cycle = int(parts[0])
+        offset = 0
+        if len(parts) == 2:
+            offset = int(parts[1])
+        elif len(parts) == 3:
+            phase = parts[1].upper()
+            if phase not in PHASE_CODES:
+                raise ValueError(f'Nieznana faza: {parts[1]!r}')
+            offset = int(parts[2]) + (self.light_ticks if phase == 'DARK' else 0)
+        elif len(parts) > 3:
+            raise ValueError(f'Niepoprawny opis pozycji: {spec!r}')
+        i = (cycle - 1) * self.period + offset
+        if not 0 <= i < self.n_ticks or not 0 <= offset < self.period:
+            raise ValueError(f'Pozycja {spec!r} poza zapisem ({self.n_ticks} ticków, {self.period} na cykl)')
+        return i
+
+    def next_event(self, kind: str, i: int = -1) -> Optional[int]:
+        """Pierwszy tick > i ze zdarzeniem kind (None, jeśli brak)."""
+        ticks = self._event_ticks(kind)
+        k = int(np.searchsorted(ticks, i, side='right'))
+        return int(ticks[k]) if k < len(ticks) else None
+
+    def prev_event(self, kind: str, i: int) -> Optional[int]:
+        """Ostatni tick < i ze zdarzeniem kind (None, jeśli brak)."""
+        ticks = self._event_ticks(kind)
+        k = int(np.searchsorted(ticks, i, side='left'))
+        return int(ticks[k - 1]) if k > 0 else None
+
+    def _event_ticks(self, kind: str) -> np.ndarray:
+        if kind not in self.events:
+            raise ValueError(f'Nieznane zdarzenie: {kind!r} (dostępne: {", ".join(EVENT_KINDS)})')
+        return self.events[kind]
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+results_store.py — trwały magazyn wyników epizodów (SQLite) z kluczem = hash konfiguracji.
+
+Interfejs:
+- funkcja episode_config(condition, seed, episode_kwargs) -> dict (kanoniczna konfiguracja epizodu)
+- klasa ResultsStore(path)
+    * key(condition, seed, episode_kwargs) -> str      — sha256 konfiguracji (z SIMULATION_VERSION)
+    * get_many(keys) -> {key: wiersz}                  — epizody już policzone
+    * put_many([(key, zadanie, wiersz)], episode_kwargs) — zapis paczki w jednej transakcji
+    * export_csv(path, keys)                           — CSV w formacie results_*.csv (dla analysis_plot.py)
+
+Klucz obejmuje seed, warunek, light/dark_ticks, cycles, parametry pamięci (tylko warunek memory;
+próg tylko z zanikaniem), parametry gracza i agenta różne od domyślnych oraz wersję kodu symulacji.
+Nowe parametry run_single_experiment wchodzą do klucza tylko z wartością inną niż domyślna, więc
+ich dodanie nie unieważnia bazy. Parametry, które nie zmieniają wyników (compact_env,
+timing_sample_every, zapis trajektorii, compiled agenta), są pomijane. Widok SQL `episode_metrics`
+rozwija metryki do kolumn.
+
+Użycie:
+  python run_experiment.py --store data/results.sqlite      # wznawialny przebieg
+  python results_store.py data/results.sqlite               # podsumowanie zawartości
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import inspect
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from agent import BTGatedAgent
+from experiment import SIMULATION_VERSION, run_single_experiment
+from player import ScriptedPlayer
+
+# Parametry run_single_experiment bez wpływu na wyniki (nie wchodzą do klucza)
+_NON_SEMANTIC = {'seed', 'condition', 'compact_env', 'timing_sample_every', 'trajectory', 'record_to'}
+# Parametry zawsze w kluczu (z wartością domyślną, gdy nie podano) — zmiana domyślnej zmienia klucz;
+# pozostałe parametry wchodzą do klucza tylko z wartością inną niż domyślna
+_KEY_PARAMS = ('light_ticks', 'dark_ticks', 'cycles', 'memory_k', 'memory_decay', 'memory_threshold')
+# Parametry pamięci — bez znaczenia poza warunkiem memory
+_MEMORY_PARAMS = ('memory_k', 'memory_decay', 'memory_threshold')
+# Parametry agenta bez wpływu na decyzje (tablica decyzji = drzewo)
+_AGENT_NON_SEMANTIC = {'compiled'}
+
+_METRIC_VIEW_COLUMNS = ['m1_coverage', 'm2_unlearned_usage', 'm3_latency_cycles', 'm4_missed_actions_rate',
+                        'm5_cpu_ms_per_tick', 'difficulty_proxy']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS episodes (
+    key       TEXT PRIMARY KEY,
+    seed      INTEGER NOT NULL,
+    condition TEXT NOT NULL,
+    config    TEXT NOT NULL,
+    row       TEXT NOT NULL,
+    created   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS episodes_condition ON episodes (condition, seed);
+'''
+
+
+def _defaults(func) -> Dict[str, Any]:
+    return {name: p.default for name, p in inspect.signature(func).parameters.items()
+            if p.default is not inspect.Parameter.empty}
+
+
+# Domyślne parametry — liczone raz (inspect.signature jest drogie; key() wołany jest dla każdego zadania)
+_EPISODE_DEFAULTS = _defaults(run_single_experiment)
+_PLAYER_DEFAULTS = _defaults(ScriptedPlayer)
+_AGENT_DEFAULTS = _defaults(BTGatedAgent)
+
+
+def _non_default(kwargs: Dict[str, Any], defaults: Dict[str, Any], skip=()) -> Dict[str, Any]:
+    """Parametry różne od domyślnych (jawnie podana wartość domyślna = brak parametru)."""
+    return {k: v for k, v in kwargs.items() if k not in skip and (k not in defaults or v != defaults[k])}
+
+
+def episode_config(condition: str, seed: int, episode_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Kanoniczna konfiguracja epizodu: parametry wpływające na wynik, bez niesemantycznych i nieużywanych."""
+    defaults = _EPISODE_DEFAULTS
+    given = {k: v for k, v in episode_kwargs.items() if k not in _NON_SEMANTIC}
+    cfg = {name: given.get(name, defaults[name]) for name in _KEY_PARAMS}
+    cfg.update(_non_default(given, defaults, skip=(*_KEY_PARAMS, 'player_kwargs', 'agent_kwargs')))
+    if condition != 'memory':
+        for name in _MEMORY_PARAMS:
+            cfg.pop(name)
+    elif cfg['memory_decay'] is None:
+        cfg.pop('memory_threshold')  # próg działa tylko z zanikaniem
+
+    # gracz: rng_episode domyślnie = seed (experiment.Episode), rng_seed w trybie legacy = seed + 13
+    player_defaults = {**_PLAYER_DEFAULTS, 'rng_episode': int(seed)}
+    cfg['player_kwargs'] = _non_default(dict(given.get('player_kwargs') or {}), player_defaults)
+    cfg['agent_kwargs'] = _non_default(dict(given.get('agent_kwargs') or {}), _AGENT_DEFAULTS,
+                                       skip=_AGENT_NON_SEMANTIC)
+    cfg['seed'] = int(seed)
+    cfg['condition'] = condition
+    cfg['version'] = SIMULATION_VERSION
+    return cfg
+
+
+class ResultsStore:
+    def __init__(self, path) -> None:
+        self.path = str(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        cols = ',\n    '.join(f"json_extract(row, '$.{m}') AS {m}" for m in _METRIC_VIEW_COLUMNS)
+        self.conn.execute(f'CREATE VIEW IF NOT EXISTS episode_metrics AS SELECT key, seed, condition,\n    {cols}\nFROM episodes')
+        self.conn.commit()
+
+    # ---------------------------
+    # Klucze
+    # ---------------------------
+    @staticmethod
+    def key(condition: str, seed: int, episode_kwargs: Dict[str, Any]) -> str:
+        cfg = episode_config(condition, seed, episode_kwargs)
+        return hashlib.sha256(json.dumps(cfg, sort_keys=True).encode()).hexdigest()
+
+    # ---------------------------
+    # Odczyt / zapis
+    # ---------------------------
+    def get_many(self, keys: Sequence[str]) -> Dict[str, dict]:
+        """Wiersze wyników dla kluczy obecnych w bazie."""
+        out: Dict[str, dict] = {}
+        keys = list(dict.fromkeys(keys))
+        step = 500  # limit parametrów zapytania SQLite
+        for i in range(0, len(keys), step):
+            part = keys[i:i + step]
+            q = f'SELECT key, row FROM episodes WHERE key IN ({",".join("?" * len(part))})'
+            for key, row in self.conn.execute(q, part):
+                out[key] = json.loads(row)
+        return out
+
+    def put_many(self, items: Iterable[Tuple[str, tuple, dict]], episode_kwargs: Dict[str, Any]) -> None:
+        """Zapisz paczkę (klucz, zadanie (warunek, seed[, kwargs]), wiersz) w jednej transakcji."""
+        now = time.time()
+        records = []
+        for key, (cond, seed, *extra), row in items:
+            cfg = episode_config(cond, seed, {**episode_kwargs, **(extra[0] if extra else {})})
+            records.append((key, int(seed), cond, json.dumps(cfg, sort_keys=True), json.dumps(row), now))
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO episodes VALUES (?, ?, ?, ?, ?, ?)', records)
+
+    def export_csv(self, path, keys: Sequence[str]) -> int:
+        """Zapisz wiersze dla `keys` (w tej kolejności) jako CSV results_*.csv; zwraca liczbę wierszy."""
+        rows_by_key = self.get_many(keys)
+        rows = [rows_by_key[k] for k in keys if k in rows_by_key]
+        if rows:
+            with open(path, 'w', newline='') as fh:
+                w = csv.DictWriter(fh, fieldnames=list(rows[0].keys()))
+                w.writeheader()
+                w.writerows(rows)
+        return len(rows)
+
+    def summary(self) -> List[Tuple[str, int]]:
+        """Liczba epizodów per warunek."""
+        return list(self.conn.execute('SELECT condition, COUNT(*) FROM episodes GROUP BY condition ORDER BY condition'))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'ResultsStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Podsumowanie magazynu wyników')
+    ap.add_argument('path', type=str)
+    args = ap.parse_args()
+    with ResultsStore(args.path) as store:
+        for cond, n in store.summary():
+            print(f'{cond}: {n} epizodów')
+
+
+if __name__ == '__main__':
+    main()
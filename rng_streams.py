@@ -0,0 +1,76 @@
+"""
+rng_streams.py — licznikowe strumienie liczb losowych (NumPy Philox) kluczowane (seed, epizod, strumień).
+
+Interfejs:
+- funkcja philox_generator(seed, episode, stream) -> np.random.Generator
+- funkcja tick_draws(seed, episode, stream, n_ticks, start_tick=0) -> tablica (n_ticks, DRAWS_PER_TICK)
+- klasa TickDraws(seed, episode, stream, block_ticks=1024) — bufor blokowy dla pętli per tick:
+    buf (lista float), i (indeks następnej liczby), refill(), snapshot(), restore(snap)
+
+Zasady:
+- Klucz Philox (128 bitów) = (seed, episode << 16 | stream), więc strumienie różnych epizodów
+  i komponentów nie nachodzą na siebie niezależnie od liczby workerów i kolejności wykonania.
+- Każdy tick zużywa dokładnie DRAWS_PER_TICK liczb (niezależnie od tego, które gałęzie decyzji
+  zaszły), więc liczby ticka t to elementy [4t, 4t + 4) strumienia — ten sam wynik dla dowolnego
+  rozmiaru bloku, dla gracza skalarnego i wsadowego (tick_draws).
+- Generator Philox zwraca kolejne liczby sekwencyjnie bez względu na podział na bloki; przesunięcie
+  do ticka start_tick to advance() licznika, bez generowania pominiętych liczb.
+"""
+
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import numpy as np
+
+# Identyfikatory strumieni komponentów (0 zarezerwowane dla środowiska)
+STREAM_ENV = 0
+STREAM_PLAYER = 1
+
+# Liczby losowe na tick gracza: atak obok NPC, SKILL, krok losowy (jitter), wybór ruchu
+DRAWS_PER_TICK = 4
+
+_MASK64 = (1 << 64) - 1
+
+
+def philox_generator(seed: int, episode: int = 0, stream: int = 0) -> np.random.Generator:
+    """Generator Philox o kluczu (seed, episode, stream); stream < 2**16."""
+    if not 0 <= stream < 1 << 16:
+        raise ValueError(f'stream musi być w zakresie 0..65535 (podano {stream})')
+    key = np.array([int(seed) & _MASK64, ((int(episode) << 16) | stream) & _MASK64], dtype=np.uint64)
+    return np.random.Generator(np.random.Philox(key=key))
+
+
+def tick_draws(seed: int, episode: int, stream: int, n_ticks: int, start_tick: int = 0) -> np.ndarray:
+    """Liczby ticków [start_tick, start_tick + n_ticks) jako tablica (n_ticks, DRAWS_PER_TICK)."""
+    gen = philox_generator(seed, episode, stream)
+    if start_tick:
+        # Philox generuje 4 × uint64 na krok licznika; jeden double = jeden uint64
+        skip = start_tick * DRAWS_PER_TICK
+        gen.bit_generator.advance(skip // 4)
+        if skip % 4:
+            gen.random(skip % 4)
+    return gen.random(n_ticks * DRAWS_PER_TICK).reshape(n_ticks, DRAWS_PER_TICK)
+
+
+class TickDraws:
+    def __init__(self, seed: int, episode: int = 0, stream: int = STREAM_PLAYER, block_ticks: int = 1024) -> None:
+        """
+        :param block_ticks: liczba ticków losowanych naraz (nie wpływa na wartości)
+        """
+        self.gen = philox_generator(seed, episode, stream)
+        self.block = int(block_ticks) * DRAWS_PER_TICK
+        self.buf: List[float] = []
+        self.i = 0
+
+    def refill(self) -> None:
+        """Wylosuj kolejny blok (jako lista float — szybki dostęp z pętli Pythona)."""
+        self.buf = self.gen.random(self.block).tolist()
+        self.i = 0
+
+    def snapshot(self) -> Tuple[dict, List[float], int]:
+        return self.gen.bit_generator.state, self.buf, self.i
+
+    def restore(self, snap: Tuple[dict, List[float], int]) -> None:
+        state, self.buf, self.i = snap
+        self.gen.bit_generator.state = state
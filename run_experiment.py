@@ -8,6 +8,12 @@ Domyślnie wykonuje dwa warunki:
 
 Możesz sterować parametrami przez CLI:
   python run_experiment.py --seeds 0,1,2,3,4 --cycles 5 --light_ticks 100 --dark_ticks 100 --memory_k 1 --conditions memory,baseline --outdir data
+  python run_experiment.py --workers 8   # epizody (seed, warunek) rozłożone na 8 procesów
+  python run_experiment.py --conditions memory --memory_k 1,2,4,8   # -> results_memory.csv, results_memory_k{K}.csv
+  python run_experiment.py --store data/results.sqlite  # wznawialny: liczone są tylko epizody, których nie ma w bazie
+  python run_experiment.py --format npy   # kolumnowo: results_{etykieta}.npy (+ .json), czytane przez analysis_plot.py
+  python run_experiment.py --seeds 0-99999 --aggregate_only --workers 32  # -> aggregate_metrics.csv (bez wierszy per seed)
+  python run_experiment.py --seeds 0-999 --adaptive --ci_target m1_coverage=0.02,difficulty_proxy=5  # seedy paczkami do zbieżności CI
 """
 
 from __future__ import annotations
@@ -15,9 +21,12 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 from statistics import mean
-from typing import List
+from typing import Dict, List
 
-from experiment import run_experiments
+from memory import Decay, parse_decay
+from experiment import (RESULT_FORMATS, aggregate_experiments, format_worker_stats, run_adaptive, run_tasks,
+                        trajectory_tasks, write_results)
+from results_store import ResultsStore
 
 DEFAULT_CONDITIONS = ['memory', 'baseline']
 
@@ -30,11 +39,97 @@ def parse_args() -> argparse.Namespace:
     p.add_argument('--light_ticks', type=int, default=10, help='Długość fazy LIGHT (ticki)')
     p.add_argument('--dark_ticks', type=int, default=10, help='Długość fazy DARK (ticki)')
     p.add_argument('--conditions', type=str, default=','.join(DEFAULT_CONDITIONS), help='Warunki do uruchomienia: np. memory,baseline')
+    p.add_argument('--memory_k', type=str, default='1', help='Liczba pamiętanych faz LIGHT (lista dla sweepu, np. 1,2,4)')
+    p.add_argument('--memory_decay', type=str, default='', help='Zanikanie wagi akcji per cykl: 0.5 albo SKILL=0.5,ATTACK=0.9 (puste = brak)')
+    p.add_argument('--memory_threshold', type=float, default=0.5, help='Minimalna waga akcji przy --memory_decay')
+    p.add_argument('--timing_every', type=int, default=1, help='Mierz czas ticka (M5) co N-ty tick')
+    p.add_argument('--compact_env', action='store_true', help='CompactGridEnv (indeksy pól + tablice przejść; wyniki identyczne)')
+    p.add_argument('--aggregate_only', action='store_true', help='Tylko agregaty (n/mean/std/min/max) do aggregate_metrics.csv, bez CSV per seed')
+    p.add_argument('--record_trajectories', action='store_true', help='Zapisz trajektorie epizodów do traj_{warunek}.npy (+ .json)')
+    p.add_argument('--adaptive', action='store_true', help='Seedy z --seeds paczkami, aż CI metryk z --ci_target będą dość wąskie (--seeds = budżet)')
+    p.add_argument('--ci_target', type=str, default='m1_coverage=0.02,m2_unlearned_usage=0.02,difficulty_proxy=5', help='Docelowa połowa szerokości CI: metryka=wartość,...')
+    p.add_argument('--ci_level', type=float, default=0.95, help='Poziom ufności CI w trybie --adaptive')
+    p.add_argument('--batch_size', type=int, default=10, help='Liczba seedów w paczce w trybie --adaptive')
+    p.add_argument('--min_seeds', type=int, default=10, help='Minimalna liczba seedów przed sprawdzeniem zbieżności')
+    p.add_argument('--format', type=str, default='csv', choices=RESULT_FORMATS, help='Format wyników: csv, npy (kolumnowy, columnar.py) lub both')
+    p.add_argument('--store', type=str, default='', help='Baza SQLite z wynikami epizodów (wznawianie; liczone są tylko brakujące)')
+    p.add_argument('--player_rng', type=str, default='legacy', choices=('legacy', 'philox'), help='RNG gracza: legacy (random.Random) lub philox (strumienie licznikowe, rng_streams.py)')
+    p.add_argument('--workers', type=int, default=1, help='Liczba procesów (1 = szeregowo)')
+    p.add_argument('--chunk_size', type=int, default=None, help='Liczba epizodów w paczce dla workera (domyślnie automatycznie)')
     return p.parse_args()
 
 
 def to_seed_list(s: str) -> List[int]:
-    return [int(x.strip()) for x in s.split(',') if x.strip() != '']
+    """'0,1,5' -> [0, 1, 5]; zakresy włącznie: '0-9,20' -> [0..9, 20]."""
+    out: List[int] = []
+    for x in s.split(','):
+        x = x.strip()
+        if x == '':
+            continue
+        if '-' in x[1:]:
+            lo, hi = x[0] + x[1:].split('-', 1)[0], x[1:].split('-', 1)[1]
+            out.extend(range(int(lo), int(hi) + 1))
+        else:
+            out.append(int(x))
+    return out
+
+
+def memory_label(k: int, decay: Decay = None, threshold: float = 0.5) -> str:
+    """
+    Etykieta przebiegu memory (nazwa pliku results_<etykieta>.csv).
+
+    'memory' tylko dla K=1 bez zanikania; inaczej memory_k{K}, a zanikanie i próg (gdy różny od 0.5;
+    bez zanikania nieużywany) są dopisywane, np. memory_k1_exp0.5, memory_k2_expSKILL0.5-ATTACK0.9_thr0.3.
+    """
+    if decay is None:
+        return 'memory' if k == 1 else f'memory_k{k}'
+    if isinstance(decay, dict):
+        spec = '-'.join(f'{name}{value:g}' for name, value in decay.items())
+    else:
+        spec = f'{decay:g}'
+    label = f'memory_k{k}_exp{spec}'
+    if threshold != 0.5:
+        label += f'_thr{threshold:g}'
+    return label
+
+
+def parse_ci_targets(s: str) -> Dict[str, float]:
+    """'m1_coverage=0.02,difficulty_proxy=5' -> {'m1_coverage': 0.02, 'difficulty_proxy': 5.0}."""
+    out: Dict[str, float] = {}
+    for part in s.split(','):
+        part = part.strip()
+        if part == '':
+            continue
+        name, sep, value = part.partition('=')
+        if not sep:
+            raise ValueError(f'Oczekiwano metryka=wartość, podano {part!r}')
+        out[name.strip()] = float(value)
+    return out
+
+
+def write_precision(path: Path, report: dict) -> None:
+    """Zapisz osiągniętą precyzję trybu --adaptive (etykieta, metryka, n, średnia, połowa CI, cel)."""
+    import csv
+
+    with path.open('w', newline='') as fh:
+        w = csv.writer(fh)
+        w.writerow(['condition', 'seeds', 'status', 'metric', 'n', 'mean', 'halfwidth', 'target', 'converged'])
+        for label, rep in report.items():
+            for metric, st in rep['metrics'].items():
+                w.writerow([label, rep['seeds'], rep['status'], metric, st['n'], st['mean'], st['halfwidth'],
+                            st['target'], int(st['converged'])])
+
+
+def write_aggregates(path: Path, accs: dict) -> None:
+    """Zapisz agregaty {etykieta: MetricsAccumulator} w formacie długim (etykieta, metryka, statystyki)."""
+    import csv
+
+    with path.open('w', newline='') as fh:
+        w = csv.writer(fh)
+        w.writerow(['condition', 'metric', 'n', 'n_nan', 'mean', 'std', 'min', 'max'])
+        for label, acc in accs.items():
+            for metric, st in acc.summary().items():
+                w.writerow([label, metric, st['n'], st['n_nan'], st['mean'], st['std'], st['min'], st['max']])
 
 
 def main() -> None:
@@ -44,18 +139,78 @@ def main() -> None:
     seeds = to_seed_list(args.seeds)
     conditions = [c.strip() for c in args.conditions.split(',') if c.strip() != '']
 
-    # Uruchom każdy warunek i zapisz pod stałymi nazwami dla kompatybilności z analysis_plot.py
+    episode_kwargs = dict(light_ticks=args.light_ticks, dark_ticks=args.dark_ticks, cycles=args.cycles,
+                          timing_sample_every=args.timing_every, compact_env=args.compact_env)
+    if args.player_rng != 'legacy':
+        # tylko gdy różny od domyślnego — klucze epizodów w --store dla trybu legacy bez zmian
+        episode_kwargs['player_kwargs'] = {'rng_mode': args.player_rng}
+
+    # Przebiegi: (etykieta pliku, warunek, parametry przebiegu); memory rozwijamy po liście K
+    memory_ks = to_seed_list(args.memory_k)
+    memory_kwargs = dict(memory_decay=parse_decay(args.memory_decay), memory_threshold=args.memory_threshold)
+    runs = []
     for cond in conditions:
-        outfile = outdir / f'results_{cond}.csv'
-        rows = run_experiments(
-            outfile,
-            seeds=seeds,
-            condition=cond,
-            light_ticks=args.light_ticks,
-            dark_ticks=args.dark_ticks,
-            cycles=args.cycles,
-        )
-        print(f'Wrote {outfile} ({len(rows)} wierszy)')
+        if cond == 'memory':
+            for k in memory_ks:
+                label = memory_label(k, memory_kwargs['memory_decay'], args.memory_threshold)
+                runs.append((label, cond, dict(memory_k=k, **memory_kwargs)))
+        else:
+            runs.append((cond, cond, {}))
+
+    # Tylko agregaty: akumulatory scalane po workerach, bez wierszy per seed
+    if args.aggregate_only:
+        accs = {}
+        for label, cond, run_kwargs in runs:
+            accs[label] = aggregate_experiments(seeds, cond, args.workers, args.chunk_size, **episode_kwargs, **run_kwargs)
+            summ = accs[label].summary()
+            print(f'[{label}] ' + ', '.join(f'{m}={st["mean"]:.4f}±{st["std"]:.4f}' for m, st in summ.items()))
+        outfile = outdir / 'aggregate_metrics.csv'
+        write_aggregates(outfile, accs)
+        print(f'Wrote {outfile}')
+        return
+
+    if args.store and args.record_trajectories:
+        raise SystemExit('--store i --record_trajectories wykluczają się (trajektorie wymagają pełnej symulacji)')
+    if args.adaptive and args.record_trajectories:
+        raise SystemExit('--adaptive i --record_trajectories wykluczają się (liczba epizodów nie jest znana z góry)')
+    store = ResultsStore(args.store) if args.store else None
+
+    rows_by_label = {}
+    if args.adaptive:
+        # Sekwencyjnie: paczki seedów tylko dla warunków, których CI jeszcze nie zbiegły
+        targets = parse_ci_targets(args.ci_target)
+        rows_by_label, report = run_adaptive(runs, seeds, targets, args.batch_size, args.min_seeds, args.ci_level,
+                                             args.workers, args.chunk_size, store, **episode_kwargs)
+        for label, rep in report.items():
+            prec = ', '.join(f'{m}={st["mean"]:.4f}±{st["halfwidth"]:.4f} (cel {st["target"]:g})'
+                             for m, st in rep['metrics'].items())
+            print(f'[{label}] {rep["seeds"]} seedów, {rep["status"]}: {prec}')
+        outfile = outdir / 'adaptive_precision.csv'
+        write_precision(outfile, report)
+        print(f'Wrote {outfile}')
+    else:
+        # Wszystkie epizody (warunek, seed) naraz: jedna pula procesów, wspólny magazyn wyników
+        tasks = []
+        for label, cond, run_kwargs in runs:
+            if args.record_trajectories:
+                tasks += trajectory_tasks(outdir / f'traj_{label}.npy', seeds, cond, episode_kwargs, run_kwargs)
+            else:
+                tasks += [(cond, s, run_kwargs) for s in seeds]
+        all_rows, stats = run_tasks(tasks, args.workers, args.chunk_size, store, **episode_kwargs)
+        if stats:
+            print(f'Workers={len(stats)}:')
+            print(format_worker_stats(stats))
+        for i, (label, _, _) in enumerate(runs):
+            rows_by_label[label] = all_rows[i * len(seeds):(i + 1) * len(seeds)]
+    if store is not None:
+        store.close()
+
+    # Zapisz każdy warunek pod stałymi nazwami dla kompatybilności z analysis_plot.py
+    for label, cond, run_kwargs in runs:
+        outfile = outdir / f'results_{label}.csv'
+        rows = rows_by_label[label]
+        for written in write_results(outfile, rows, args.format):
+            print(f'Wrote {written} ({len(rows)} wierszy)')
 
         # Prosty podgląd średnich metryk
         def avg(key: str):
@@ -68,16 +223,13 @@ def main() -> None:
         m4 = avg('m4_missed_actions_rate')
         m5 = avg('m5_cpu_ms_per_tick')
         diff = avg('difficulty_proxy')
-        print(f'[{cond}] m1_coverage={m1:.3f}, m2_unlearned_usage={m2:3f}, m3_latency={m3:.3f} cycles, m4_miss_rate={m4:.3f} m5_cpu={m5:.4f} ms/tick, difficulty={diff:.1f}')
+        print(f'[{label}] m1_coverage={m1:.3f}, m2_unlearned_usage={m2:3f}, m3_latency={m3:.3f} cycles, m4_miss_rate={m4:.3f} m5_cpu={m5:.4f} ms/tick, difficulty={diff:.1f}')
 
-    # Dodatkowo wydrukuj „sample” pierwszego wiersza memory/baseline (gdy istnieją)
+    # Dodatkowo wydrukuj „sample” pierwszego wiersza memory/baseline z tego przebiegu (gdy istnieją)
     for cond in ['memory', 'baseline']:
-        f = outdir / f'results_{cond}.csv'
-        if f.exists():
-            with f.open() as fh:
-                lines = fh.readlines()
-            if len(lines) >= 2:
-                print(f'{cond.capitalize()} condition (sample):', lines[1].strip())
+        rows = rows_by_label.get(cond)
+        if rows:
+            print(f'{cond.capitalize()} condition (sample):', ','.join(str(v) for v in rows[0].values()))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+sim_server.py — bezgłowy serwer symulacji: wiele sesji (gracz zdalny vs NPC z gatingiem) w jednym procesie.
+
+Każde połączenie to sesja z własnym stanem GridEnv (pozycje, HP, cooldowny), agentem BTGatedAgent
+i pamięcią LIGHT/DARK (maski K ostatnich faz LIGHT). Klient wysyła akcje gracza, serwer odpowiada
+akcją NPC i stanem — przebieg ticka jak w experiment.Episode (NPC wybiera akcję przed ruchem gracza,
+potem step_player, obserwacja w LIGHT, step_npc, tick_cooldowns; maska dozwolonych akcji NPC
+zmienia się na granicy cyklu).
+
+Interfejs:
+- klasa SessionPool(capacity, width, height, max_memory_k) — stan wszystkich sesji jako tablice NumPy
+    * open(**params) -> slot, reset(slot, ...), close(slot)
+    * step(slots, actions) -> akcje NPC — jeden wektorowy krok dla wielu sesji (BatchGridEnv + tablica decyzji)
+    * states(slots) -> stany sesji (słowniki do JSON)
+- klasa SimServer(pool, defaults) — asyncio, protokół JSON lines; serve_tcp(host, port) / serve_unix(path)
+
+Protokół (jedna linia JSON na komunikat, opcjonalne "id" jest odsyłane):
+  {"op": "reset", "seed": 3, "condition": "memory", "light_ticks": 10, "dark_ticks": 10, "memory_k": 1,
+   "skill_min_distance": 3}                        -> {"state": {...}}
+  {"op": "step", "action": "MOVE_up"}              -> {"npc_action": "ATTACK" | null, "state": {...}}
+      (action: nazwa, kod Action albo null = brak akcji; brak "op" = step)
+  {"op": "state"}                                  -> {"state": {...}}
+  {"op": "stats"}                                  -> {"stats": {...}} (sesje, kroki, rozmiary paczek)
+  błąd                                             -> {"error": "..."}
+Stan: cycle / phase / tick następnego ticka, player / npc [x, y], player_hp, npc_hp, skill_cd_player,
+skill_cd_npc, allowed (maska bitowa akcji dozwolonych NPC, env.actions_of).
+
+Pula: sesje zajmują sloty tablic (struktura tablic, wolne sloty z listy, pojemność podwajana).
+Kroki, które przyszły w tej samej iteracji pętli zdarzeń, są zbierane i wykonywane jednym
+wywołaniem SessionPool.step (loop.call_soon) — koszt symulacji rozkłada się na całą paczkę.
+Zanikanie wag pamięci (memory_decay) nie jest obsługiwane — pamięć to unia K ostatnich masek.
+
+Użycie:
+  python sim_server.py --unix /tmp/echo_sim.sock
+  python sim_server.py --host 127.0.0.1 --port 8765 --light_ticks 10 --dark_ticks 10
+  python load_test.py --spawn_server --sessions 1000,5000,10000      # generator obciążenia
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agent import BTGatedAgent
+from batch_env import BatchGridEnv
+from env import ACTION_INDEX, ACTIONS, ALL_MASK, LEARNABLE_MASK, MOVES_MASK, NOOP, GridEnv
+
+CONDITIONS = ('memory', 'baseline')
+
+# Bit akcji gracza do maski obserwacji; ostatni element obsługuje NOOP (-1)
+_BITS = np.array([1 << a for a in range(len(ACTIONS))] + [0], dtype=np.uint8)
+_NPC_NAMES = list(ACTIONS) + [None]  # _NPC_NAMES[NOOP] = None
+
+# Parametry sesji ustawiane przez reset (i domyślne serwera)
+SESSION_PARAMS = ('seed', 'condition', 'light_ticks', 'dark_ticks', 'memory_k', 'skill_min_distance')
+
+
+class SessionPool:
+    def __init__(self, capacity: int = 1024, width: int = 45, height: int = 15, max_memory_k: int = 16) -> None:
+        """
+        :param capacity: początkowa liczba slotów (rośnie dwukrotnie przy braku wolnych)
+        :param width: szerokość planszy (wspólna dla sesji)
+        :param height: wysokość planszy
+        :param max_memory_k: największe dopuszczalne memory_k (szerokość pierścienia masek)
+        """
+        self.w = int(width)
+        self.h = int(height)
+        self.max_memory_k = int(max_memory_k)
+        self.capacity = 0
+        self.free: List[int] = []
+        self.n_open = 0
+        self._alloc(int(capacity))
+
+        # Agenci są bezstanowi — jeden (skompilowany) na zestaw parametrów, sesje trzymają jego indeks
+        self.agents: List[BTGatedAgent] = []
+        self._agent_ids: Dict[int, int] = {}
+
+        # Obiekt BatchGridEnv jako „widok” na sesje jednej paczki (tablice podstawiane w step)
+        self._view = BatchGridEnv([], self.w, self.h)
+
+    def _alloc(self, capacity: int) -> None:
+        """Powiększ tablice stanu do capacity slotów (nowe sloty trafiają na listę wolnych)."""
+        old = self.capacity
+
+        def grow(name: str, shape: Tuple[int, ...], dtype) -> None:
+            arr = np.zeros((capacity,) + shape, dtype=dtype)
+            if old:
+                arr[:old] = getattr(self, name)
+            setattr(self, name, arr)
+
+        grow('player', (2,), np.int32)
+        grow('npc', (2,), np.int32)
+        grow('player_hp', (), np.int32)
+        grow('npc_hp', (), np.int32)
+        grow('skill_cd_player', (), np.int32)
+        grow('skill_cd_npc', (), np.int32)
+        grow('tick_no', (), np.int64)
+        grow('light_ticks', (), np.int64)
+        grow('period', (), np.int64)
+        grow('memory', (), np.bool_)
+        grow('memory_k', (), np.int64)
+        grow('allowed', (), np.int32)
+        grow('observed', (), np.uint8)
+        grow('history', (self.max_memory_k,), np.uint8)
+        grow('hist_pos', (), np.int64)
+        grow('agent_id', (), np.int32)
+        self.free.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def _agent(self, skill_min_distance: int) -> int:
+        sid = int(skill_min_distance)
+        if sid not in self._agent_ids:
+            self._agent_ids[sid] = len(self.agents)
+            self.agents.append(BTGatedAgent(skill_min_distance=sid, compiled=True))
+        return self._agent_ids[sid]
+
+    # ---------------------------
+    # Cykl życia sesji
+    # ---------------------------
+    def open(self, **params) -> int:
+        """Zajmij slot i zainicjuj sesję (parametry jak w reset)."""
+        if not self.free:
+            self._alloc(2 * self.capacity)
+        slot = self.free.pop()
+        self.n_open += 1
+        try:
+            self.reset(slot, **params)
+        except Exception:
+            self.close(slot)
+            raise
+        return slot
+
+    def reset(self, slot: int, seed: int = 0, condition: str = 'memory', light_ticks: int = 10,
+              dark_ticks: int = 10, memory_k: int = 1, skill_min_distance: int = 3) -> None:
+        """Nowy epizod w slocie: pozycje startowe jak GridEnv(seed=seed), pusta pamięć LIGHT."""
+        if condition not in CONDITIONS:
+            raise ValueError(f'Nieznany warunek: {condition!r} (dostępne: {", ".join(CONDITIONS)})')
+        if not 1 <= memory_k <= self.max_memory_k:
+            raise ValueError(f'memory_k musi być w zakresie 1..{self.max_memory_k} (podano {memory_k})')
+        if light_ticks < 1 or dark_ticks < 0:
+            raise ValueError('light_ticks musi być >= 1, dark_ticks >= 0')
+        env = GridEnv(self.w, self.h, seed=int(seed))
+        self.player[slot] = env.player
+        self.npc[slot] = env.npc
+        self.player_hp[slot] = env.player_hp
+        self.npc_hp[slot] = env.npc_hp
+        self.skill_cd_player[slot] = 0
+        self.skill_cd_npc[slot] = 0
+        self.tick_no[slot] = 0
+        self.light_ticks[slot] = light_ticks
+        self.period[slot] = light_ticks + dark_ticks
+        self.memory[slot] = condition == 'memory'
+        self.memory_k[slot] = memory_k
+        # cykl 1: NPC w warunku memory ma tylko ruchy (pusta pamięć), baseline — wszystkie akcje
+        self.allowed[slot] = MOVES_MASK if condition == 'memory' else ALL_MASK
+        self.observed[slot] = 0
+        self.history[slot] = 0
+        self.hist_pos[slot] = 0
+        self.agent_id[slot] = self._agent(skill_min_distance)
+
+    def close(self, slot: int) -> None:
+        """Zwolnij slot."""
+        self.free.append(slot)
+        self.n_open -= 1
+
+    # ---------------------------
+    # Krok paczki sesji
+    # ---------------------------
+    def step(self, slots: np.ndarray, actions: np.ndarray) -> np.ndarray:
+        """
+        Jeden tick dla sesji `slots` (różnych) z akcjami gracza `actions` (kody Action, NOOP = brak).
+
+        :return: kody akcji NPC (NOOP = brak)
+        """
+        view = self._view
+        view.n = len(slots)
+        view.player = self.player[slots]
+        view.npc = self.npc[slots]
+        view.player_hp = self.player_hp[slots]
+        view.npc_hp = self.npc_hp[slots]
+        view.skill_cd_player = self.skill_cd_player[slots]
+        view.skill_cd_npc = self.skill_cd_npc[slots]
+        allowed = self.allowed[slots]
+
+        # NPC decyduje na stanie sprzed ruchu gracza (jak w experiment.Episode)
+        agent_ids = self.agent_id[slots]
+        npc_actions = self.agents[agent_ids[0]].pick_actions_batch(view, allowed)
+        if len(self.agents) > 1:
+            for a in np.unique(agent_ids[1:]):
+                if a != agent_ids[0]:
+                    sel = agent_ids == a
+                    npc_actions[sel] = self.agents[a].pick_actions_batch(view, allowed)[sel]
+
+        view.step_player(actions)
+        view.step_npc(npc_actions)
+        view.tick_cooldowns()
+        self.player[slots] = view.player
+        self.npc[slots] = view.npc
+        self.player_hp[slots] = view.player_hp
+        self.npc_hp[slots] = view.npc_hp
+        self.skill_cd_player[slots] = view.skill_cd_player
+        self.skill_cd_npc[slots] = view.skill_cd_npc
+
+        # Obserwacja akcji gracza w LIGHT, potem przejście do następnego ticka / cyklu
+        tick_no = self.tick_no[slots]
+        period = self.period[slots]
+        light = tick_no % period < self.light_ticks[slots]
+        self.observed[slots] |= np.where(light, _BITS[actions], 0).astype(np.uint8)
+        tick_no += 1
+        self.tick_no[slots] = tick_no
+        ended = slots[tick_no % period == 0]
+        if len(ended):
+            self._end_cycle(ended)
+        return npc_actions
+
+    def _end_cycle(self, slots: np.ndarray) -> None:
+        """Koniec cyklu: maska LIGHT do pierścienia K ostatnich, nowa maska dozwolonych akcji NPC."""
+        pos = self.hist_pos[slots]
+        self.history[slots, pos] = self.observed[slots]
+        self.hist_pos[slots] = (pos + 1) % self.memory_k[slots]
+        remembered = np.bitwise_or.reduce(self.history[slots], axis=1).astype(np.int32)
+        self.allowed[slots] = np.where(self.memory[slots], MOVES_MASK | (remembered & LEARNABLE_MASK), ALL_MASK)
+        self.observed[slots] = 0
+
+    def states(self, slots) -> List[Dict[str, Any]]:
+        """Stany sesji (po ostatnim kroku; cycle / phase / tick dotyczą następnego ticka)."""
+        slots = np.asarray(slots, dtype=np.int64)
+        cycle, r = np.divmod(self.tick_no[slots], self.period[slots])
+        light = r < self.light_ticks[slots]
+        tick = np.where(light, r, r - self.light_ticks[slots])
+        cols = zip((cycle + 1).tolist(), light.tolist(), tick.tolist(), self.player[slots].tolist(),
+                   self.npc[slots].tolist(), self.player_hp[slots].tolist(), self.npc_hp[slots].tolist(),
+                   self.skill_cd_player[slots].tolist(), self.skill_cd_npc[slots].tolist(),
+                   self.allowed[slots].tolist())
+        return [
+            {'cycle': c, 'phase': 'LIGHT' if lt else 'DARK', 'tick': t, 'player': p, 'npc': n,
+             'player_hp': php, 'npc_hp': nhp, 'skill_cd_player': cdp, 'skill_cd_npc': cdn, 'allowed': al}
+            for c, lt, t, p, n, php, nhp, cdp, cdn, al in cols
+        ]
+
+
+def parse_action(value) -> int:
+    """Akcja gracza z komunikatu: nazwa, kod Action albo None (brak akcji) -> kod (NOOP = brak)."""
+    if value is None:
+        return NOOP
+    if isinstance(value, str):
+        if value not in ACTION_INDEX:
+            raise ValueError(f'Nieznana akcja: {value!r}')
+        return ACTION_INDEX[value]
+    if isinstance(value, int) and not isinstance(value, bool) and NOOP <= value < len(ACTIONS):
+        return value
+    raise ValueError(f'Nieznana akcja: {value!r}')
+
+
+class SimServer:
+    def __init__(self, pool: SessionPool, defaults: Optional[Dict[str, Any]] = None) -> None:
+        """
+        :param pool: pula sesji
+        :param defaults: domyślne parametry nowych sesji (SESSION_PARAMS; seed = numer połączenia)
+        """
+        self.pool = pool
+        self.defaults = dict(defaults or {})
+        self.connections = 0
+        self.steps = 0
+        self.batches = 0
+        self.max_batch = 0
+        self._pending_slots: List[int] = []
+        self._pending_actions: List[int] = []
+        self._pending_futures: List[asyncio.Future] = []
+        self._flush_scheduled = False
+
+    # ---------------------------
+    # Paczkowanie kroków
+    # ---------------------------
+    def _submit(self, slot: int, action: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending_slots.append(slot)
+        self._pending_actions.append(action)
+        self._pending_futures.append(fut)
+        if not self._flush_scheduled:
+            # wykonanie w następnej iteracji pętli — po obsłużeniu wszystkich linii z bieżącej
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+        return fut
+
+    def _flush(self) -> None:
+        slots, actions, futures = self._pending_slots, self._pending_actions, self._pending_futures
+        self._pending_slots, self._pending_actions, self._pending_futures = [], [], []
+        self._flush_scheduled = False
+        slot_arr = np.array(slots, dtype=np.int64)
+        try:
+            npc_actions = self.pool.step(slot_arr, np.array(actions, dtype=np.int32)).tolist()
+            states = self.pool.states(slot_arr)
+        except Exception as e:  # błąd kroku trafia do wszystkich klientów paczki
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        self.steps += len(slots)
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(slots))
+        for fut, a, st in zip(futures, npc_actions, states):
+            if not fut.done():
+                fut.set_result({'npc_action': _NPC_NAMES[a], 'state': st})
+
+    def stats(self) -> Dict[str, Any]:
+        return {'sessions': self.pool.n_open, 'connections': self.connections, 'steps': self.steps,
+                'batches': self.batches, 'mean_batch': self.steps / self.batches if self.batches else 0.0,
+                'max_batch': self.max_batch, 'capacity': self.pool.capacity}
+
+    # ---------------------------
+    # Połączenia
+    # ---------------------------
+    def _session_params(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        params = {k: self.defaults[k] for k in SESSION_PARAMS if k in self.defaults}
+        params.update({k: msg[k] for k in SESSION_PARAMS if k in msg})
+        return params
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Obsługa jednego połączenia = jednej sesji."""
+        self.connections += 1
+        slot = self.pool.open(**{**self._session_params({}), 'seed': self.defaults.get('seed', self.connections - 1)})
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                msg = {}
+                try:
+                    msg = json.loads(line)
+                    op = msg.get('op', 'step')
+                    if op == 'step':
+                        resp = await self._submit(slot, parse_action(msg.get('action')))
+                    elif op == 'reset':
+                        self.pool.reset(slot, **self._session_params(msg))
+                        resp = {'state': self.pool.states([slot])[0]}
+                    elif op == 'state':
+                        resp = {'state': self.pool.states([slot])[0]}
+                    elif op == 'stats':
+                        resp = {'stats': self.stats()}
+                    else:
+                        raise ValueError(f'Nieznana operacja: {op!r}')
+                except (ValueError, TypeError, AttributeError) as e:
+                    resp = {'error': str(e)}
+                    if not isinstance(msg, dict):
+                        msg = {}
+                if 'id' in msg:
+                    resp = {**resp, 'id': msg['id']}
+                writer.write(json.dumps(resp).encode() + b'\n')
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.pool.close(slot)
+            writer.close()
+
+    async def serve_tcp(self, host: str, port: int, backlog: int = 4096) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port, backlog=backlog)
+
+    async def serve_unix(self, path: str, backlog: int = 4096) -> asyncio.AbstractServer:
+        return await asyncio.start_unix_server(self.handle, path, backlog=backlog)
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Serwer symulacji ECHO-like (asyncio, JSON lines)')
+    ap.add_argument('--host', type=str, default='127.0.0.1', help='Adres TCP')
+    ap.add_argument('--port', type=int, default=8765, help='Port TCP')
+    ap.add_argument('--unix', type=str, default='', help='Ścieżka gniazda Unix (zamiast TCP)')
+    ap.add_argument('--width', type=int, default=45, help='Szerokość planszy')
+    ap.add_argument('--height', type=int, default=15, help='Wysokość planszy')
+    ap.add_argument('--capacity', type=int, default=1024, help='Początkowa liczba slotów puli sesji')
+    ap.add_argument('--condition', type=str, default='memory', choices=CONDITIONS, help='Domyślny warunek sesji')
+    ap.add_argument('--light_ticks', type=int, default=10, help='Domyślna długość fazy LIGHT (ticki)')
+    ap.add_argument('--dark_ticks', type=int, default=10, help='Domyślna długość fazy DARK (ticki)')
+    ap.add_argument('--memory_k', type=int, default=1, help='Domyślna liczba pamiętanych faz LIGHT')
+    return ap.parse_args()
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    pool = SessionPool(args.capacity, args.width, args.height)
+    defaults = dict(condition=args.condition, light_ticks=args.light_ticks, dark_ticks=args.dark_ticks,
+                    memory_k=args.memory_k)
+    server = SimServer(pool, defaults)
+    if args.unix:
+        srv = await server.serve_unix(args.unix)
+        where = args.unix
+    else:
+        srv = await server.serve_tcp(args.host, args.port)
+        where = f'{args.host}:{args.port}'
+    print(f'[sim_server] listening on {where}', flush=True)
+    async with srv:
+        await srv.serve_forever()
+
+
+def main() -> None:
+    args = parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+sweep.py — przeszukiwanie przestrzeni parametrów eksperymentu (grid / random / Latin hypercube).
+
+Interfejs:
+- funkcja load_spec(path) -> dict                   — specyfikacja sweepu z pliku JSON
+- funkcja sample_points(spec) -> [ {parametr: wartość} ] — punkty przestrzeni parametrów
+- funkcja split_params(point) -> kwargs run_single_experiment (player_kwargs / agent_kwargs)
+- funkcja sweep_tasks(spec) -> (punkty, zadania (warunek, seed, kwargs), indeks punktu per zadanie)
+- funkcja run_sweep(spec, workers=1, chunk_size=None, store=None) -> wiersze tabeli „long”
+- funkcja write_long_csv(path, rows, params)
+
+Specyfikacja (JSON):
+  {
+    "mode": "grid" | "random" | "lhs",
+    "n": 32,                          # liczba punktów (random / lhs)
+    "sample_seed": 0,                 # ziarno losowania punktów
+    "seeds": "0-9",                   # seedy epizodów dla każdego punktu
+    "conditions": ["memory", "baseline"],
+    "fixed": {"memory_k": 2},         # parametry stałe (nie są kolumnami tabeli)
+    "params": {
+      "cycles": [10, 20, 40],                           # lista wartości
+      "light_ticks": {"low": 5, "high": 40, "int": true},  # przedział (grid: wymaga "num")
+      "p_skill_light": {"low": 0.02, "high": 0.3, "num": 4},
+      "skill_min_distance": [2, 3, 4]
+    }
+  }
+
+Parametry: light_ticks, dark_ticks, cycles, memory_* (run_single_experiment), parametry
+ScriptedPlayer (p_attack_adjacent, p_skill_light, p_skill_dark, move_policy, jitter_move_prob)
+i BTGatedAgent (skill_min_distance, prefer_axis_with_larger_gap).
+Przedziały osi cycles, light_ticks, dark_ticks, memory_k i skill_min_distance są zawsze całkowite
+(INT_PARAMS); dla innych osi całkowitość włącza "int": true.
+
+Koszt epizodu rośnie z cycles * (light_ticks + dark_ticks), więc zadania trafiają do workerów
+od najdłuższych (longest-job-first) — krótkie epizody wypełniają końcówkę przebiegu.
+Wynik to jedna tabela „long”: punkt, kolumna per parametr, seed, warunek, metryka, wartość.
+
+Użycie:
+  python sweep.py sweep.json --outdir data --workers 8          # -> data/sweep_long.csv
+  python sweep.py sweep.json --store data/results.sqlite        # wznawialny sweep
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import inspect
+import itertools
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from agent import BTGatedAgent
+from experiment import format_worker_stats, run_single_experiment, run_tasks
+from player import ScriptedPlayer
+from run_experiment import DEFAULT_CONDITIONS, to_seed_list
+
+MODES = ('grid', 'random', 'lhs')
+
+_ID_COLUMNS = ('seed', 'condition')
+
+
+def _param_names(fn, exclude: Sequence[str]) -> List[str]:
+    return [n for n in inspect.signature(fn).parameters if n not in exclude and n != 'self']
+
+
+EPISODE_PARAMS = _param_names(run_single_experiment, ('seed', 'condition', 'compact_env', 'timing_sample_every',
+                                                      'trajectory', 'player_kwargs', 'agent_kwargs'))
+PLAYER_PARAMS = _param_names(ScriptedPlayer.__init__, ('rng_seed', 'rng_episode'))
+AGENT_PARAMS = _param_names(BTGatedAgent.__init__, ('compiled',))
+
+_EPISODE_DEFAULTS = {n: p.default for n, p in inspect.signature(run_single_experiment).parameters.items()}
+
+# Parametry całkowite — przedziały low..high tych osi są zawsze całkowite (jak z "int": true)
+INT_PARAMS = frozenset({'cycles', 'light_ticks', 'dark_ticks', 'memory_k', 'skill_min_distance'})
+
+
+def load_spec(path) -> Dict[str, Any]:
+    """Wczytaj specyfikację sweepu z pliku JSON."""
+    return json.loads(Path(path).read_text())
+
+
+def split_params(point: Dict[str, Any]) -> Dict[str, Any]:
+    """Rozdziel parametry punktu na kwargs run_single_experiment, player_kwargs i agent_kwargs."""
+    kwargs: Dict[str, Any] = {}
+    player: Dict[str, Any] = {}
+    agent: Dict[str, Any] = {}
+    for name, value in point.items():
+        if name in EPISODE_PARAMS:
+            kwargs[name] = value
+        elif name in PLAYER_PARAMS:
+            player[name] = value
+        elif name in AGENT_PARAMS:
+            agent[name] = value
+        else:
+            raise ValueError(f'Nieznany parametr sweepu: {name!r}')
+    if player:
+        kwargs['player_kwargs'] = player
+    if agent:
+        kwargs['agent_kwargs'] = agent
+    return kwargs
+
+
+def episode_cost(kwargs: Dict[str, Any]) -> int:
+    """Przybliżony koszt epizodu: liczba ticków cycles * (light_ticks + dark_ticks)."""
+    get = lambda name: kwargs.get(name, _EPISODE_DEFAULTS[name])
+    return int(get('cycles')) * (int(get('light_ticks')) + int(get('dark_ticks')))
+
+
+# ---------------------------
+# Próbkowanie punktów
+# ---------------------------
+def _is_int(name: str, axis) -> bool:
+    return name in INT_PARAMS or bool(axis.get('int'))
+
+
+def _axis_value(name: str, axis, u: float):
+    """Wartość osi dla u z [0, 1): element listy albo punkt przedziału low..high."""
+    if isinstance(axis, list):
+        return axis[min(int(u * len(axis)), len(axis) - 1)]
+    low, high = axis['low'], axis['high']
+    if _is_int(name, axis):
+        return min(int(low + u * (high - low + 1)), int(high))
+    return low + u * (high - low)
+
+
+def _grid_values(name: str, axis) -> list:
+    if isinstance(axis, list):
+        return axis
+    if 'num' not in axis:
+        raise ValueError(f'Parametr {name!r}: przedział w trybie grid wymaga "num"')
+    num = int(axis['num'])
+    low, high = axis['low'], axis['high']
+    values = [low + (high - low) * i / (num - 1) for i in range(num)] if num > 1 else [low]
+    if _is_int(name, axis):
+        values = list(dict.fromkeys(int(round(v)) for v in values))
+    return values
+
+
+def sample_points(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Punkty przestrzeni parametrów wg spec['mode'] (kolejność parametrów jak w spec['params'])."""
+    mode = spec.get('mode', 'grid')
+    if mode not in MODES:
+        raise ValueError(f'Nieznany tryb sweepu: {mode!r} (dostępne: {", ".join(MODES)})')
+    params: Dict[str, Any] = spec.get('params', {})
+    names = list(params)
+    if mode == 'grid':
+        axes = [_grid_values(n, params[n]) for n in names]
+        return [dict(zip(names, combo)) for combo in itertools.product(*axes)]
+
+    n = int(spec.get('n', 16))
+    rng = random.Random(spec.get('sample_seed', 0))
+    if mode == 'random':
+        return [{name: _axis_value(name, params[name], rng.random()) for name in names} for _ in range(n)]
+    # lhs: każda oś podzielona na n warstw, każda warstwa użyta dokładnie raz (niezależne permutacje)
+    columns = {}
+    for name in names:
+        strata = list(range(n))
+        rng.shuffle(strata)
+        columns[name] = [_axis_value(name, params[name], (k + rng.random()) / n) for k in strata]
+    return [{name: columns[name][i] for name in names} for i in range(n)]
+
+
+def sweep_tasks(spec: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[tuple], List[int]]:
+    """
+    Rozwiń sweep w zadania (warunek, seed, kwargs) dla experiment.run_tasks.
+
+    :return: (punkty, zadania, indeks punktu dla każdego zadania)
+    """
+    seeds = spec.get('seeds', '0-9')
+    seeds = to_seed_list(seeds) if isinstance(seeds, str) else [int(s) for s in seeds]
+    conditions = spec.get('conditions', DEFAULT_CONDITIONS)
+    fixed = spec.get('fixed', {})
+    overlap = set(fixed) & set(spec.get('params', {}))
+    if overlap:
+        raise ValueError(f'Parametry jednocześnie stałe i przeszukiwane: {", ".join(sorted(overlap))}')
+
+    points = sample_points(spec)
+    tasks: List[tuple] = []
+    owner: List[int] = []
+    for i, point in enumerate(points):
+        kwargs = split_params({**fixed, **point})
+        for cond in conditions:
+            for s in seeds:
+                tasks.append((cond, s, kwargs))
+                owner.append(i)
+    return points, tasks, owner
+
+
+def run_sweep(spec: Dict[str, Any], workers: int = 1, chunk_size: Optional[int] = None,
+              store=None) -> List[Dict[str, Any]]:
+    """
+    Wykonaj sweep i zwróć tabelę „long”: jeden wiersz na (punkt, seed, warunek, metryka).
+
+    Zadania są wykonywane od najdroższych (longest-job-first) i rozdawane do paczek po kolei, więc każda
+    paczka ma mieszankę ciężkich i lekkich epizodów; wiersze wracają w kolejności sweepu.
+
+    :param store: opcjonalny results_store.ResultsStore — policzone epizody są czytane z bazy
+    """
+    points, tasks, owner = sweep_tasks(spec)
+    order = sorted(range(len(tasks)), key=lambda i: -episode_cost(tasks[i][2]))
+    ordered_rows, stats = run_tasks([tasks[i] for i in order], workers, chunk_size, store, interleave=True)
+    if stats:
+        print(format_worker_stats(stats))
+    rows: List[Optional[dict]] = [None] * len(tasks)
+    for i, row in zip(order, ordered_rows):
+        rows[i] = row
+
+    names = list(spec.get('params', {}))
+    out: List[Dict[str, Any]] = []
+    for i, row in enumerate(rows):
+        base = {'point': owner[i], **{n: points[owner[i]][n] for n in names},
+                'seed': row['seed'], 'condition': row['condition']}
+        for metric, value in row.items():
+            if metric not in _ID_COLUMNS:
+                out.append({**base, 'metric': metric, 'value': value})
+    return out
+
+
+def write_long_csv(path, rows: List[Dict[str, Any]], params: Sequence[str]) -> None:
+    """Zapisz tabelę „long” (point, parametry..., seed, condition, metric, value)."""
+    fields = ['point', *params, 'seed', 'condition', 'metric', 'value']
+    with open(path, 'w', newline='') as fh:
+        w = csv.DictWriter(fh, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Sweep parametrów eksperymentu ECHO-like')
+    ap.add_argument('spec', type=str, help='Plik JSON ze specyfikacją sweepu')
+    ap.add_argument('--outdir', type=str, default='data', help='Katalog wyjściowy')
+    ap.add_argument('--out', type=str, default='sweep_long.csv', help='Nazwa pliku z tabelą long')
+    ap.add_argument('--workers', type=int, default=1, help='Liczba procesów (1 = szeregowo)')
+    ap.add_argument('--chunk_size', type=int, default=None, help='Liczba epizodów w paczce dla workera')
+    ap.add_argument('--store', type=str, default='', help='Baza SQLite z wynikami epizodów (wznawianie)')
+    return ap.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    spec = load_spec(args.spec)
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    store = None
+    if args.store:
+        from results_store import ResultsStore
+        store = ResultsStore(args.store)
+    try:
+        rows = run_sweep(spec, args.workers, args.chunk_size, store)
+    finally:
+        if store is not None:
+            store.close()
+
+    outfile = outdir / args.out
+    write_long_csv(outfile, rows, list(spec.get('params', {})))
+    n_points = len({r['point'] for r in rows})
+    print(f'Wrote {outfile} ({n_points} punktów, {len(rows)} wierszy)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+trajectory.py — kompaktowy zapis przebiegu epizodu tick po ticku (NumPy, .npy / memmap).
+
+Interfejs:
+- TRAJ_DTYPE — rekord ticka (24 bajty, bez wyrównania): cycle, phase (0=LIGHT, 1=DARK), tick,
+  pozycje gracza i NPC, HP, cooldowny, akcja gracza, akcja NPC (NOOP=-1), maska dozwolonych akcji
+- klasa TrajectoryRecorder(n_ticks, out=None) — pakuje rekordy do bufora (bytearray albo wiersz memmapy);
+  check(cycles, width, height, phase_ticks) sprawdza przed przebiegiem, czy wartości zmieszczą się w polach
+- funkcja open_trajectories(path, n_episodes, n_ticks, meta) -> memmap (n_episodes, n_ticks) + plik .json
+- funkcja load_trajectories(path) -> (memmap tylko do odczytu, meta)
+
+Rekord opisuje stan PO ticku (po step_player, step_npc i tick_cooldowns) oraz akcje wykonane w ticku.
+Wiersz epizodu ma stałą długość cycles * (light_ticks + dark_ticks), więc wiele epizodów tego samego
+przebiegu tworzy tablicę 2-D — wygodną do wektorowych redukcji (offline_metrics.py).
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+TRAJ_DTYPE = np.dtype([
+    ('cycle', '<u4'),
+    ('phase', 'u1'),
+    ('tick', '<u2'),
+    ('player_x', 'u1'),
+    ('player_y', 'u1'),
+    ('npc_x', 'u1'),
+    ('npc_y', 'u1'),
+    ('player_hp', '<i4'),
+    ('npc_hp', '<i4'),
+    ('skill_cd_player', 'u1'),
+    ('skill_cd_npc', 'u1'),
+    ('action_p', 'i1'),
+    ('action_n', 'i1'),
+    ('allowed', 'u1'),
+])
+
+PHASE_CODES = {'LIGHT': 0, 'DARK': 1}
+
+# Ten sam układ bajtów co TRAJ_DTYPE → struct.pack_into prosto do bufora/memmapy
+_RECORD = struct.Struct('<IBHBBBBiiBBbbB')
+assert _RECORD.size == TRAJ_DTYPE.itemsize
+
+# Zakresy pól zależnych od przebiegu (HP w <i4 — obrażenia sumują się bez dolnego limitu)
+MAX_CYCLES = np.iinfo(TRAJ_DTYPE['cycle']).max
+MAX_BOARD_SIZE = np.iinfo(TRAJ_DTYPE['player_x']).max + 1
+MAX_PHASE_TICKS = np.iinfo(TRAJ_DTYPE['tick']).max + 1
+
+
+class TrajectoryRecorder:
+    def __init__(self, n_ticks: int, out=None) -> None:
+        """
+        :param n_ticks: liczba ticków epizodu
+        :param out: zapisywalny bufor n_ticks rekordów (np. wiersz memmapy); None = nowy bytearray
+        """
+        self.n_ticks = int(n_ticks)
+        self.buf = memoryview(bytearray(self.n_ticks * _RECORD.size) if out is None else out).cast('B')
+        if len(self.buf) != self.n_ticks * _RECORD.size:
+            raise ValueError(f'Bufor ma {len(self.buf)} B, oczekiwano {self.n_ticks * _RECORD.size} B')
+        self.pos = 0
+        # pack_into(bufor, offset, *pola) — lokalna referencja dla gorącej pętli
+        self.pack_into = _RECORD.pack_into
+        self.size = _RECORD.size
+
+    @staticmethod
+    def check(cycles: int, width: int, height: int, phase_ticks: int = 0) -> None:
+        """
+        Sprawdź przed przebiegiem, czy rekordy się zmieszczą (ValueError zamiast struct.error w połowie epizodu).
+
+        :param cycles: numer ostatniego zapisywanego cyklu
+        :param width: szerokość planszy
+        :param height: wysokość planszy
+        :param phase_ticks: najdłuższa faza (ticki)
+        """
+        if cycles > MAX_CYCLES:
+            raise ValueError(f'Zapis trajektorii obsługuje najwyżej {MAX_CYCLES} cykli (podano {cycles})')
+        if max(width, height) > MAX_BOARD_SIZE:
+            raise ValueError(f'Zapis trajektorii obsługuje planszę najwyżej {MAX_BOARD_SIZE} × {MAX_BOARD_SIZE} '
+                             f'(podano {width} × {height})')
+        if phase_ticks > MAX_PHASE_TICKS:
+            raise ValueError(f'Zapis trajektorii obsługuje fazy najwyżej {MAX_PHASE_TICKS} ticków '
+                             f'(podano {phase_ticks})')
+
+    def record(self, cycle: int, phase: int, tick: int, env, action_p: int, action_n: int, allowed: int) -> None:
+        """Dopisz rekord ticka (stan env po ticku)."""
+        player, npc = env.player, env.npc
+        self.pack_into(self.buf, self.pos, cycle, phase, tick, player[0], player[1], npc[0], npc[1],
+                       env.player_hp, env.npc_hp, env.skill_cd_player, env.skill_cd_npc,
+                       action_p, action_n, allowed)
+        self.pos += self.size
+
+    def array(self) -> np.ndarray:
+        """Widok zapisanych rekordów jako tablica TRAJ_DTYPE (bez kopiowania)."""
+        return np.frombuffer(self.buf, dtype=TRAJ_DTYPE, count=self.pos // self.size)
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix('.json')
+
+
+def open_trajectories(path, n_episodes: int, n_ticks: int, meta: Optional[Dict[str, Any]] = None) -> np.memmap:
+    """Utwórz plik .npy (n_episodes, n_ticks) TRAJ_DTYPE jako memmapę + metadane w pliku .json obok."""
+    path = Path(path)
+    arr = np.lib.format.open_memmap(path, mode='w+', dtype=TRAJ_DTYPE, shape=(n_episodes, n_ticks))
+    _meta_path(path).write_text(json.dumps(meta or {}, indent=1))
+    return arr
+
+
+def load_trajectories(path, mode: str = 'r') -> Tuple[np.memmap, Dict[str, Any]]:
+    """Zmapuj plik trajektorii (bez wczytywania do pamięci) i wczytaj jego metadane."""
+    path = Path(path)
+    arr = np.load(path, mmap_mode=mode)
+    meta_file = _meta_path(path)
+    meta = json.loads(meta_file.read_text()) if meta_file.exists() else {}
+    return arr, meta
+
+
+def save_trajectory(path, trajectory: np.ndarray, meta: Optional[Dict[str, Any]] = None) -> None:
+    """Zapisz trajektorię jednego epizodu (.npy) + metadane (.json)."""
+    path = Path(path)
+    np.save(path, np.asarray(trajectory, dtype=TRAJ_DTYPE))
+    _meta_path(path).write_text(json.dumps(meta or {}, indent=1))
@@ -4,46 +4,164 @@ viewer_ascii.py — prosta wizualizacja 15x15 i tryb sterowania graczem.
 Tryby:
 - scripted: gracz = ScriptedPlayer; animacja ASCII (opcjonalnie zapis do pliku)
 - human:    gracz sterowany z klawiatury (WASD = ruch, J = ATTACK, K = SKILL, Q = quit)
+- realtime: jak human, ale świat idzie stałym tempem (--tick_rate, asyncio); klawisze czytane bez
+            blokowania (bez Entera), brak klawisza = brak akcji gracza; nagłówek klatki pokazuje
+            spóźnione klatki i opóźnienie klawisz -> narysowana klatka (POSIX)
+
+Wyświetlanie na żywo (terminal): pełna klatka rysowana raz, potem TerminalRenderer wysyła tylko
+zmienione linie nagłówka i zmienione pola planszy (ruchy kursora ANSI) — bez migotania.
+Gdy wyjście nie jest terminalem, klatki są wypisywane w całości jak w zapisie.
+
+Zapis (--record): jeden otwarty, buforowany strumień (FrameRecorder) zamiast otwierania pliku
+na każdą klatkę; ścieżka z rozszerzeniem .gz -> strumień gzip. Przy zapisie nie ma wydruku na żywo.
+Ścieżka .rpl -> kompaktowy zapis replay.py (delty stanu + klatki kluczowe), odtwarzany przez --replay:
+skok do dowolnego cyklu/ticka, odtwarzanie w przód i w tył, skoki do zdarzeń (np. pierwszy SKILL NPC,
+spadek HP).
 
 Przykłady:
   python viewer_ascii.py --mode scripted --cycles 1 --light_ticks 20 --dark_ticks 20 --speed 0.1
   python viewer_ascii.py --mode human    --cycles 1 --light_ticks 10 --dark_ticks 10
+  python viewer_ascii.py --mode realtime --cycles 3 --tick_rate 20
   python viewer_ascii.py --mode scripted --record data/demo_frames.txt --speed 0.0
+  python viewer_ascii.py --mode scripted --record data/demo_frames.txt.gz --cycles 1000 --speed 0.0
+  python viewer_ascii.py --mode scripted --record data/demo.rpl --cycles 1000 --speed 0.0
+  python viewer_ascii.py --replay data/demo.rpl --seek 12:DARK:3 --replay_speed -40
+  python viewer_ascii.py --replay data/demo.rpl --event npc_skill --frames 1
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import gzip
+import os
+import sys
 import time
-from typing import List, Set, Optional
+from collections import deque
+from typing import Deque, Dict, List, Set, Optional, TextIO, Tuple
 
-from env import GridEnv, MOVES_ONLY, LEARNABLE
+from env import ACTION_INDEX, ACTIONS, GridEnv, LEARNABLE_MASK, MOVES_MASK, NOOP, actions_of
 from player import ScriptedPlayer
 from agent import BTGatedAgent
+from instrumentation import LatencyHistogram
+from replay import EVENT_KINDS, ReplayReader, ReplayRecorder
+
+REPLAY_SUFFIX = '.rpl'
+
+FRAME_SEP = '-' * 32
+# Nagłówek klatki ma stałą wysokość na ekranie (linia 'Allowed' tylko w DARK)
+HEADER_LINES = 3
 
 
 def render_grid(env: GridEnv) -> List[str]:
-    grid = [['.' for _ in range(env.w)] for _ in range(env.h)]
+    """Wiersze planszy: '.' puste pole, P gracz, N NPC, X oba na tym samym polu."""
+    row = '.' * env.w
+    rows = [row] * env.h
     px, py = env.player
     nx, ny = env.npc
     if (px, py) == (nx, ny):
-        grid[py][px] = 'X'
+        rows[py] = row[:px] + 'X' + row[px + 1:]
     else:
-        grid[py][px] = 'P'
-        grid[ny][nx] = 'N'
-    return[''.join(row) for row in grid]
+        rows[py] = row[:px] + 'P' + row[px + 1:]
+        r = rows[ny]
+        rows[ny] = r[:nx] + 'N' + r[nx + 1:]
+    return rows
 
 
 def frame_header(cycle: int, phase: str, tick: int, env: GridEnv,
-allowed: Set[str], action_p: Optional[str], action_n: Optional[str]) -> str:
+allowed: Set[str], action_p: Optional[str], action_n: Optional[str],
+timing: Optional['FrameTiming'] = None) -> str:
     lines = []
     lines.append(f'Cycle={cycle} Phase={phase} Tick={tick} | dist={env.dist()} | HPgracza={env.player_hp}  HPnpc={env.npc_hp} | Akcja gracza={env.skill_cd_player}  Akcja npc={env.skill_cd_npc}')
     if phase == 'DARK':
         lines.append(f'Allowed for NPC={sorted(list(allowed))}')
-    lines.append(f'Player action={action_p or '-'} | NPC action={action_n or '-'}')
+    lines.append(f'Player action={action_p or "-"} | NPC action={action_n or "-"}')
+    if timing is not None:
+        lines.append(timing.header_line())
     return '\n'.join(lines)
 
 
+def format_frame(header: str, env: GridEnv) -> str:
+    """Pełna klatka tekstowa (nagłówek, plansza, separator) — format zapisu --record."""
+    return f'{header}\n' + '\n'.join(render_grid(env)) + f'\n{FRAME_SEP}\n'
+
+
+class TerminalRenderer:
+    def __init__(self, out: TextIO = sys.stdout, header_lines: int = HEADER_LINES) -> None:
+        """
+        Rysowanie na żywo z pamięcią poprzedniej klatki: wysyłane są tylko zmiany (sekwencje ANSI).
+
+        :param out: strumień terminala
+        :param header_lines: stała wysokość nagłówka na ekranie (krótsze nagłówki są dopełniane)
+        """
+        self.out = out
+        self.header_lines = header_lines
+        self.header: List[str] = []
+        self.cells: Dict[Tuple[int, int], str] = {}  # pola różne od '.' w poprzedniej klatce
+        self.height = 0
+
+    def draw(self, header: str, env: GridEnv) -> None:
+        """Narysuj klatkę: za pierwszym razem całą, potem tylko zmienione linie nagłówka i pola."""
+        lines = header.split('\n')
+        lines += [''] * (self.header_lines - len(lines))
+        px, py = env.player
+        nx, ny = env.npc
+        cells = {(px, py): 'X'} if (px, py) == (nx, ny) else {(px, py): 'P', (nx, ny): 'N'}
+
+        if not self.height:
+            # ukryj kursor, wyczyść ekran, pełna klatka od lewego górnego rogu
+            self.height = env.h
+            parts = ['\x1b[?25l\x1b[2J\x1b[H', '\n'.join(lines), '\n', '\n'.join(render_grid(env)), '\n', FRAME_SEP]
+        else:
+            parts = []
+            for i, line in enumerate(lines):
+                if line != self.header[i]:
+                    parts.append(f'\x1b[{i + 1};1H{line}\x1b[K')
+            top = self.header_lines + 1
+            for (x, y) in self.cells.keys() - cells.keys():
+                parts.append(f'\x1b[{top + y};{x + 1}H.')
+            for (x, y), ch in cells.items():
+                if self.cells.get((x, y)) != ch:
+                    parts.append(f'\x1b[{top + y};{x + 1}H{ch}')
+        # kursor pod klatką, reszta ekranu wyczyszczona (miejsce na prompt trybu human)
+        parts.append(f'\x1b[{self.header_lines + self.height + 2};1H\x1b[J')
+        self.out.write(''.join(parts))
+        self.out.flush()
+        self.header = lines
+        self.cells = cells
+
+    def close(self) -> None:
+        """Przywróć kursor."""
+        if self.height:
+            self.out.write('\x1b[?25h')
+            self.out.flush()
+
+
+class FrameRecorder:
+    def __init__(self, path: str, buffer_size: int = 1 << 20) -> None:
+        """
+        Zapis klatek jednym otwartym strumieniem (zamiast otwierania pliku na każdą klatkę).
+
+        :param path: plik wyjściowy; rozszerzenie .gz -> kompresja gzip
+        :param buffer_size: rozmiar bufora zapisu (bajty)
+        """
+        if path.endswith('.gz'):
+            # szybki poziom kompresji — zapis klatek nie powinien czekać na kompresor
+            self.fh = gzip.open(path, 'wt', compresslevel=1, newline='')
+        else:
+            self.fh = open(path, 'w', buffering=buffer_size, newline='')
+        self.write = self.fh.write
+
+    def close(self) -> None:
+        self.fh.close()
+
+    def __enter__(self) -> 'FrameRecorder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
 def run(mode: str, cycles: int, light_ticks: int, dark_ticks: int,
 speed: float, record_path: Optional[str], seed: int):
 
@@ -51,100 +169,317 @@ speed: float, record_path: Optional[str], seed: int):
     player = ScriptedPlayer(rng_seed=seed+13)
     agent = BTGatedAgent()
 
-    def maybe_write(s: str):
-        if record_path:
-            with open(record_path, 'a') as f:
-                f.write(s + '\n')
+    if mode == 'scripted':
+        choose = player.act
+    elif mode == 'human':
+        choose = lambda env, t, phase: ask_action_human(env, phase)
+    else:
+        raise ValueError(f'Nieznany tryb: {mode!r} (dostępne: scripted, human)')
+
+    recorder = replay_rec = None
+    if record_path and record_path.endswith(REPLAY_SUFFIX):
+        meta = dict(mode=mode, seed=seed, cycles=cycles, light_ticks=light_ticks, dark_ticks=dark_ticks,
+                    width=env.w, height=env.h)
+        replay_rec = ReplayRecorder(record_path, meta)
+    elif record_path:
+        recorder = FrameRecorder(record_path)
+    recording = recorder is not None or replay_rec is not None
+    renderer = TerminalRenderer() if not recording and sys.stdout.isatty() else None
+    delay = speed if speed > 0 and not recording else 0
+
+    try:
+        observed_light = 0  # maska akcji gracza z LIGHT poprzedniego cyklu
+        for c in range(1, cycles + 1):
+            # NPC zaczyna tylko z przemieszczaniem się + LEARNABLE zaobserwowane w poprzednim LIGHT
+            allowed_mask = MOVES_MASK | (observed_light & LEARNABLE_MASK)
+            allowed = set(actions_of(allowed_mask))
+            observed_light = 0
+            for phase, n_ticks in (('LIGHT', light_ticks), ('DARK', dark_ticks)):
+                light = phase == 'LIGHT'
+                for t in range(n_ticks):
+                    action_p = choose(env, t, phase)
+                    code_n = agent.pick_action_code(env, allowed_mask)
+                    action_n = None if code_n == NOOP else ACTIONS[code_n]
+
+                    code_p = ACTION_INDEX[action_p]
+
+                    env.step_player(action_p)
+                    if light:
+                        observed_light |= 1 << code_p
+                    env.step_npc(action_n)
+                    env.tick_cooldowns()
+
+                    if replay_rec is not None:
+                        replay_rec.record(env, code_p, code_n, allowed_mask)
+                        continue
+                    # render
+                    hdr = frame_header(c, phase, t, env, allowed, action_p, action_n)
+                    if recorder is not None:
+                        recorder.write(format_frame(hdr, env))
+                    elif renderer is not None:
+                        renderer.draw(hdr, env)
+                    else:
+                        print(format_frame(hdr, env), end='')
+                    if delay:
+                        time.sleep(delay)
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if replay_rec is not None:
+            replay_rec.close()
+        if renderer is not None:
+            renderer.close()
+
+
+# ---------------------------
+# Odtwarzanie zapisu .rpl
+# ---------------------------
+REPLAY_HELP = ('Komendy: Enter/n = tick dalej, p = tick wstecz, +N / -N = przesunięcie o N ticków, '
+               'g CYKL[:FAZA]:TICK = skok, e RODZAJ / E RODZAJ = następne / poprzednie zdarzenie, '
+               'f [TPS] / b [TPS] = odtwarzaj w przód / w tył (Ctrl+C zatrzymuje), q = koniec. '
+               f'Zdarzenia: {", ".join(EVENT_KINDS)}')
+
+
+def show_replay_frame(reader: ReplayReader, i: int, renderer: Optional[TerminalRenderer]) -> None:
+    """Narysuj klatkę ticka i zapisu (ten sam wygląd co przy symulacji na żywo)."""
+    view = reader.view(i)
+    allowed = set(actions_of(view.allowed))
+    action_p = None if view.action_p == NOOP else ACTIONS[view.action_p]
+    action_n = None if view.action_n == NOOP else ACTIONS[view.action_n]
+    hdr = frame_header(view.cycle, view.phase, view.tick, view, allowed, action_p, action_n)
+    hdr += f'\n[replay] tick {i + 1}/{len(reader)}'
+    if renderer is not None:
+        renderer.draw(hdr, view)
+    else:
+        print(format_frame(hdr, view), end='')
+
+
+def play_replay(reader: ReplayReader, i: int, step: int, ticks_per_s: float, n_frames: Optional[int],
+                renderer: Optional[TerminalRenderer]) -> int:
+    """
+    Odtwarzaj od ticka i co `step` ticków (ujemny = wstecz) do końca / początku zapisu albo n_frames klatek.
+
+    :param ticks_per_s: tempo odtwarzania (ticki na sekundę; 0 = bez opóźnień)
+    :return: ostatni pokazany tick
+    """
+    delay = abs(step) / ticks_per_s if ticks_per_s > 0 else 0
+    shown = 0
+    try:
+        while 0 <= i < len(reader) and (n_frames is None or shown < n_frames):
+            show_replay_frame(reader, i, renderer)
+            shown += 1
+            last = i
+            i += step
+            if delay:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    return last if shown else min(max(i, 0), len(reader) - 1)
+
+
+def replay_session(path: str, seek: str, event: str, ticks_per_s: float, n_frames: Optional[int]) -> None:
+    """Tryb --replay: pozycja startowa (seek / zdarzenie), odtwarzanie, potem komendy z klawiatury."""
+    reader = ReplayReader(path)
+    if not len(reader):
+        print(f'{path}: pusty zapis')
+        return
+    i = reader.index_of(seek) if seek else 0
+    if event:
+        found = reader.next_event(event, i - 1)
+        if found is None:
+            print(f'Brak zdarzenia {event} od pozycji {i}.')
         else:
-            print(s)
+            i = found
+    renderer = TerminalRenderer(header_lines=HEADER_LINES + 1) if sys.stdout.isatty() else None
+    step = -1 if ticks_per_s < 0 else 1
+    try:
+        i = play_replay(reader, i, step, abs(ticks_per_s), n_frames, renderer)
+        if not sys.stdin.isatty():
+            return
+        print(REPLAY_HELP)
+        while True:
+            cmd = input('[replay] > ').strip().split()
+            if not cmd or cmd[0] == 'n':
+                i = min(i + 1, len(reader) - 1)
+            elif cmd[0] == 'q':
+                break
+            elif cmd[0] == 'p':
+                i = max(i - 1, 0)
+            elif cmd[0][0] in '+-' and cmd[0][1:].isdigit():
+                i = min(max(i + int(cmd[0]), 0), len(reader) - 1)
+            elif cmd[0] == 'g' and len(cmd) == 2:
+                try:
+                    i = reader.index_of(cmd[1])
+                except ValueError as e:
+                    print(e)
+                    continue
+            elif cmd[0] in ('e', 'E') and len(cmd) == 2 and cmd[1] in EVENT_KINDS:
+                found = reader.next_event(cmd[1], i) if cmd[0] == 'e' else reader.prev_event(cmd[1], i)
+                if found is None:
+                    print(f'Brak zdarzenia {cmd[1]} {"po ticku" if cmd[0] == "e" else "przed tickiem"} {i + 1}.')
+                    continue
+                i = found
+            elif cmd[0] in ('f', 'b'):
+                tps = float(cmd[1]) if len(cmd) > 1 else abs(ticks_per_s)
+                i = play_replay(reader, i, 1 if cmd[0] == 'f' else -1, tps, None, renderer)
+                continue
+            else:
+                print(REPLAY_HELP)
+                continue
+            show_replay_frame(reader, i, renderer)
+    finally:
+        if renderer is not None:
+            renderer.close()
+
+
+# ---------------------------
+# Tryb czasu rzeczywistego
+# ---------------------------
+KEYMAP = {
+    'w': 'MOVE_up',
+    's': 'MOVE_down',
+    'a': 'MOVE_left',
+    'd': 'MOVE_right',
+    'j': 'ATTACK',
+    'k': 'SKILL',
+}
+# Klawisze czekające na tick — starsze są odrzucane, żeby przytrzymany klawisz nie budował opóźnienia
+KEY_QUEUE = 4
+
+
+class FrameTiming:
+    def __init__(self, tick_rate: float) -> None:
+        """
+        Statystyki pętli czasu rzeczywistego: klatki po terminie i opóźnienie klawisz -> narysowana klatka.
+
+        :param tick_rate: docelowa liczba ticków na sekundę
+        """
+        self.tick_rate = tick_rate
+        self.frames = 0
+        self.misses = 0
+        self.latency = LatencyHistogram()
+        self.last_latency_ns: Optional[int] = None
+
+    def add_latency(self, ns: int) -> None:
+        self.latency.add(ns)
+        self.last_latency_ns = ns
 
+    def header_line(self) -> str:
+        """Linia nagłówka klatki: tempo, spóźnione klatki, opóźnienie wejścia (ms)."""
+        miss_pct = 100.0 * self.misses / self.frames if self.frames else 0.0
+        line = f'Tick rate={self.tick_rate:g} Hz | deadline misses={self.misses}/{self.frames} ({miss_pct:.1f}%)'
+        if self.last_latency_ns is not None:
+            lat = self.latency
+            line += (f' | input->render last={self.last_latency_ns / 1e6:.1f} ms'
+                     f' p50={lat.percentile_ns(50) / 1e6:.1f} p99={lat.percentile_ns(99) / 1e6:.1f} ms')
+        return line
+
+
+async def run_realtime(cycles: int, light_ticks: int, dark_ticks: int, tick_rate: float, seed: int,
+                       record_path: Optional[str] = None, key_fd: Optional[int] = None,
+                       out: TextIO = sys.stdout) -> FrameTiming:
+    """
+    Gracz z klawiatury przy stałym tempie ticków: świat idzie dalej bez czekania na klawisz.
+
+    Klawisze są czytane bez blokowania (terminal w trybie cbreak, loop.add_reader — POSIX); tick
+    bierze najstarszy czekający klawisz, a bez klawisza gracz nic nie robi. Klatka spóźniona to taka,
+    której krok i rysowanie skończyły się po terminie (początek klatki + 1 / tick_rate); po spóźnieniu
+    harmonogram startuje od bieżącej chwili (bez nadrabiania serią klatek).
+
+    :param record_path: opcjonalny zapis .rpl sesji (replay.py)
+    :param key_fd: deskryptor wejścia klawiszy (domyślnie stdin)
+    :return: statystyki klatek
+    """
+    import termios
+    import tty
+
+    if tick_rate <= 0:
+        raise ValueError(f'tick_rate musi być > 0 (podano {tick_rate})')
+    env = GridEnv(seed=seed)
+    agent = BTGatedAgent()
+    loop = asyncio.get_running_loop()
+    ns = time.perf_counter_ns
+    period_ns = int(1e9 / tick_rate)
+
+    fd = sys.stdin.fileno() if key_fd is None else key_fd
+    keys: Deque[Tuple[str, int]] = deque(maxlen=KEY_QUEUE)
+
+    def on_key() -> None:
+        now = ns()
+        data = os.read(fd, 64)
+        if not data:
+            loop.remove_reader(fd)  # EOF (zamknięty potok, /dev/null) — inaczej czytnik strzela w każdej iteracji
+            return
+        for ch in data.decode(errors='ignore').lower():
+            keys.append((ch, now))
+
+    old_attrs = None
+    if os.isatty(fd):
+        old_attrs = termios.tcgetattr(fd)
+        tty.setcbreak(fd)
+    try:
+        loop.add_reader(fd, on_key)
+    except PermissionError:
+        pass  # zwykły plik (np. < /dev/null) — epoll go nie obsługuje; sesja bez klawiatury
+    renderer = TerminalRenderer(out, header_lines=HEADER_LINES + 1)
+    timing = FrameTiming(tick_rate)
+    replay_rec = None
     if record_path:
-        # clear file
-        open(record_path, 'w').close()
+        meta = dict(mode='realtime', seed=seed, cycles=cycles, light_ticks=light_ticks, dark_ticks=dark_ticks,
+                    width=env.w, height=env.h, tick_rate=tick_rate)
+        replay_rec = ReplayRecorder(record_path, meta)
 
-    # Scripted:
-    if mode == 'scripted':
+    try:
+        observed_light = 0
+        deadline = ns()
         for c in range(1, cycles + 1):
-            allowed = set(MOVES_ONLY)  # NPC zaczyna tylko z przemieszczaniem się
-            learned_prev = {a for a in observed_light if a in LEARNABLE}
-            allowed = set(MOVES_ONLY) | learned_prev  # ew. dodanie ruchów dla NPC z LEARNABLE
-            observed_light: Set[str] = set()
-            # LIGHT:
-            for t in range(light_ticks):
-                action_p = player.act(env, t, 'LIGHT')
-                action_n = agent.pick_action(env, allowed)
-                
-                env.step_player(action_p)
-                observed_light.add(action_p)
-                env.step_npc(action_n)
-                env.tick_cooldowns()
-
-                # render
-                lines = render_grid(env)
-                hdr = frame_header(c, 'LIGHT', t, env, allowed, action_p, action_n)
-                maybe_write(hdr + '\n' + '\n'.join(lines) + '\n' + '-'*32)
-                if speed > 0 and not record_path:
-                    time.sleep(speed)
-
-            # DARK:
-            for t in range(dark_ticks):
-                action_p = player.act(env, t, 'LIGHT')
-                action_n = agent.pick_action(env, allowed)
-                
-                env.step_player(action_p)
-                env.step_npc(action_n)
-                env.tick_cooldowns()
-                
-                # render
-                lines = render_grid(env)
-                hdr = frame_header(c, 'DARK', t, env, allowed, action_p, action_n)
-                maybe_write(hdr + '\n' + '\n'.join(lines) + '\n' + '-'*32)
-                if speed > 0 and not record_path:
-                    time.sleep(speed)
-
-    # Human:
-    if mode == 'human':
-        observed_light: Set[str] = set()
-        for c in range(1, cycles+1):
-            allowed = set(MOVES_ONLY)  # NPC zaczyna tylko z przemieszczaniem się
-            learned_prev = {a for a in observed_light if a in LEARNABLE}
-            allowed = set(MOVES_ONLY) | learned_prev  # ew. dodanie ruchów dla NPC z LEARNABLE
-            observed_light: Set[str] = set()
-            # LIGHT:
-            for t in range(light_ticks):
-                action_p = ask_action_human(env, phase='LIGHT')
-                action_n = agent.pick_action(env, allowed)
-                
-                env.step_player(action_p)
-                observed_light.add(action_p)
-                env.step_npc(action_n)
-                env.tick_cooldowns()
-
-                # render
-                lines = render_grid(env)
-                hdr = frame_header(c, 'LIGHT', t, env, allowed, action_p, action_n)
-                maybe_write(hdr + '\n' + '\n'.join(lines) + '\n' + '-'*32)
-                if speed > 0 and not record_path:
-                    time.sleep(speed)
-            
-            # DARK:
-            for t in range(dark_ticks):
-                action_p = ask_action_human(env, phase='DARK')
-                action_n = agent.pick_action(env, allowed)
-                
-                env.step_player(action_p)
-                env.step_npc(action_n)
-                env.tick_cooldowns()
-                
-                # render
-                lines = render_grid(env)
-                hdr = frame_header(c, 'DARK', t, env, allowed, action_p, action_n)
-                maybe_write(hdr + '\n' + '\n'.join(lines) + '\n' + '-'*32)
-                if speed > 0 and not record_path:
-                    time.sleep(speed)
+            allowed_mask = MOVES_MASK | (observed_light & LEARNABLE_MASK)
+            allowed = set(actions_of(allowed_mask))
+            observed_light = 0
+            for phase, n_ticks in (('LIGHT', light_ticks), ('DARK', dark_ticks)):
+                light = phase == 'LIGHT'
+                for t in range(n_ticks):
+                    deadline += period_ns
+                    action_p = None
+                    key_at = None
+                    while keys:
+                        ch, at = keys.popleft()
+                        if ch == 'q':
+                            return timing
+                        action = KEYMAP.get(ch)
+                        # SKILL na cooldownie = brak akcji (jak odrzucenie w trybie human)
+                        if action is not None and not (action == 'SKILL' and env.skill_cd_player > 0):
+                            action_p, key_at = action, at
+                            break
+                    code_p = NOOP if action_p is None else ACTION_INDEX[action_p]
+                    code_n = agent.pick_action_code(env, allowed_mask)
+                    action_n = None if code_n == NOOP else ACTIONS[code_n]
 
-    else:
-        f'Mode does not exist. Please choose "scripted" or "human".'
+                    env.step_player(action_p)
+                    if light and action_p is not None:
+                        observed_light |= 1 << code_p
+                    env.step_npc(action_n)
+                    env.tick_cooldowns()
+                    if replay_rec is not None:
+                        replay_rec.record(env, code_p, code_n, allowed_mask)
+
+                    renderer.draw(frame_header(c, phase, t, env, allowed, action_p, action_n, timing), env)
+                    done = ns()
+                    if key_at is not None:
+                        timing.add_latency(done - key_at)
+                    timing.frames += 1
+                    if done > deadline:
+                        timing.misses += 1
+                        deadline = done
+                    await asyncio.sleep((deadline - done) / 1e9)
+        return timing
+    finally:
+        loop.remove_reader(fd)
+        if old_attrs is not None:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_attrs)
+        renderer.close()
+        if replay_rec is not None:
+            replay_rec.close()
 
 
 def ask_action_human(env: GridEnv, phase: str) -> str:
@@ -160,16 +495,8 @@ def ask_action_human(env: GridEnv, phase: str) -> str:
         if s == 'q':
             print('Koniec.')
             raise SystemExit(0)
-        keymap = {
-            'w': 'MOVE_up',
-            's': 'MOVE_down',
-            'a': 'MOVE_left',
-            'd': 'MOVE_right',
-            'j': 'ATTACK',
-            'k': 'SKILL',
-        }
-        if s in keymap:
-            a = keymap[s]
+        if s in KEYMAP:
+            a = KEYMAP[s]
             # prosty feedback o cooldownie
             if a == 'SKILL' and env.skill_cd_player > 0:
                 print(f'SKILL na cooldownie: {env.skill_cd_player} ticków. Wybierz inną akcję.')
@@ -180,18 +507,32 @@ def ask_action_human(env: GridEnv, phase: str) -> str:
 
 def parse_args():
     ap = argparse.ArgumentParser()
-    ap.add_argument('--mode', choices=['scripted', 'human'], default='human')
+    ap.add_argument('--mode', choices=['scripted', 'human', 'realtime'], default='human')
     ap.add_argument('--cycles', type=int, default=1)
     ap.add_argument('--light_ticks', type=int, default=20)
     ap.add_argument('--dark_ticks', type=int, default=20)
     ap.add_argument('--speed', type=float, default=0.05, help='opóźnienie między klatkami w trybie scripted')
-    ap.add_argument('--record', type=str, default='', help='ścieżka do pliku z zapisem klatek (bez live printów)')
+    ap.add_argument('--record', type=str, default='', help='ścieżka do pliku z zapisem klatek (bez live printów; .gz = kompresja)')
     ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--tick_rate', type=float, default=20.0, help='tempo ticków w trybie realtime (Hz)')
+    ap.add_argument('--replay', type=str, default='', help='odtwórz zapis .rpl (z --record plik.rpl) zamiast symulacji')
+    ap.add_argument('--seek', type=str, default='', help='pozycja startowa odtwarzania: CYKL, CYKL:TICK albo CYKL:FAZA:TICK')
+    ap.add_argument('--event', type=str, default='', choices=('',) + EVENT_KINDS, help='start od pierwszego zdarzenia (od --seek)')
+    ap.add_argument('--replay_speed', type=float, default=20.0, help='tempo odtwarzania w tickach/s (ujemne = wstecz, 0 = bez opóźnień)')
+    ap.add_argument('--frames', type=int, default=None, help='liczba klatek odtwarzanych przed przejściem do komend (domyślnie do końca)')
     return ap.parse_args()
 
 
 if __name__ == '__main__':
     args = parse_args()
+    if args.replay:
+        replay_session(args.replay, args.seek, args.event, args.replay_speed, args.frames)
+        raise SystemExit(0)
     record = args.record if args.record != '' else None
     print(f'[viewer] Using seed={args.seed}')
-    run(args.mode, args.cycles, args.light_ticks, args.dark_ticks, args.speed, record, args.seed)
+    if args.mode == 'realtime':
+        timing = asyncio.run(run_realtime(args.cycles, args.light_ticks, args.dark_ticks, args.tick_rate, args.seed,
+                                          record))
+        print(timing.header_line())
+    else:
+        run(args.mode, args.cycles, args.light_ticks, args.dark_ticks, args.speed, record, args.seed)